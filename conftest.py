@@ -1,10 +1,13 @@
-from typing import Any, Callable
+from typing import Any, Callable, Iterator
 from _pytest.config.argparsing import Parser
 from _pytest.python import Function
 from django.http import HttpResponse
 from django.test import Client
 from graphene_django.utils.testing import graphql_query
 import pytest
+from qwant.music.api import API
+from qwant.music.models import autocomplete_index, slug_rules
+from qwant.tests.server import FakeAPI
 
 
 def pytest_addoption(parser: Parser) -> None:
@@ -19,6 +22,12 @@ def pytest_addoption(parser: Parser) -> None:
         action='store_true',
         help='Run the tests under current development only',
     )
+    parser.addoption(
+        '--benchmark',
+        action='store',
+        default='off',
+        help='Run the benchmarks along the other tests: on/off (default: off)',
+    )
 
 
 def pytest_runtest_setup(item: Function) -> None:
@@ -29,6 +38,7 @@ def pytest_runtest_setup(item: Function) -> None:
             _with_api_calls(item)
     else:
         _with_api_calls(item)
+    _with_benchmarks(item)
 
 
 def _with_api_calls(item: Function) -> None:
@@ -38,9 +48,48 @@ def _with_api_calls(item: Function) -> None:
             pytest.skip()
 
 
+def _with_benchmarks(item: Function) -> None:
+    on_off: str = item.config.getoption('--benchmark')
+    if on_off.lower() == 'off':
+        if 'benchmark' in item.keywords:
+            pytest.skip()
+
+
 @pytest.fixture
 def graphql_client(client: Client) -> Callable[..., HttpResponse]:
     def func(query: str, *args: Any, **kwargs: Any) -> HttpResponse:
         return graphql_query(query, *args, **kwargs)
 
     return func
+
+
+@pytest.fixture
+def api_server(settings: Any) -> Iterator[FakeAPI]:
+    '''Serve the API from a local server, without waiting between retries.'''
+    server: FakeAPI = FakeAPI()
+    server.start()
+    settings.QWANT_API_BASE_URL = server.url
+    settings.QWANT_API_BACKOFF = 0
+    settings.QWANT_API_CACHE_PATH = ''
+    settings.QWANT_API_THROTTLE_PATH = ''
+    API.close()
+    API.metrics.reset()
+    yield server
+    API.close()
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def slug_rules_cleared() -> Iterator[None]:
+    '''Drop the SpecialChar rules compiled by a test (its rows are rolled
+    back without any signal).'''
+    yield
+    slug_rules.clear()
+
+
+@pytest.fixture(autouse=True)
+def autocomplete_index_cleared() -> Iterator[None]:
+    '''Drop the autocomplete index built by a test (its rows are rolled
+    back).'''
+    yield
+    autocomplete_index.invalidate()
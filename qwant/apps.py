@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class QwantConfig(AppConfig):
     name = 'qwant'
+
+    def ready(self) -> None:
+        import qwant.music.signals  # noqa: F401
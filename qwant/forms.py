@@ -3,9 +3,12 @@
 Module containing the forms for the UI.
 Author: SebDeclercq (https://www.github.com/SebDeclercq)
 '''
+from typing import List, Optional
 from django import forms
+from django.conf import settings
 from django.utils.translation import gettext as _
-from qwant.music.models import Artist
+from qwant.music.autocomplete import Suggestion
+from qwant.music.models import Artist, RefreshJob
 
 
 class SearchForm(forms.Form):
@@ -13,14 +16,62 @@ class SearchForm(forms.Form):
         label=_('Artist name'), max_length=200, required=True
     )
 
-    def search(self) -> Artist:
-        '''Search for an Artist in the database or else get it from the API,
+    def search(self) -> Optional[Artist]:
+        '''Search for an Artist in the database (by its slug, or else by the
+        closest name, see Artist.fuzzy_search) or else get it from the API,
         insert it and return it.
-        
+
+        Returns:
+            The asked for Artist.
+
+        Raises:
+            requests.RequestException: The API could not be called
+        '''
+        name: str = self.cleaned_data['artist_name']
+        if artist := Artist.objects.filter(
+            slug=Artist.name_to_slug(name)
+        ).first():
+            return artist
+        for match in Artist.fuzzy_search(
+            name, limit=1, min_similarity=settings.QWANT_FUZZY_MIN_SIMILARITY
+        ):
+            return match.artist
+        return Artist.search_or_add(name)
+
+    def reload(self) -> Optional[Artist]:
+        '''Queue a refresh of an Artist from the API and return it as it is
+        in database, or else search for it.
+
         Returns:
             The asked for Artist.
         '''
-        return Artist.search_or_add(self.cleaned_data['artist_name'])
+        name: str = self.cleaned_data['artist_name']
+        slug: str = Artist.name_to_slug(name)
+        if artist := Artist.objects.filter(slug=slug).first():
+            RefreshJob.enqueue([slug])
+            return artist
+        return Artist.search_or_add(name)
 
-    def reload(self) -> Artist:
-        return Artist.create_from_api(self.cleaned_data['artist_name'])
+
+class AutocompleteForm(forms.Form):
+    q: forms.CharField = forms.CharField(
+        label=_('Start of the artist name'), max_length=200, required=True
+    )
+    limit: forms.IntegerField = forms.IntegerField(
+        label=_('Number of artists'), min_value=1, required=False
+    )
+
+    def complete(self) -> List[Suggestion]:
+        '''Complete the start of an artist name (see Artist.autocomplete).
+
+        Returns:
+            The Artists whose names start like it (10 by default, at most
+            QWANT_AUTOCOMPLETE_MAX_LIMIT).
+        '''
+        return Artist.autocomplete(
+            self.cleaned_data['q'],
+            min(
+                self.cleaned_data['limit'] or 10,
+                settings.QWANT_AUTOCOMPLETE_MAX_LIMIT,
+            ),
+        )
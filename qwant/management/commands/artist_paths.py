@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+'''
+Script computing the shortest paths between many pairs of artists.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+from itertools import islice
+import sys
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from qwant.music.models import Artist, ArtistPath
+
+Pair = Tuple[str, str]  # Type alias
+
+
+class Command(BaseCommand):
+    '''Django Custom Command Class to compute paths between artists.
+    The input file holds one pair of artist slugs per line (separated by
+    spaces, tabs or a comma). Each output line holds the source slug, the
+    target slug, the number of hops (or unknown/timeout/none) and the slugs
+    of the path, separated by tabs.'''
+
+    help: str = 'Compute the shortest paths between pairs of artists'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            'file', type=str, help='The file of slug pairs (- for stdin)'
+        )
+        parser.add_argument(
+            '-b',
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='The number of pairs to compute at once',
+        )
+        parser.add_argument(
+            '-t',
+            '--timeout',
+            type=float,
+            default=settings.QWANT_PATHS_BATCH_TIMEOUT,
+            help='The number of seconds given to each batch',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['file'] == '-':
+            self._run(sys.stdin, options['batch_size'], options['timeout'])
+        else:
+            try:
+                with open(options['file'], encoding='utf-8') as file:
+                    self._run(file, options['batch_size'], options['timeout'])
+            except OSError as err:
+                raise CommandError(err)
+
+    def _run(self, file: TextIO, batch_size: int, timeout: float) -> None:
+        '''Compute and write the paths batch after batch.'''
+        pairs: Iterator[Pair] = self._read_pairs(file)
+        while batch := list(islice(pairs, batch_size)):
+            for line in self._compute(batch, timeout):
+                self.stdout.write(line)
+            self.stdout.flush()
+
+    @staticmethod
+    def _read_pairs(file: TextIO) -> Iterator[Pair]:
+        '''Read the slug pairs, skipping blank lines and # comments.'''
+        for number, line in enumerate(file, start=1):
+            if not (line := line.strip()) or line.startswith('#'):
+                continue
+            slugs: List[str] = line.replace(',', ' ').split()
+            if len(slugs) != 2:
+                raise CommandError(f'Line {number}: expected 2 slugs')
+            yield slugs[0], slugs[1]
+
+    @staticmethod
+    def _compute(batch: List[Pair], timeout: float) -> Iterator[str]:
+        '''Compute the paths of a batch, yielding each output line as soon
+        as the paths from its source artist are known.'''
+        artists: Dict[str, Artist] = Artist.objects.in_bulk(
+            {slug for pair in batch for slug in pair}, field_name='slug'
+        )
+        known: List[Tuple[Artist, Artist]] = []
+        for source, target in batch:
+            if source in artists and target in artists:
+                known.append((artists[source], artists[target]))
+            else:
+                yield f'{source}\t{target}\tunknown\t'
+        path: ArtistPath
+        for path in Artist.paths_between(known, timeout=timeout):
+            hops: Optional[str] = (
+                str(len(path.artists) - 1) if path.artists else None
+            )
+            yield '\t'.join(
+                (
+                    path.source.slug,
+                    path.target.slug,
+                    hops or ('timeout' if path.timed_out else 'none'),
+                    ' '.join(artist.slug for artist in path.artists),
+                )
+            )
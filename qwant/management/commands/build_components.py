@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+'''
+Script recomputing the connected components of the similar artists graph.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Dict, List
+from django.core.management.base import BaseCommand, CommandParser
+from qwant.music.models import Artist
+
+
+class Command(BaseCommand):
+    '''Django Custom Command Class to rebuild the Artist components
+    and print their sizes.'''
+
+    help: str = 'Rebuild the connected components of the artists graph'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '-s',
+            '--stats',
+            action='store_true',
+            help='Only print the sizes of the current components',
+        )
+        parser.add_argument(
+            '-l',
+            '--limit',
+            type=int,
+            default=10,
+            help='The number of biggest components to print',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if not options['stats']:
+            components: Dict[int, List[int]] = Artist.rebuild_components()
+            self.stdout.write(f'{len(components)} components rebuilt')
+        sizes: Dict[int, int] = Artist.component_sizes()
+        isolated: int = Artist.objects.filter(component=None).count()
+        self.stdout.write(
+            f'{len(sizes)} components, {sum(sizes.values())} artists '
+            f'in components, {isolated} artists without component'
+        )
+        for component, size in list(sizes.items())[: options['limit']]:
+            self.stdout.write(f'{component}\t{size}')
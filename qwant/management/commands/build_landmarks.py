@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+'''
+Script picking the landmarks of the A* path search (each process computes
+their distances to every artist from its graph snapshot).
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Dict
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from qwant.music.graph.landmarks import LandmarkIndex
+from qwant.music.models import Artist, Landmark
+
+
+class Command(BaseCommand):
+    '''Django Custom Command Class to (re)build the landmarks.'''
+
+    help: str = 'Build the landmarks of the A* path search'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '-c',
+            '--count',
+            type=int,
+            default=settings.QWANT_LANDMARKS_COUNT,
+            help='The number of landmarks to pick',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        start: float = time.perf_counter()
+        index: LandmarkIndex = Landmark.build(options['count'])
+        names: Dict[int, str] = dict(
+            Artist.objects.filter(pk__in=index.distances).values_list(
+                'pk', 'slug'
+            )
+        )
+        self.stdout.write(
+            f'{len(index)} landmarks built in '
+            f'{time.perf_counter() - start:.2f} s: '
+            + ', '.join(names[pk] for pk in index.distances)
+        )
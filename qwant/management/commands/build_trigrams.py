@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+'''
+Script rebuilding the trigram index of the fuzzy artist search.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any
+import time
+from django.core.management.base import BaseCommand, CommandParser
+from qwant.music.models import SNAPSHOT_CHUNK_SIZE, ArtistTrigram
+
+
+class Command(BaseCommand):
+    '''Django Custom Command Class to index the trigrams of all the artist
+    names again (to index the artists saved before the index existed, or
+    after a change of the special characters rules).'''
+
+    help: str = 'Rebuild the trigram index of the fuzzy artist search'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '-c',
+            '--chunk-size',
+            type=int,
+            default=SNAPSHOT_CHUNK_SIZE,
+            help='The number of artists indexed at a time',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        start: float = time.perf_counter()
+        nb_artists, nb_trigrams = ArtistTrigram.rebuild(options['chunk_size'])
+        self.stdout.write(
+            f'Done: {nb_trigrams} trigrams of {nb_artists} artists indexed '
+            f'in {time.perf_counter() - start:.1f} s'
+        )
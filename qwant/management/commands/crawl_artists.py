@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+'''
+Script growing the database by crawling the similar artists breadth-first.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import Any, Optional
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from qwant.music.crawler import Crawler, CrawlState
+from qwant.music.models import Artist
+
+
+class Command(BaseCommand):
+    '''Django Custom Command Class to add the artists reachable
+    from some seed artists.'''
+
+    help: str = 'Crawl the similar artists breadth-first from some artists'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '-s',
+            '--seed',
+            action='append',
+            default=[],
+            help='The name of an Artist to start from (repeatable)',
+        )
+        parser.add_argument(
+            '-d',
+            '--depth',
+            type=int,
+            default=2,
+            help='The number of hops from the seeds to fetch',
+        )
+        parser.add_argument(
+            '-m',
+            '--max-artists',
+            type=int,
+            default=1000,
+            help='The number of artists to fetch before stopping',
+        )
+        parser.add_argument(
+            '-w',
+            '--workers',
+            type=int,
+            default=8,
+            help='The number of concurrent API calls',
+        )
+        parser.add_argument(
+            '-b',
+            '--batch-size',
+            type=int,
+            default=100,
+            help='The number of artists written per transaction',
+        )
+        parser.add_argument(
+            '--state',
+            type=Path,
+            help='The file saving the crawl, resumed if it exists',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path: Optional[Path] = options['state']
+        state: CrawlState
+        if path is not None and path.exists():
+            state = CrawlState.load(path)
+            self.stdout.write(
+                f'Resuming: {state.fetched} artists fetched, '
+                f'{len(state.frontier)} queued'
+            )
+        else:
+            state = CrawlState()
+        crawler: Crawler = Crawler(
+            state,
+            max_depth=options['depth'],
+            max_artists=options['max_artists'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            state_path=path,
+            report=self.stdout.write,
+        )
+        crawler.add_seeds(Artist.name_to_slugs(options['seed']))
+        if not state.frontier:
+            raise CommandError('Nothing to crawl: give some --seed')
+        try:
+            crawler.run()
+        except KeyboardInterrupt:
+            if path is not None:
+                self.stderr.write(f'Interrupted, state saved to {path}')
+            return
+        self.stdout.write(
+            f'Done: {state.fetched} artists fetched, {state.not_found} '
+            f'not found, {state.errors} errors '
+            f'({len(state.failed)} artists given up), '
+            f'{len(state.frontier)} still queued'
+        )
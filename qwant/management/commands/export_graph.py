@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+'''
+Script exporting the similar artists graph for the analytics jobs.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Tuple
+import time
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from qwant.music.graph.export import Node, write_binary, write_ndjson
+from qwant.music.models import SNAPSHOT_CHUNK_SIZE, Artist
+
+WRITERS: Dict[str, Callable[[Path, Iterable[Node]], Tuple[int, int]]] = {
+    'ndjson': write_ndjson,
+    'binary': write_binary,
+}
+
+
+class Command(BaseCommand):
+    '''Django Custom Command Class to stream the artists and their
+    relations to a file, without loading them in memory.'''
+
+    help: str = 'Export the artists graph as JSON lines or a binary file'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            'path',
+            type=Path,
+            help='The file written (*.ndjson[.gz]: JSON lines by default)',
+        )
+        parser.add_argument(
+            '-f',
+            '--format',
+            choices=tuple(WRITERS),
+            help='ndjson: one artist per line, binary: mappable columns',
+        )
+        parser.add_argument(
+            '-c',
+            '--chunk-size',
+            type=int,
+            default=SNAPSHOT_CHUNK_SIZE,
+            help='The number of rows fetched at a time',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path: Path = options['path']
+        if not path.parent.is_dir():
+            raise CommandError(f'No directory {path.parent}')
+        format: str = options['format'] or (
+            'ndjson' if '.ndjson' in path.suffixes else 'binary'
+        )
+        start: float = time.perf_counter()
+        nb_nodes, nb_edges = WRITERS[format](
+            path, Artist.stream_graph(options['chunk_size'])
+        )
+        self.stdout.write(
+            f'Done: {nb_nodes} artists, {nb_edges} relations exported to '
+            f'{path} ({path.stat().st_size / 1e6:.1f} MB, {format}) in '
+            f'{time.perf_counter() - start:.1f} s'
+        )
@@ -3,9 +3,12 @@
 Simple script to populate the database. Create a small sample of artists.
 Author: SebDeclercq (https://www.github.com/SebDeclercq)
 '''
-from typing import Any, List, Sequence
+from typing import Any, Dict, List, Optional, Sequence
+import asyncio
 from django.core.management.base import BaseCommand
+from qwant.music.api import AsyncAPI, Fetched
 from qwant.music.models import Artist
+from qwant.music.types import APIData
 
 
 class DbSampler:
@@ -25,15 +28,29 @@ class DbSampler:
     @staticmethod
     def feed_db() -> List[Artist]:
         '''Main method of DbSampler.
+        The artists are fetched concurrently, then inserted at once.
         
         Returns:
             The list of the inserted Artists
         '''
-        artists: List[Artist] = []
-        for artist_name in DbSampler.ARTIST_NAMES:
-            artist: Artist = Artist.create_from_api(artist_name)
-            artists.append(artist)
-        return artists
+        slugs: List[str] = list(Artist.name_to_slugs(DbSampler.ARTIST_NAMES))
+        fetched: Dict[str, Optional[APIData]] = asyncio.run(
+            DbSampler._fetch(slugs)
+        )
+        return Artist.bulk_create_from_api_data(
+            data for slug in slugs if (data := fetched[slug])
+        )
+
+    @staticmethod
+    async def _fetch(slugs: List[str]) -> Dict[str, Optional[APIData]]:
+        '''Get the API data of the artists (raising the first error).'''
+        fetched: Dict[str, Optional[APIData]] = {}
+        result: Fetched
+        async for result in AsyncAPI.get_many(slugs):
+            if result.error is not None:
+                raise result.error
+            fetched[result.slug] = result.data
+        return fetched
 
 
 class Command(BaseCommand):
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+'''
+Script importing the artists of a JSON lines dump of API responses.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import Any
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from qwant.music.importer import Importer, ImportStats
+from qwant.music.ndjson import open_file
+
+
+class Command(BaseCommand):
+    '''Django Custom Command Class to bulk import artists without calling
+    the API.'''
+
+    help: str = 'Import the artists of a JSON lines dump (.ndjson[.gz])'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            'dump',
+            type=Path,
+            help='The file, one API response per line (gzipped if *.gz)',
+        )
+        parser.add_argument(
+            '-b',
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='The number of artists written per transaction',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path: Path = options['dump']
+        if not path.is_file():
+            raise CommandError(f'No dump at {path}')
+        importer: Importer = Importer(
+            batch_size=options['batch_size'],
+            report=self.stdout.write,
+            warn=self.stderr.write,
+        )
+        with open_file(path, 'rb') as lines:
+            stats: ImportStats = importer.run(lines)
+        self.stdout.write(
+            f'Done: {stats.imported} artists imported, {stats.invalid} '
+            f'invalid lines in {stats.seconds:.1f} s ({stats.rate:.0f}/s)'
+        )
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+'''
+Script running the worker refreshing the queued artists from the API.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any
+from django.core.management.base import BaseCommand, CommandParser
+from qwant.music.refresh import RefreshWorker
+
+
+class Command(BaseCommand):
+    '''Django Custom Command Class to process the refresh queue.'''
+
+    help: str = 'Refresh the queued artists from the API, batch by batch'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '-b',
+            '--batch-size',
+            type=int,
+            default=50,
+            help='The number of artists refreshed per transaction',
+        )
+        parser.add_argument(
+            '-w',
+            '--workers',
+            type=int,
+            default=8,
+            help='The number of concurrent API calls',
+        )
+        parser.add_argument(
+            '-i',
+            '--idle',
+            type=float,
+            default=5.0,
+            help='The seconds to wait when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Stop when the queue is empty',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        worker: RefreshWorker = RefreshWorker(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            idle=options['idle'],
+            report=self.stdout.write,
+        )
+        try:
+            refreshed: int = worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(f'Done: {refreshed} artists refreshed')
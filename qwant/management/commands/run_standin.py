@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+'''
+Script serving a local stand-in of the unofficial Qwant Music API, to point
+QWANT_API_BASE_URL at for offline load tests.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import Any
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from qwant.music.standin import (
+    LIVE_URL,
+    Recorder,
+    Recording,
+    Source,
+    StandIn,
+    SyntheticGraph,
+)
+
+
+class Command(BaseCommand):
+    '''Django Custom Command Class to serve recorded or synthetic artists
+    like the API does.'''
+
+    help: str = 'Serve a local stand-in of the Qwant Music API'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument(
+            '--replay',
+            type=Path,
+            help='Serve the responses saved in a JSON lines file (.gz ok)',
+        )
+        source.add_argument(
+            '--record',
+            type=Path,
+            help='Serve the live API, saving its responses to a file',
+        )
+        source.add_argument(
+            '--synthetic',
+            type=int,
+            metavar='SIZE',
+            help='Serve a power-law graph of SIZE synthetic artists',
+        )
+        parser.add_argument(
+            '--mean-degree',
+            type=int,
+            default=10,
+            help='The average number of similar synthetic artists',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='The seed of the synthetic graph and of the injections',
+        )
+        parser.add_argument(
+            '--upstream',
+            default=LIVE_URL,
+            help='The base URL of the artists of the live API',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.0,
+            help='The seconds waited before each answer',
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=0.0,
+            help='The mean of the random seconds added to the latency',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='The share of the requests answered with a 429/5xx',
+        )
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('-p', '--port', type=int, default=8001)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        source: Source
+        if path := options['replay']:
+            if not path.exists():
+                raise CommandError(f'No recording at {path}')
+            source = Recording(path)
+            description: str = f'{len(source)} recorded artists'
+        elif path := options['record']:
+            source = Recorder(Recording(path), options['upstream'])
+            description = f'{options["upstream"]}, recorded to {path}'
+        else:
+            source = SyntheticGraph(
+                options['synthetic'],
+                mean_degree=options['mean_degree'],
+                seed=options['seed'],
+            )
+            description = (
+                f'{options["synthetic"]} synthetic artists, from '
+                f'{SyntheticGraph.slug(0)} (the biggest hub)'
+            )
+        server: StandIn = StandIn(
+            source,
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f'Serving {description}\n'
+            f'export QWANT_API_BASE_URL={server.url}'
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
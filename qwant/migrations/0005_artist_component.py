@@ -0,0 +1,18 @@
+# Generated by Django 3.1.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qwant', '0004_artist_picture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='component',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='Component'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.8 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qwant', '0005_artist_component'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Landmark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distances', models.BinaryField(verbose_name='Distances')),
+                ('valid', models.BooleanField(default=True, verbose_name='Valid')),
+                ('built_at', models.DateTimeField(auto_now=True, verbose_name='Built at')),
+                ('artist', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='qwant.Artist', verbose_name='Artist')),
+            ],
+            options={
+                'verbose_name': 'landmark',
+                'verbose_name_plural': 'landmarks',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.1.8 on 2026-10-18 14:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qwant', '0006_landmark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='fetched_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fetched at'),
+        ),
+        migrations.CreateModel(
+            name='RefreshJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True, verbose_name='Slug')),
+                ('queued_at', models.DateTimeField(auto_now_add=True, verbose_name='Queued at')),
+                ('available_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Available at')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+            ],
+            options={
+                'verbose_name': 'refresh job',
+                'verbose_name_plural': 'refresh jobs',
+            },
+        ),
+    ]
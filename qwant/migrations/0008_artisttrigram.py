@@ -0,0 +1,31 @@
+# Generated by Django 3.1.8 on 2026-10-18 16:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qwant', '0007_artist_fetched_at_refreshjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtistTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3, verbose_name='Trigram')),
+                ('nb_trigrams', models.PositiveSmallIntegerField(verbose_name='Number of trigrams')),
+                ('artist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='qwant.artist', verbose_name='Artist')),
+            ],
+            options={
+                'verbose_name': 'artist trigram',
+                'verbose_name_plural': 'artist trigrams',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='artisttrigram',
+            index=models.Index(fields=['trigram', 'artist', 'nb_trigrams'], name='qwant_trigram_search_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.1.8 on 2026-10-18 17:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qwant', '0008_artisttrigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Updated at'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.8 on 2026-10-18 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qwant', '0009_artist_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['name', 'id'], name='qwant_artist_name_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.1.8 on 2026-10-18 19:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qwant', '0010_artist_name_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='landmark',
+            name='distances',
+        ),
+        migrations.RemoveField(
+            model_name='landmark',
+            name='valid',
+        ),
+    ]
@@ -1,32 +1,427 @@
 #!/usr/bin/env python3
 '''
 Module for the class collecting data from the unofficial Qwant Music API.
+The calls go through one keep-alive session per process, so the TCP and TLS
+handshakes are paid once per worker instead of once per artist, and through
+the rate limiter and the circuit breaker (see throttle), so that a throttled
+or failing API makes the calls fail fast instead of stalling the workers.
 Author: SebDeclercq (https://www.github.com/SebDeclercq)
 '''
-import requests
-from typing import Dict, Final, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import (
+    AsyncIterator,
+    Deque,
+    Dict,
+    Final,
+    FrozenSet,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+import asyncio
 import json
+import os
+import threading
+import time
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import requests
+from qwant.music.cache import CachedResponse, ResponseCache
+from qwant.music.throttle import Budget, CircuitBreaker, RateLimiter
 from qwant.music.types import APIData
 
 
+class LatencyMetrics:
+    '''Latency of the calls made to the API by the process.
+
+    Attributes:
+        calls: The number of calls
+        errors: The number of calls which failed (after the retries)
+        total: The cumulated seconds spent in the calls
+        slowest: The seconds of the slowest call
+        recent: The seconds of the last calls, for the percentiles
+    '''
+
+    def __init__(self, size: int = 1000) -> None:
+        self.calls: int = 0
+        self.errors: int = 0
+        self.total: float = 0.0
+        self.slowest: float = 0.0
+        self.recent: Deque[float] = deque(maxlen=size)
+        self._lock: threading.Lock = threading.Lock()
+
+    def record(self, seconds: float, *, error: bool = False) -> None:
+        '''Add the latency of one call (retries included).'''
+        with self._lock:
+            self.calls += 1
+            self.errors += error
+            self.total += seconds
+            self.slowest = max(self.slowest, seconds)
+            self.recent.append(seconds)
+
+    def percentile(self, rank: float) -> float:
+        '''Get a percentile (0 to 100) of the recent latencies.'''
+        with self._lock:
+            latencies = sorted(self.recent)
+        if not latencies:
+            return 0.0
+        index: int = min(int(len(latencies) * rank / 100), len(latencies) - 1)
+        return latencies[index]
+
+    def stats(self) -> Dict[str, float]:
+        '''Get a summary of the metrics, latencies in milliseconds.'''
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'mean_ms': self.total / self.calls * 1000 if self.calls else 0.0,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'max_ms': self.slowest * 1000,
+        }
+
+    def reset(self) -> None:
+        '''Forget all the recorded calls.'''
+        with self._lock:
+            self.calls = self.errors = 0
+            self.total = self.slowest = 0.0
+            self.recent.clear()
+
+
+class APIUnavailable(requests.RequestException):
+    '''The API was not called: its circuit breaker is open, or the budget of
+    the call is exhausted.'''
+
+
 class API:
-    '''Class directly interacting with the unofficial Qwant Music API.'''
+    '''Class directly interacting with the unofficial Qwant Music API.
+
+    Attributes:
+        metrics: The latency of the calls made by the process
+    '''
+
+    RETRY_STATUSES: Final[FrozenSet[int]] = frozenset(
+        {429, 500, 502, 503, 504}
+    )
+    # Budgets (see QWANT_API_BUDGETS): the users' calls, and the bulk jobs'
+    INTERACTIVE: Final[str] = 'interactive'
+    BACKGROUND: Final[str] = 'background'
+
+    metrics: LatencyMetrics = LatencyMetrics()
+    _session: Optional[requests.Session] = None
+    _pid: Optional[int] = None
+    _cache: Optional[ResponseCache] = None
+    _cache_pid: Optional[int] = None
+    _limiter: Optional[RateLimiter] = None
+    _limiter_pid: Optional[int] = None
+    _breaker: Optional[CircuitBreaker] = None
+    _lock: threading.Lock = threading.Lock()
 
-    BASE_URL: Final[str] = 'https://api.qwant.com/music/artist/'
+    @classmethod
+    def session(cls) -> requests.Session:
+        '''Get the pooled session of the process, created on first use
+        (and again in a forked child, which must not share the sockets).
+
+        Returns:
+            The session retrying the connection errors and the
+            RETRY_STATUSES responses with an exponential backoff
+        '''
+        if cls._session is None or cls._pid != os.getpid():
+            with cls._lock:
+                if cls._session is None or cls._pid != os.getpid():
+                    cls._session = cls.new_session()
+                    cls._pid = os.getpid()
+        return cls._session
 
     @classmethod
-    def get(cls, slug: str) -> Optional[APIData]:
+    def new_session(
+        cls, pool_size: Optional[int] = None
+    ) -> requests.Session:
+        '''Build a session from the QWANT_API_* settings.
+
+        Params:
+            pool_size: The number of connections kept alive
+                (default: QWANT_API_POOL_SIZE)
+
+        Returns:
+            The new session
+        '''
+        retry: Retry = Retry(
+            total=settings.QWANT_API_RETRIES,
+            backoff_factor=settings.QWANT_API_BACKOFF,
+            status_forcelist=cls.RETRY_STATUSES,
+            raise_on_status=False,
+        )
+        adapter: HTTPAdapter = HTTPAdapter(
+            pool_maxsize=pool_size or settings.QWANT_API_POOL_SIZE,
+            max_retries=retry,
+        )
+        session: requests.Session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Accept'] = 'application/json'
+        return session
+
+    @classmethod
+    def cache(cls) -> Optional[ResponseCache]:
+        '''Get the on-disk response cache, opened on first use by each
+        process (None if disabled by QWANT_API_CACHE_PATH).'''
+        if not settings.QWANT_API_CACHE_PATH:
+            return None
+        if cls._cache is None or cls._cache_pid != os.getpid():
+            with cls._lock:
+                if cls._cache is None or cls._cache_pid != os.getpid():
+                    cls._cache = ResponseCache(
+                        settings.QWANT_API_CACHE_PATH,
+                        ttl=settings.QWANT_API_CACHE_TTL,
+                        max_bytes=settings.QWANT_API_CACHE_MAX_BYTES,
+                    )
+                    cls._cache_pid = os.getpid()
+        return cls._cache
+
+    @classmethod
+    def limiter(cls) -> Optional[RateLimiter]:
+        '''Get the rate limiter shared by the processes, opened on first use
+        by each process (None if disabled by QWANT_API_THROTTLE_PATH).'''
+        if not settings.QWANT_API_THROTTLE_PATH:
+            return None
+        if cls._limiter is None or cls._limiter_pid != os.getpid():
+            with cls._lock:
+                if cls._limiter is None or cls._limiter_pid != os.getpid():
+                    cls._limiter = RateLimiter(
+                        settings.QWANT_API_THROTTLE_PATH,
+                        {
+                            name: Budget(**budget)
+                            for name, budget in (
+                                settings.QWANT_API_BUDGETS.items()
+                            )
+                        },
+                    )
+                    cls._limiter_pid = os.getpid()
+        return cls._limiter
+
+    @classmethod
+    def circuit_breaker(cls) -> CircuitBreaker:
+        '''Get the circuit breaker of the process, created on first use.'''
+        if cls._breaker is None:
+            with cls._lock:
+                if cls._breaker is None:
+                    cls._breaker = CircuitBreaker(
+                        window=settings.QWANT_API_BREAKER_WINDOW,
+                        threshold=settings.QWANT_API_BREAKER_THRESHOLD,
+                        cooldown=settings.QWANT_API_BREAKER_COOLDOWN,
+                    )
+        return cls._breaker
+
+    @classmethod
+    def close(cls) -> None:
+        '''Close the session, the cache and the rate limiter of the
+        process, and reset its circuit breaker: the next call opens new ones
+        (with the current settings).'''
+        with cls._lock:
+            if cls._session is not None and cls._pid == os.getpid():
+                cls._session.close()
+            if cls._cache is not None and cls._cache_pid == os.getpid():
+                cls._cache.close()
+            if cls._limiter is not None and cls._limiter_pid == os.getpid():
+                cls._limiter.close()
+            cls._session = cls._pid = None
+            cls._cache = cls._cache_pid = None
+            cls._limiter = cls._limiter_pid = None
+            cls._breaker = None
+
+    @classmethod
+    def get(
+        cls, slug: str, *, revalidate: bool = False, budget: str = INTERACTIVE
+    ) -> Optional[APIData]:
         '''Get an artist from the API based on a slug.
+        The responses are served from the cache while fresh, and the stale
+        ones are revalidated with a conditional request when possible.
+        When the API cannot be called (see _admit), the stale responses are
+        served as they are.
 
         Params:
             slug: The artist's slug to find
+            revalidate: Ask the API even if the cached response is fresh
+            budget: The budget of the call, INTERACTIVE or BACKGROUND
 
         Returns:
             APIData: the parsed JSON response of the API.
+
+        Raises:
+            APIUnavailable: The API could not be called
+            requests.RequestException: The API could not be reached or
+                kept failing after the retries
         '''
-        url: str = cls.BASE_URL + slug
-        resp: requests.Response = requests.get(url)
-        if 'error' in (data := resp.json()):
+        return cls._get(
+            cls.session(), slug, revalidate=revalidate, budget=budget
+        )
+
+    @classmethod
+    def _get(
+        cls,
+        session: requests.Session,
+        slug: str,
+        *,
+        revalidate: bool = False,
+        budget: str = INTERACTIVE,
+    ) -> Optional[APIData]:
+        '''Get an artist through a given session.'''
+        cache: Optional[ResponseCache] = cls.cache()
+        cached: Optional[CachedResponse] = cache.get(slug) if cache else None
+        if cached is not None and cached.fresh and not revalidate:
+            return cls._parse(json.loads(cached.body))
+        if (ticket := cls._admit(budget)) is None:
+            if cached is not None:
+                return cls._parse(json.loads(cached.body))
+            raise APIUnavailable(
+                f'Qwant API not called for {slug} '
+                f'(circuit breaker {cls.circuit_breaker().state})'
+            )
+        url: str = settings.QWANT_API_BASE_URL + slug
+        timeout: Tuple[float, float] = (
+            settings.QWANT_API_CONNECT_TIMEOUT,
+            settings.QWANT_API_READ_TIMEOUT,
+        )
+        started: float = time.perf_counter()
+        failed: bool = True
+        try:
+            resp: requests.Response = session.get(
+                url,
+                timeout=timeout,
+                headers=cached.validators if cached else None,
+            )
+            if resp.status_code in cls.RETRY_STATUSES:
+                resp.raise_for_status()
+            if resp.status_code == 304 and cached is not None:
+                cache.revalidated(slug)  # type: ignore
+                data: APIData = json.loads(cached.body)
+            else:
+                data = resp.json()
+                if cache is not None and resp.ok and 'error' not in data:
+                    cache.put(
+                        slug,
+                        resp.content,
+                        etag=resp.headers.get('ETag'),
+                        last_modified=resp.headers.get('Last-Modified'),
+                    )
+            failed = False
+        finally:
+            cls.metrics.record(time.perf_counter() - started, error=failed)
+            cls.circuit_breaker().record(ticket, failed=failed)
+        return cls._parse(data)
+
+    @classmethod
+    def _admit(cls, budget: str) -> Optional[int]:
+        '''Wait for the turn of a call in its budget, then for the circuit
+        breaker to let it through. The calls of a budget with a maximum wait
+        fail fast while the breaker is open, the others wait for it.
+
+        Returns:
+            The ticket of the call in the circuit breaker (None if the call
+            must not be made)
+        '''
+        limiter: Optional[RateLimiter] = cls.limiter()
+        if limiter is not None and not limiter.acquire(budget):
+            return None
+        breaker: CircuitBreaker = cls.circuit_breaker()
+        while (ticket := breaker.allow()) is None:
+            if Budget(**settings.QWANT_API_BUDGETS[budget]).wait is not None:
+                return None
+            time.sleep(max(breaker.retry_in(), 0.05))
+        return ticket
+
+    @staticmethod
+    def _parse(data: APIData) -> Optional[APIData]:
+        '''Get the artist data of a response (None for an error).'''
+        if 'error' in data:
             return None
         else:
             return data
+
+
+class Fetched(NamedTuple):
+    '''Result of the fetch of one slug by AsyncAPI.get_many.'''
+
+    slug: str
+    data: Optional[APIData]  # None if the artist is unknown or on error
+    error: Optional[requests.RequestException] = None
+
+
+class AsyncAPI:
+    '''Fan-out of the blocking API calls over a thread pool, for the
+    coroutines fetching many artists: the calls are not asynchronous I/O,
+    they run in worker threads sharing a session which pools as many
+    keep-alive connections as threads.'''
+
+    @staticmethod
+    async def get_many(
+        slugs: Iterable[str],
+        *,
+        concurrency: Optional[int] = None,
+        session: Optional[requests.Session] = None,
+        budget: str = API.BACKGROUND,
+        revalidate: bool = False,
+    ) -> AsyncIterator[Fetched]:
+        '''Get several artists from the API, yielding them as they arrive.
+        The calls run in a pool of `concurrency` threads, and the slugs are
+        consumed lazily: a slug is only submitted once a call of the pool
+        is done.
+
+        Params:
+            slugs: The artists' slugs to find
+            concurrency: The maximum number of concurrent calls
+                (default: QWANT_API_POOL_SIZE)
+            session: A session to reuse between several calls (from
+                API.new_session), instead of a new one closed at the end
+            budget: The budget of the calls (see API.get)
+            revalidate: Ask the API even if its responses are still cached
+
+        Returns:
+            The results, in completion order
+        '''
+        concurrency = concurrency or settings.QWANT_API_POOL_SIZE
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        owned: bool = session is None
+        session = session or API.new_session(concurrency)
+        executor: ThreadPoolExecutor = ThreadPoolExecutor(concurrency)
+
+        async def fetch(slug: str) -> Fetched:
+            try:
+                data = await loop.run_in_executor(
+                    executor,
+                    partial(
+                        API._get,
+                        session,
+                        slug,
+                        revalidate=revalidate,
+                        budget=budget,
+                    ),
+                )
+                return Fetched(slug, data)
+            except requests.RequestException as error:
+                return Fetched(slug, None, error)
+
+        pending: Set[asyncio.Future] = set()
+        try:
+            for slug in slugs:
+                if len(pending) >= concurrency:
+                    done: Set[asyncio.Future]
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        yield task.result()
+                pending.add(asyncio.ensure_future(fetch(slug)))
+            for task in asyncio.as_completed(pending):
+                yield await task
+        finally:
+            for task in pending:
+                task.cancel()
+            executor.shutdown(wait=False)
+            if owned:
+                session.close()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+'''
+Module containing the caches of the API responses:
+- the on-disk cache of the raw responses, in a SQLite file shared by all the
+  processes, keyed by slug, with a time to live, a size bound enforced by
+  evicting the least recently used responses, and the ETag/Last-Modified
+  validators to revalidate stale responses with a conditional request
+- the negative cache of the slugs unknown to the API, in a Django cache
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    Dict,
+    Final,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+import sqlite3
+import threading
+import time
+from django.core.cache import BaseCache, caches
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS response (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS response_used_at ON response (used_at);
+CREATE TABLE IF NOT EXISTS total (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO total VALUES (0, 0);
+'''
+
+
+class CachedResponse(NamedTuple):
+    '''A response read from the cache.'''
+
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fresh: bool  # Stored less than ttl seconds ago
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        '''The headers of a conditional request revalidating the response.'''
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class CacheStats:
+    '''Counters of a response cache (for the current process).
+
+    Attributes:
+        hits: The fresh responses served
+        misses: The keys not found or stale
+        revalidations: The stale responses confirmed by the API (304)
+        stores: The responses stored
+        evictions: The responses evicted to keep the size bound
+    '''
+
+    def __init__(self) -> None:
+        self.hits: int = 0
+        self.misses: int = 0
+        self.revalidations: int = 0
+        self.stores: int = 0
+        self.evictions: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(vars(self))
+
+
+class SQLiteStore:
+    '''SQLite file shared by the processes, one connection per thread.
+
+    Attributes:
+        path: The SQLite file, created with the SCHEMA of the subclass
+    '''
+
+    SCHEMA: str = ''
+
+    def __init__(self, path: Path) -> None:
+        self.path: Path = Path(path)
+        self._local: threading.local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        '''Get the connection of the current thread.'''
+        if (connection := getattr(self._local, 'connection', None)) is None:
+            connection = sqlite3.connect(
+                self.path, timeout=10, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        '''Close the connection of the current thread.'''
+        connection: Optional[sqlite3.Connection]
+        if connection := getattr(self._local, 'connection', None):
+            connection.close()
+            self._local.connection = None
+
+
+class ResponseCache(SQLiteStore):
+    '''SQLite store of the raw responses.
+
+    Attributes:
+        ttl: The seconds during which a response is served without asking
+            the API
+        max_bytes: The total size of the bodies kept
+        stats: The counters of the process
+    '''
+
+    SCHEMA: str = SCHEMA
+
+    def __init__(self, path: Path, *, ttl: float, max_bytes: int) -> None:
+        self.ttl: float = ttl
+        self.max_bytes: int = max_bytes
+        self.stats: CacheStats = CacheStats()
+        super().__init__(path)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        '''Read a response, marking it as recently used.
+
+        Params:
+            key: The slug
+
+        Returns:
+            The response (None if not cached)
+        '''
+        connection: sqlite3.Connection = self._connection()
+        now: float = time.time()
+        row: Optional[Tuple] = connection.execute(
+            'SELECT body, etag, last_modified, stored_at FROM response '
+            'WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        connection.execute(
+            'UPDATE response SET used_at = ? WHERE key = ?', (now, key)
+        )
+        body, etag, last_modified, stored_at = row
+        response: CachedResponse = CachedResponse(
+            body, etag, last_modified, now - stored_at < self.ttl
+        )
+        if response.fresh:
+            self.stats.hits += 1
+        else:
+            self.stats.misses += 1
+        return response
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        *,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        '''Store a response, then evict the least recently used ones if
+        the cache got too big.'''
+        connection: sqlite3.Connection = self._connection()
+        now: float = time.time()
+        with _transaction(connection):
+            old: Optional[Tuple[int]] = connection.execute(
+                'SELECT size FROM response WHERE key = ?', (key,)
+            ).fetchone()
+            connection.execute(
+                'INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, body, etag, last_modified, now, now, len(body)),
+            )
+            connection.execute(
+                'UPDATE total SET size = size + ?',
+                (len(body) - (old[0] if old else 0),),
+            )
+        self.stats.stores += 1
+        self._evict()
+
+    def revalidated(self, key: str) -> None:
+        '''Mark a stale response as fresh again (the API answered 304).'''
+        now: float = time.time()
+        self._connection().execute(
+            'UPDATE response SET stored_at = ?, used_at = ? WHERE key = ?',
+            (now, now, key),
+        )
+        self.stats.revalidations += 1
+
+    def _evict(self) -> None:
+        '''Delete the least recently used responses until the cache is back
+        under 90% of max_bytes (to evict in batches, not at every put).'''
+        connection: sqlite3.Connection = self._connection()
+        with _transaction(connection):
+            size: int = self._total(connection)
+            if size <= self.max_bytes:
+                return
+            evicted: List[Tuple[str, int]] = []
+            for key, body_size in connection.execute(
+                'SELECT key, size FROM response ORDER BY used_at'
+            ):
+                if size <= self.max_bytes * 0.9:
+                    break
+                evicted.append((key, body_size))
+                size -= body_size
+            connection.executemany(
+                'DELETE FROM response WHERE key = ?',
+                [(key,) for key, _ in evicted],
+            )
+            connection.execute(
+                'UPDATE total SET size = size - ?',
+                (sum(body_size for _, body_size in evicted),),
+            )
+        self.stats.evictions += len(evicted)
+
+    @property
+    def size(self) -> int:
+        '''The total size of the stored bodies.'''
+        return self._total(self._connection())
+
+    @staticmethod
+    def _total(connection: sqlite3.Connection) -> int:
+        return connection.execute('SELECT size FROM total').fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM response'
+        ).fetchone()[0]
+
+    def clear(self) -> None:
+        '''Delete all the responses.'''
+        connection: sqlite3.Connection = self._connection()
+        with _transaction(connection):
+            connection.execute('DELETE FROM response')
+            connection.execute('UPDATE total SET size = 0')
+
+
+class NegativeCache:
+    '''Slugs the API answered with an error, remembered for a while so that
+    the same junk names do not reach the API again. They are stored in a
+    Django cache shared by the processes, which bounds their number.
+
+    Attributes:
+        alias: The name of the Django cache
+        ttl: The seconds during which a slug is known as not found
+        saved: The calls to the API saved by the current process
+    '''
+
+    PREFIX: Final[str] = 'qwant:not-found:'
+    SAVED_KEY: Final[str] = 'qwant:not-found-saved'
+
+    def __init__(self, alias: str, *, ttl: float) -> None:
+        self.alias: str = alias
+        self.ttl: float = ttl
+        self.saved: int = 0
+
+    @property
+    def cache(self) -> BaseCache:
+        return caches[self.alias]
+
+    def __contains__(self, slug: str) -> bool:
+        '''Check if a slug is known as not found, counting the call saved
+        if it does.'''
+        if self.cache.get(self.PREFIX + slug) is None:
+            return False
+        self.saved += 1
+        try:
+            self.cache.incr(self.SAVED_KEY)
+        except ValueError:  # First saved call, or evicted counter
+            self.cache.add(self.SAVED_KEY, 1, timeout=None)
+        return True
+
+    def add(self, slug: str) -> None:
+        '''Remember that a slug is not found.'''
+        self.cache.set(self.PREFIX + slug, True, timeout=self.ttl)
+
+    def discard(self, slug: str) -> None:
+        '''Forget a slug (found by the API after all).'''
+        self.cache.delete(self.PREFIX + slug)
+
+    @property
+    def total_saved(self) -> int:
+        '''The calls to the API saved by all the processes.'''
+        return self.cache.get(self.SAVED_KEY, 0)
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection) -> Iterator[None]:
+    '''Run statements in one immediate transaction (taking the write lock
+    at once, so that concurrent processes wait for it instead of failing to
+    upgrade their read lock).'''
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+'''
+Module containing the breadth-first crawler of the similar artists graph.
+The frontier is fetched from the API in parallel, batch by batch, each batch
+being written in one transaction (see Artist.bulk_save_api_data). A failed
+fetch is queued again, up to a number of attempts.
+The state of the crawl (frontier, visited artists, counters) is saved to a
+JSON file so that an interrupted crawl resumes where it stopped, the artists
+given up included.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from __future__ import annotations
+from collections import deque
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+import asyncio
+import json
+import os
+import time
+import requests
+from qwant.music.api import API, AsyncAPI, Fetched
+from qwant.music.models import Artist
+from qwant.music.types import APIData
+
+
+class CrawlState:
+    '''Progress of a crawl.
+
+    Attributes:
+        frontier: The (slug, depth) of the artists still to fetch
+        seen: The slugs already fetched or queued
+        fetched_ids: The API ids of the artists already fetched
+        fetched: The number of artists fetched
+        not_found: The number of slugs unknown to the API
+        errors: The number of failed fetches
+        attempts: The failed fetches of the queued slugs, by slug
+        failed: The depth of the slugs given up after too many failed
+            fetches, by slug (not seen anymore: queued again on resume)
+    '''
+
+    def __init__(self) -> None:
+        self.frontier: Deque[Tuple[str, int]] = deque()
+        self.seen: Set[str] = set()
+        self.fetched_ids: Set[int] = set()
+        self.fetched: int = 0
+        self.not_found: int = 0
+        self.errors: int = 0
+        self.attempts: Dict[str, int] = {}
+        self.failed: Dict[str, int] = {}
+
+    def push(self, slug: str, depth: int) -> bool:
+        '''Queue an artist unless already seen.
+
+        Returns:
+            Whether the artist was queued
+        '''
+        if slug in self.seen:
+            return False
+        self.seen.add(slug)
+        self.frontier.append((slug, depth))
+        return True
+
+    def fetch_failed(self, slug: str, depth: int, max_attempts: int) -> None:
+        '''Queue a slug whose fetch failed again, or give it up after
+        max_attempts failed fetches.'''
+        self.errors += 1
+        self.seen.discard(slug)
+        self.attempts[slug] = self.attempts.get(slug, 0) + 1
+        if self.attempts[slug] < max_attempts:
+            self.push(slug, depth)
+        else:
+            del self.attempts[slug]
+            self.failed[slug] = depth
+
+    @property
+    def error_rate(self) -> float:
+        '''The share of the calls which failed.'''
+        calls: int = self.fetched + self.not_found + self.errors
+        return self.errors / calls if calls else 0.0
+
+    @classmethod
+    def load(cls, path: Path) -> CrawlState:
+        '''Read the state saved by a previous crawl, queuing the slugs it
+        gave up again.'''
+        with open(path, encoding='utf-8') as file:
+            saved: Dict[str, Any] = json.load(file)
+        state: CrawlState = cls()
+        state.frontier.extend(
+            (slug, depth) for slug, depth in saved['frontier']
+        )
+        state.seen.update(saved['seen'])
+        state.fetched_ids.update(saved['fetched_ids'])
+        state.fetched = saved['fetched']
+        state.not_found = saved['not_found']
+        state.errors = saved['errors']
+        state.attempts = saved['attempts']
+        for slug, depth in saved['failed'].items():
+            state.push(slug, depth)
+        return state
+
+    def save(self, path: Path) -> None:
+        '''Write the state atomically: an interruption while writing leaves
+        the previous state intact.'''
+        tmp: Path = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump(
+                {
+                    'frontier': list(self.frontier),
+                    'seen': sorted(self.seen),
+                    'fetched_ids': sorted(self.fetched_ids),
+                    'fetched': self.fetched,
+                    'not_found': self.not_found,
+                    'errors': self.errors,
+                    'attempts': self.attempts,
+                    'failed': self.failed,
+                },
+                file,
+            )
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+
+
+class Crawler:
+    '''Breadth-first crawler adding the artists reachable from some seeds.
+
+    Attributes:
+        state: The progress of the crawl
+        max_depth: The number of hops from the seeds to fetch
+        max_artists: The number of artists to fetch before stopping
+        workers: The number of concurrent API calls
+        batch_size: The number of artists written per transaction
+        max_attempts: The number of failed fetches before giving an artist
+            up
+        state_path: Where to save the state (not saved if None)
+        checkpoint: The seconds between two saves of the state
+        report: Function printing the progress
+    '''
+
+    def __init__(
+        self,
+        state: CrawlState,
+        *,
+        max_depth: int,
+        max_artists: int,
+        workers: int,
+        batch_size: int = 100,
+        max_attempts: int = 3,
+        state_path: Optional[Path] = None,
+        checkpoint: float = 30.0,
+        report: Callable[[str], Any] = print,
+    ) -> None:
+        self.state: CrawlState = state
+        self.max_depth: int = max_depth
+        self.max_artists: int = max_artists
+        self.workers: int = workers
+        self.batch_size: int = batch_size
+        self.max_attempts: int = max_attempts
+        self.state_path: Optional[Path] = state_path
+        self.checkpoint: float = checkpoint
+        self.report: Callable[[str], Any] = report
+
+    def add_seeds(self, slugs: Iterable[str]) -> None:
+        '''Queue the artists to start from (at depth 0).'''
+        for slug in slugs:
+            self.state.push(slug, 0)
+
+    def run(self) -> CrawlState:
+        '''Crawl until the frontier is empty or max_artists are fetched.
+        The state is saved every `checkpoint` seconds, at the end and when
+        interrupted.
+
+        Returns:
+            The final state
+        '''
+        session: requests.Session = API.new_session(self.workers)
+        started: float = time.monotonic()
+        saved_at: float = started
+        fetched: int = self.state.fetched
+        try:
+            while (
+                self.state.frontier
+                and self.state.fetched < self.max_artists
+            ):
+                self._crawl_batch(session)
+                elapsed: float = time.monotonic() - started
+                self.report(
+                    f'{self.state.fetched} artists '
+                    f'({(self.state.fetched - fetched) / elapsed:.1f}/s), '
+                    f'{len(self.state.frontier)} queued, '
+                    f'{self.state.errors} errors '
+                    f'({self.state.error_rate:.1%})'
+                )
+                if time.monotonic() - saved_at > self.checkpoint:
+                    self._save()
+                    saved_at = time.monotonic()
+        finally:
+            self._save()
+            session.close()
+        return self.state
+
+    def _crawl_batch(self, session: requests.Session) -> None:
+        '''Fetch the next batch of the frontier and write it.'''
+        size: int = min(
+            self.batch_size,
+            len(self.state.frontier),
+            self.max_artists - self.state.fetched,
+        )
+        batch: Dict[str, int] = dict(
+            self.state.frontier.popleft() for _ in range(size)
+        )
+        try:
+            results: List[Fetched] = asyncio.run(self._fetch(batch, session))
+            # The API ids fetched by this batch => (data, depth)
+            payloads: Dict[int, Tuple[APIData, int]] = {}
+            for result in results:
+                if (data := result.data) is not None:
+                    if int(data['id']) not in self.state.fetched_ids:
+                        payloads.setdefault(
+                            int(data['id']), (data, batch[result.slug])
+                        )
+            Artist.bulk_save_api_data(data for data, _ in payloads.values())
+        except BaseException:
+            self.state.frontier.extendleft(reversed(batch.items()))
+            raise
+        for result in results:
+            if result.error is not None:
+                self.state.fetch_failed(
+                    result.slug, batch[result.slug], self.max_attempts
+                )
+            else:
+                self.state.attempts.pop(result.slug, None)
+                if result.data is None:
+                    self.state.not_found += 1
+        for api_id, (data, depth) in payloads.items():
+            self.state.fetched_ids.add(api_id)
+            if depth < self.max_depth:
+                self._push_similar(data, depth + 1)
+        self.state.fetched += len(payloads)
+
+    def _push_similar(self, data: APIData, depth: int) -> None:
+        '''Queue the similar artists not fetched yet.'''
+        for similar in data.get('similar_artists') or ():
+            if int(similar['id']) not in self.state.fetched_ids:
+                self.state.push(str(similar['slug']), depth)
+
+    async def _fetch(
+        self, batch: Dict[str, int], session: requests.Session
+    ) -> List[Fetched]:
+        return [
+            result
+            async for result in AsyncAPI.get_many(
+                batch, concurrency=self.workers, session=session
+            )
+        ]
+
+    def _save(self) -> None:
+        if self.state_path is not None:
+            self.state.save(self.state_path)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+'''
+Module containing the shortest path search in the similar artists graph.
+The search only manipulates Artist primary keys: the neighbours of a whole
+frontier are asked for at once, so the caller decides where they come from.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+import time
+
+Neighbours = Callable[
+    [Sequence[int]], Mapping[int, Iterable[int]]
+]  # Type alias
+# Type alias: pk => (parent pk, depth)
+Visited = Dict[int, Tuple[Optional[int], int]]
+
+
+def bidirectional_search(
+    source: int,
+    target: int,
+    neighbours: Neighbours,
+    *,
+    max_hops: int,
+    max_nodes: int,
+) -> List[int]:
+    '''Search for the shortest path between two nodes by running two
+    breadth-first searches, one from each end, and expanding the smallest
+    frontier level by level until they meet.
+
+    Params:
+        source: The pk to start from
+        target: The pk to reach
+        neighbours: Function returning the neighbours of a whole frontier
+        max_hops: The maximum length of the path to look for
+        max_nodes: The maximum number of nodes to visit before giving up
+
+    Returns:
+        The pks from source to target (or empty if no path found
+        within the budget)
+    '''
+    if source == target:
+        return [source]
+    forward: Visited = {source: (None, 0)}
+    backward: Visited = {target: (None, 0)}
+    forward_frontier: List[int] = [source]
+    backward_frontier: List[int] = [target]
+    hops: int = 0
+    while forward_frontier and backward_frontier and hops < max_hops:
+        meeting: Optional[int]
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = _expand(
+                forward_frontier, forward, backward, neighbours
+            )
+        else:
+            backward_frontier, meeting = _expand(
+                backward_frontier, backward, forward, neighbours
+            )
+        hops += 1
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+        if len(forward) + len(backward) > max_nodes:
+            break
+    return []
+
+
+def single_source_search(
+    source: int,
+    targets: Iterable[int],
+    neighbours: Neighbours,
+    *,
+    max_hops: int,
+    max_nodes: int,
+    deadline: Optional[float] = None,
+) -> Dict[int, List[int]]:
+    '''Search for the shortest paths from one node to several nodes with
+    a single breadth-first search tree, stopped once all the targets
+    are reached.
+
+    Params:
+        source: The pk to start from
+        targets: The pks to reach
+        neighbours: Function returning the neighbours of a whole frontier
+        max_hops: The maximum length of the paths to look for
+        max_nodes: The maximum number of nodes to visit before giving up
+        deadline: An optional time.monotonic() after which to give up
+
+    Returns:
+        The pks from source to each target (empty if no path found
+        within the budget)
+    '''
+    visited: Visited = {source: (None, 0)}
+    missing: Set[int] = set(targets) - {source}
+    frontier: List[int] = [source]
+    hops: int = 0
+    while frontier and missing and hops < max_hops:
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        frontier = _expand(frontier, visited, {}, neighbours)[0]
+        missing.difference_update(frontier)
+        hops += 1
+        if len(visited) > max_nodes:
+            break
+    return {
+        target: join_paths(target, visited, {target: (None, 0)})
+        if target in visited
+        else []
+        for target in targets
+    }
+
+
+def _expand(
+    frontier: List[int],
+    visited: Visited,
+    other: Visited,
+    neighbours: Neighbours,
+) -> Tuple[List[int], Optional[int]]:
+    '''Visit the next level of one of the searches.
+    All the nodes discovered by this level are at the same distance from
+    its origin, so the best meeting node is the closest to the other origin.
+
+    Params:
+        frontier: The nodes of the current level
+        visited: The nodes already seen by this search
+        other: The nodes already seen by the opposite search
+        neighbours: Function returning the neighbours of a whole frontier
+
+    Returns:
+        The next level and the best meeting node (if any)
+    '''
+    next_frontier: List[int] = []
+    meeting: Optional[int] = None
+    for node, sims in neighbours(frontier).items():
+        depth: int = visited[node][1] + 1
+        for sim in sims:
+            if sim in visited:
+                continue
+            visited[sim] = (node, depth)
+            next_frontier.append(sim)
+            if sim in other and (
+                meeting is None or other[sim][1] < other[meeting][1]
+            ):
+                meeting = sim
+    return next_frontier, meeting
+
+
+def join_paths(
+    meeting: int, forward: Visited, backward: Visited
+) -> List[int]:
+    '''Build the full path by following the parents from the meeting node
+    back to each origin.'''
+    path: List[int] = []
+    node: Optional[int] = meeting
+    while node is not None:
+        path.append(node)
+        node = forward[node][0]
+    path.reverse()
+    node = backward[meeting][0]
+    while node is not None:
+        path.append(node)
+        node = backward[node][0]
+    return path
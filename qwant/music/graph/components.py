@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+'''
+Module containing the connected components of the similar artists graph:
+two Artists in different components can never be linked by a path.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Dict, Generic, Hashable, List, TypeVar
+from qwant.music.graph.snapshot import GraphSnapshot
+
+Key = TypeVar('Key', bound=Hashable)
+
+
+class UnionFind(Generic[Key]):
+    '''Disjoint sets with path compression and union by size.'''
+
+    def __init__(self) -> None:
+        self._parents: Dict[Key, Key] = {}
+        self._sizes: Dict[Key, int] = {}
+
+    def find(self, key: Key) -> Key:
+        '''Get the representative of the set of a key.'''
+        root: Key = self._parents.setdefault(key, key)
+        while root != self._parents[root]:
+            root = self._parents[root]
+        while key != root:
+            self._parents[key], key = root, self._parents[key]
+        return root
+
+    def union(self, a: Key, b: Key) -> Key:
+        '''Merge the sets of two keys and return the new representative.'''
+        root_a: Key = self.find(a)
+        root_b: Key = self.find(b)
+        if root_a == root_b:
+            return root_a
+        size_a: int = self._sizes.get(root_a, 1)
+        size_b: int = self._sizes.get(root_b, 1)
+        if size_a < size_b:
+            root_a, root_b = root_b, root_a
+        self._parents[root_b] = root_a
+        self._sizes[root_a] = size_a + size_b
+        return root_a
+
+    def groups(self) -> Dict[Key, List[Key]]:
+        '''Get the keys of each set, by representative.'''
+        groups: Dict[Key, List[Key]] = {}
+        for key in self._parents:
+            groups.setdefault(self.find(key), []).append(key)
+        return groups
+
+
+def connected_components(snapshot: GraphSnapshot) -> Dict[int, List[int]]:
+    '''Compute the connected components of a graph snapshot.
+    Isolated Artists are left out.
+
+    Params:
+        snapshot: The graph snapshot
+
+    Returns:
+        The Artist pks of each component, by component id (its lowest pk)
+    '''
+    sets: UnionFind[int] = UnionFind()
+    for index in range(len(snapshot)):
+        for neighbour in snapshot.neighbours[
+            snapshot.offsets[index] : snapshot.offsets[index + 1]
+        ]:
+            sets.union(index, neighbour)
+    components: Dict[int, List[int]] = {}
+    for indexes in sets.groups().values():
+        pks: List[int] = sorted(snapshot.pks[index] for index in indexes)
+        components[pks[0]] = pks
+    return components
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+'''
+Module containing the shortest path search run inside the database, as one
+recursive Common Table Expression (CTE) working on SQLite and PostgreSQL.
+The query explores the graph from both ends up to half the hop limit each,
+picks the meeting node closest to both ends and walks back to each of them.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Dict, List, Type
+from django.db import connection, models
+
+SHORTEST_PATH_SQL: str = '''
+WITH RECURSIVE
+    forward(node, depth) AS (
+        SELECT %s, 0
+        UNION
+        SELECT e.{to}, f.depth + 1
+        FROM forward f JOIN {table} e ON e.{from} = f.node
+        WHERE f.depth < %s
+    ),
+    backward(node, depth) AS (
+        SELECT %s, 0
+        UNION
+        SELECT e.{from}, b.depth + 1
+        FROM backward b JOIN {table} e ON e.{to} = b.node
+        WHERE b.depth < %s
+    ),
+    forward_distances(node, depth) AS (
+        SELECT node, MIN(depth) FROM forward GROUP BY node
+    ),
+    backward_distances(node, depth) AS (
+        SELECT node, MIN(depth) FROM backward GROUP BY node
+    ),
+    meeting(node, forward_depth, backward_depth) AS (
+        SELECT f.node, f.depth, b.depth
+        FROM forward_distances f JOIN backward_distances b ON b.node = f.node
+        ORDER BY f.depth + b.depth, f.node
+        LIMIT 1
+    ),
+    to_source(node, depth) AS (
+        SELECT node, forward_depth FROM meeting
+        UNION ALL
+        SELECT (
+            SELECT MIN(e.{from})
+            FROM {table} e
+            JOIN forward_distances d ON d.node = e.{from}
+            WHERE e.{to} = p.node AND d.depth = p.depth - 1
+        ), p.depth - 1
+        FROM to_source p
+        WHERE p.depth > 0
+    ),
+    to_target(node, depth) AS (
+        SELECT node, backward_depth FROM meeting
+        UNION ALL
+        SELECT (
+            SELECT MIN(e.{to})
+            FROM {table} e
+            JOIN backward_distances d ON d.node = e.{to}
+            WHERE e.{from} = p.node AND d.depth = p.depth - 1
+        ), p.depth - 1
+        FROM to_target p
+        WHERE p.depth > 0
+    )
+SELECT node FROM (
+    SELECT node, depth AS position FROM to_source
+    UNION ALL
+    SELECT t.node, m.forward_depth + m.backward_depth - t.depth
+    FROM to_target t, meeting m
+    WHERE t.depth < m.backward_depth
+) AS path
+ORDER BY position
+'''
+
+
+def recursive_search(
+    through: Type[models.Model], source: int, target: int, *, max_hops: int
+) -> List[int]:
+    '''Search for the shortest path between two nodes in one query.
+    Cycles are cut by the UNION of the recursive parts, which never adds
+    the same (node, depth) row twice, and by the depth limit.
+
+    Params:
+        through: The model of the relations table (from_*, to_* columns)
+        source: The pk to start from
+        target: The pk to reach
+        max_hops: The maximum length of the path to look for
+
+    Returns:
+        The pks from source to target (or empty if no path found)
+    '''
+    if source == target:
+        return [source]
+    quote = connection.ops.quote_name
+    columns: Dict[str, str] = {
+        'table': quote(through._meta.db_table),
+        'from': quote(through._meta.get_field('from_artist').column),
+        'to': quote(through._meta.get_field('to_artist').column),
+    }
+    params: List[int] = [
+        source,
+        (max_hops + 1) // 2,
+        target,
+        max_hops // 2,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(SHORTEST_PATH_SQL.format(**columns), params)
+        return [node for node, in cursor.fetchall()]
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+'''
+Module containing the export of the similar artists graph for the analytics
+jobs, streamed from two sorted cursors (the Artists and their relations) so
+that the memory used does not depend on the number of relations:
+- as JSON lines, one node per line with the pks of its similar Artists
+- as a columnar binary file, laid out like the GraphSnapshot arrays, which
+  is memory-mapped and used as it is by the readers (see GraphFile)
+The binary file is made of 8-byte aligned little-endian sections:
+    header        magic, version, neighbour size (4 or 8), nb_nodes,
+                  nb_edges, names size, slugs size (see HEADER)
+    pks           int64[nb_nodes], sorted (the node indexes)
+    api_ids       int64[nb_nodes]
+    offsets       int64[nb_nodes + 1]
+    neighbours    int32 or int64[nb_edges], node indexes
+    name_offsets  int64[nb_nodes + 1], then the UTF-8 names
+    slug_offsets  int64[nb_nodes + 1], then the ASCII slugs
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from array import array
+from contextlib import ExitStack
+from itertools import islice
+from pathlib import Path
+from typing import (
+    IO,
+    Final,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from qwant.music.graph.snapshot import Edge, GraphSnapshot, _index
+from qwant.music.ndjson import write_lines
+
+MAGIC: Final[bytes] = b'QMGRAPH\0'
+VERSION: Final[int] = 1
+HEADER: Final[struct.Struct] = struct.Struct('<8s6Q')
+BUFFER_SIZE: Final[int] = 1 << 16  # Integers buffered per column
+
+ArtistRow = Tuple[int, int, str, str, str]  # pk, api_id, name, slug, picture
+
+
+class Node(NamedTuple):
+    '''An Artist of the exported graph.'''
+
+    pk: int
+    api_id: int
+    name: str
+    slug: str
+    picture: str
+    similar: List[int]  # The pks of the similar Artists
+
+
+def merge_rows(
+    artists: Iterable[ArtistRow], edges: Iterable[Edge]
+) -> Iterator[Node]:
+    '''Join the Artists with their relations, in one pass over each.
+
+    Params:
+        artists: The Artist rows, sorted by pk
+        edges: The (from pk, to pk) relations, sorted
+
+    Returns:
+        The nodes, sorted by pk (the relations of the Artists created while
+        streaming are dropped)
+    '''
+    edges = iter(edges)
+    edge: Optional[Edge] = next(edges, None)
+    for pk, api_id, name, slug, picture in artists:
+        similar: List[int] = []
+        while edge is not None and edge[0] <= pk:
+            if edge[0] == pk:
+                similar.append(edge[1])
+            edge = next(edges, None)
+        yield Node(pk, api_id, name, slug, picture, similar)
+
+
+def write_ndjson(path: Path, nodes: Iterable[Node]) -> Tuple[int, int]:
+    '''Write the nodes as JSON lines (gzipped if path is *.gz).
+
+    Returns:
+        The number of nodes and of (directed) relations written
+    '''
+    nb_edges: int = 0
+
+    def records() -> Iterator[dict]:
+        nonlocal nb_edges
+        for node in nodes:
+            nb_edges += len(node.similar)
+            yield node._asdict()
+
+    return write_lines(path, records()), nb_edges
+
+
+def write_binary(path: Path, nodes: Iterable[Node]) -> Tuple[int, int]:
+    '''Write the nodes as a columnar binary file (see the module).
+    The pks and the offsets are kept in memory (about 40 bytes per node),
+    the other columns are spooled to temporary files, then the similar pks
+    are turned into node indexes once all the pks are known. The file is
+    written aside and renamed: the readers never map a partial file.
+
+    Returns:
+        The number of nodes and of (directed) relations written
+    '''
+    path = Path(path)
+    pks: array = array('q')
+    raw_offsets: array = array('q', [0])
+    name_offsets: array = array('q', [0])
+    slug_offsets: array = array('q', [0])
+    with ExitStack() as stack:
+        api_ids, similar, names, slugs, indexes = (
+            stack.enter_context(tempfile.TemporaryFile()) for _ in range(5)
+        )
+        api_id_buffer: array = array('q')
+        similar_buffer: array = array('q')
+        for node in nodes:
+            pks.append(node.pk)
+            api_id_buffer.append(node.api_id)
+            similar_buffer.extend(node.similar)
+            raw_offsets.append(raw_offsets[-1] + len(node.similar))
+            name_offsets.append(
+                name_offsets[-1] + names.write(node.name.encode())
+            )
+            slug_offsets.append(
+                slug_offsets[-1] + slugs.write(node.slug.encode())
+            )
+            if len(api_id_buffer) >= BUFFER_SIZE:
+                _flush(api_id_buffer, api_ids)
+            if len(similar_buffer) >= BUFFER_SIZE:
+                _flush(similar_buffer, similar)
+        _flush(api_id_buffer, api_ids)
+        _flush(similar_buffer, similar)
+        offsets: array = array('q', [0])
+        neighbours: array = array('i' if len(pks) < 2 ** 31 else 'q')
+        flushed: int = 0
+        values: Iterator[int] = _read_values(similar)
+        for start, end in zip(raw_offsets, raw_offsets[1:]):
+            for pk in islice(values, end - start):
+                if (index := _index(pks, pk)) is not None:
+                    neighbours.append(index)
+            offsets.append(flushed + len(neighbours))
+            if len(neighbours) >= BUFFER_SIZE:
+                flushed += len(neighbours)
+                _flush(neighbours, indexes)
+        _flush(neighbours, indexes)
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=f'.{path.name}.', delete=False
+        ) as out:
+            stack.callback(_remove, out.name)
+            out.write(
+                HEADER.pack(
+                    MAGIC,
+                    VERSION,
+                    neighbours.itemsize,
+                    len(pks),
+                    offsets[-1],
+                    name_offsets[-1],
+                    slug_offsets[-1],
+                )
+            )
+            for section in (
+                pks,
+                api_ids,
+                offsets,
+                indexes,
+                name_offsets,
+                names,
+                slug_offsets,
+                slugs,
+            ):
+                _append(section, out)
+        os.replace(out.name, path)
+    return len(pks), offsets[-1]
+
+
+def _flush(values: array, file: IO[bytes]) -> None:
+    '''Append buffered integers to a temporary file, then empty the
+    buffer.'''
+    _write(values, file)
+    del values[:]
+
+
+def _write(values: array, file: IO[bytes]) -> None:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(file)
+
+
+def _read_values(file: IO[bytes]) -> Iterator[int]:
+    '''Read back the int64 written to a temporary file.'''
+    file.seek(0)
+    while chunk := file.read(8 * BUFFER_SIZE):
+        values: array = array('q', chunk)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        yield from values
+
+
+def _append(section: Union[array, IO[bytes]], out: IO[bytes]) -> None:
+    '''Append a section (an array or a temporary file) to the binary file,
+    padded to 8 bytes.'''
+    if isinstance(section, array):
+        _write(section, out)
+    else:
+        section.seek(0)
+        shutil.copyfileobj(section, out)
+    out.write(b'\0' * (-out.tell() % 8))
+
+
+def _remove(path: str) -> None:
+    '''Remove the file written aside if it was not renamed.'''
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class GraphFile:
+    '''Reader of a binary graph file, memory-mapped: opening it costs no
+    parsing and no copy, the pages being read by the OS when used.
+
+    Attributes:
+        path: The file
+        pks: The sorted Artist pks (the position of a pk is its node index)
+        api_ids: The API ids of the nodes
+        offsets: The position of the first neighbour of each node
+        neighbours: The node indexes of the neighbours
+    '''
+
+    def __init__(self, path: Path) -> None:
+        if sys.byteorder != 'little':
+            raise ValueError('Graph files are mapped on little-endian hosts')
+        self.path: Path = Path(path)
+        with open(self.path, 'rb') as file:
+            try:
+                self._mmap: mmap.mmap = mmap.mmap(
+                    file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            except ValueError:  # Empty file
+                raise ValueError(f'Not a graph file: {path}') from None
+        self._view: memoryview = memoryview(self._mmap)
+        if len(self._view) < HEADER.size:
+            raise ValueError(f'Not a graph file: {path}')
+        (
+            magic,
+            version,
+            itemsize,
+            nb_nodes,
+            nb_edges,
+            names_size,
+            slugs_size,
+        ) = HEADER.unpack_from(self._view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Not a graph file: {path}')
+        self._position: int = HEADER.size
+        self.pks: memoryview = self._section('q', nb_nodes)
+        self.api_ids: memoryview = self._section('q', nb_nodes)
+        self.offsets: memoryview = self._section('q', nb_nodes + 1)
+        self.neighbours: memoryview = self._section(
+            'i' if itemsize == 4 else 'q', nb_edges
+        )
+        self._name_offsets: memoryview = self._section('q', nb_nodes + 1)
+        self._names: memoryview = self._section('B', names_size)
+        self._slug_offsets: memoryview = self._section('q', nb_nodes + 1)
+        self._slugs: memoryview = self._section('B', slugs_size)
+
+    def _section(self, typecode: str, size: int) -> memoryview:
+        '''Map the next section of the file.'''
+        end: int = self._position + size * struct.calcsize(typecode)
+        if end > len(self._view):
+            raise ValueError(f'Truncated graph file: {self.path}')
+        section: memoryview = self._view[self._position : end].cast(typecode)
+        self._position = end + -end % 8
+        return section
+
+    def __len__(self) -> int:
+        return len(self.pks)
+
+    @property
+    def nb_edges(self) -> int:
+        return len(self.neighbours)
+
+    def index(self, pk: int) -> Optional[int]:
+        '''Get the node index of an Artist pk (None if unknown).'''
+        return _index(self.pks, pk)
+
+    def name(self, index: int) -> str:
+        start, end = self._name_offsets[index], self._name_offsets[index + 1]
+        return bytes(self._names[start:end]).decode()
+
+    def slug(self, index: int) -> str:
+        start, end = self._slug_offsets[index], self._slug_offsets[index + 1]
+        return bytes(self._slugs[start:end]).decode()
+
+    def snapshot(self) -> GraphSnapshot:
+        '''Get the in-memory graph, sharing the mapped arrays.'''
+        return GraphSnapshot(self.pks, self.offsets, self.neighbours)
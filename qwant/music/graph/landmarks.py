@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+'''
+Module containing the landmark (ALT) index used by the A* path search.
+The hop distances from a few well connected Artists (the landmarks) to every
+Artist give, by the triangle inequality, a lower bound of the distance between
+any two Artists: |d(L, a) - d(L, b)| <= d(a, b). The distances are stored one
+byte per Artist, indexed by pk.
+The bound only holds for the graph the distances were computed on (or a graph
+with more relations): each process computes them from its graph snapshot, and
+the A* search walks that same snapshot.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from __future__ import annotations
+from array import array
+from heapq import heappop, heappush
+from typing import (
+    Callable,
+    Dict,
+    Final,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
+import time
+from qwant.music.graph.bfs import Neighbours, Visited, join_paths
+from qwant.music.graph.snapshot import Edge, GraphSnapshot
+
+UNKNOWN: Final[int] = 255  # Unreachable, or unknown when the index was built
+
+Heuristic = Callable[[int], int]  # Type alias
+
+
+class LandmarkIndex:
+    '''Hop distances from each landmark to every Artist.
+
+    Attributes:
+        distances: The distances by Artist pk, by landmark pk
+        graph: The graph snapshot the distances were computed from (if any)
+        built_at: When the index was loaded (time.monotonic)
+    '''
+
+    def __init__(
+        self,
+        distances: Dict[int, array],
+        graph: Optional[GraphSnapshot] = None,
+    ) -> None:
+        self.distances: Dict[int, array] = distances
+        self.graph: Optional[GraphSnapshot] = graph
+        self.built_at: float = time.monotonic()
+
+    @classmethod
+    def build(
+        cls, snapshot: GraphSnapshot, landmarks: Iterable[int]
+    ) -> LandmarkIndex:
+        '''Compute the distances from each landmark with a breadth-first
+        search over the graph snapshot (the relations added to it
+        included).
+
+        Params:
+            snapshot: The graph snapshot
+            landmarks: The pks of the landmarks (those without similar
+                Artists in the snapshot are skipped)
+
+        Returns:
+            The built index
+        '''
+        size: int = snapshot.max_pk + 1
+        distances: Dict[int, array] = {}
+        for landmark in landmarks:
+            if landmark >= size:
+                continue
+            by_pk: array = array('B', [UNKNOWN]) * size
+            by_pk[landmark] = 0
+            # (pk, index in the snapshot) pairs, the index being None for
+            # the Artists only known by the relations added to the snapshot
+            frontier: List[Tuple[int, Optional[int]]] = [
+                (landmark, snapshot.index(landmark))
+            ]
+            depth: int = 0
+            while frontier and depth < UNKNOWN - 1:
+                depth += 1
+                next_frontier: List[Tuple[int, Optional[int]]] = []
+                for pk, index in frontier:
+                    if index is not None:
+                        for neighbour in snapshot.neighbours[
+                            snapshot.offsets[index] : snapshot.offsets[
+                                index + 1
+                            ]
+                        ]:
+                            sim: int = snapshot.pks[neighbour]
+                            if by_pk[sim] == UNKNOWN:
+                                by_pk[sim] = depth
+                                next_frontier.append((sim, neighbour))
+                    for sim in snapshot.added(pk):
+                        if by_pk[sim] == UNKNOWN:
+                            by_pk[sim] = depth
+                            next_frontier.append((sim, snapshot.index(sim)))
+                frontier = next_frontier
+            if depth > 1:  # Skip the deleted or isolated landmarks
+                distances[landmark] = by_pk
+        return cls(distances, snapshot)
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    def distance(self, landmark: int, pk: int) -> int:
+        '''Get the distance from a landmark to an Artist (or UNKNOWN).'''
+        by_pk: array = self.distances[landmark]
+        return by_pk[pk] if pk < len(by_pk) else UNKNOWN
+
+    def heuristic(self, target: int) -> Heuristic:
+        '''Get the lower bound of the distance from any Artist to a target.
+
+        Params:
+            target: The target pk
+
+        Returns:
+            The function giving the lower bound for an Artist pk
+        '''
+        bounds: List[Tuple[array, int]] = [
+            (by_pk, self.distance(landmark, target))
+            for landmark, by_pk in self.distances.items()
+            if self.distance(landmark, target) != UNKNOWN
+        ]
+
+        def lower_bound(pk: int) -> int:
+            bound: int = 0
+            for by_pk, to_target in bounds:
+                if pk < len(by_pk) and (distance := by_pk[pk]) != UNKNOWN:
+                    bound = max(bound, abs(distance - to_target))
+            return bound
+
+        return lower_bound
+
+    def add_edges(
+        self, edges: Iterable[Edge], neighbours: Neighbours
+    ) -> Set[int]:
+        '''Patch the index with new relations. A relation between two
+        Artists whose distances differ by more than one hop shortens some
+        distances, and so does an unknown Artist linking Artists whose
+        distances differ by more than two hops: the landmark is then
+        invalidated and dropped. Otherwise the unknown Artist gets its
+        distance from its known similar Artists.
+        The relations have to be added to the graph snapshot of the index
+        as well, so that the distances stay the ones of that snapshot.
+
+        Params:
+            edges: The (from pk, to pk) relations added
+            neighbours: Function returning the neighbours of several nodes
+
+        Returns:
+            The pks of the invalidated landmarks
+        '''
+        edges = list(edges)
+        unknown: List[int] = sorted(
+            {
+                pk
+                for edge in edges
+                for pk in edge
+                for landmark in self.distances
+                if self.distance(landmark, pk) == UNKNOWN
+            }
+        )
+        sims: Mapping[int, Iterable[int]] = (
+            neighbours(unknown) if unknown else {}
+        )
+        invalid: Set[int] = set()
+        for landmark, by_pk in self.distances.items():
+            for a, b in edges:
+                to_a: int = self.distance(landmark, a)
+                to_b: int = self.distance(landmark, b)
+                if to_a != UNKNOWN and to_b != UNKNOWN:
+                    if abs(to_a - to_b) > 1:
+                        invalid.add(landmark)
+                    continue
+                for pk in (a, b):
+                    known: List[int] = [
+                        distance
+                        for sim in sims.get(pk, ())
+                        if (distance := self.distance(landmark, sim))
+                        != UNKNOWN
+                    ]
+                    if self.distance(landmark, pk) != UNKNOWN or not known:
+                        continue
+                    if max(known) - min(known) > 2:
+                        invalid.add(landmark)
+                    if pk >= len(by_pk):
+                        by_pk.extend([UNKNOWN] * (pk + 1 - len(by_pk)))
+                    by_pk[pk] = min(min(known) + 1, UNKNOWN - 1)
+        for landmark in invalid:
+            del self.distances[landmark]
+        return invalid
+
+
+def select_landmarks(snapshot: GraphSnapshot, count: int) -> List[int]:
+    '''Pick the Artists with the most similar Artists as landmarks,
+    skipping the direct neighbours of the already picked ones to spread
+    the landmarks over the graph.
+
+    Params:
+        snapshot: The graph snapshot
+        count: The number of landmarks to pick
+
+    Returns:
+        The pks of the landmarks
+    '''
+    landmarks: List[int] = []
+    excluded: Set[int] = set()
+    for index in sorted(
+        range(len(snapshot)), key=snapshot.degree, reverse=True
+    ):
+        if len(landmarks) == count or snapshot.degree(index) == 0:
+            break
+        if index in excluded:
+            continue
+        landmarks.append(snapshot.pks[index])
+        excluded.update(
+            snapshot.neighbours[
+                snapshot.offsets[index] : snapshot.offsets[index + 1]
+            ]
+        )
+    return landmarks
+
+
+def astar_search(
+    source: int,
+    target: int,
+    neighbours: Neighbours,
+    heuristic: Heuristic,
+    *,
+    max_hops: int,
+    max_nodes: int,
+) -> Tuple[List[int], int]:
+    '''Search for the shortest path between two nodes with A*, guided by
+    a lower bound of the distance to the target.
+
+    Params:
+        source: The pk to start from
+        target: The pk to reach
+        neighbours: Function returning the neighbours of a whole frontier
+        heuristic: Function returning a lower bound of the distance
+            from a node to the target
+        max_hops: The maximum length of the path to look for
+        max_nodes: The maximum number of nodes to expand before giving up
+
+    Returns:
+        The pks from source to target (or empty if no path found within
+        the budget) and the number of expanded nodes
+    '''
+    visited: Visited = {source: (None, 0)}
+    queue: List[Tuple[int, int, int]] = [(heuristic(source), 0, source)]
+    closed: Set[int] = set()
+    while queue and len(closed) < max_nodes:
+        _, depth, node = heappop(queue)
+        depth = -depth  # Deepest first among the equal estimates
+        if node == target:
+            path: List[int] = join_paths(target, visited, {target: (None, 0)})
+            return path, len(closed)
+        if node in closed:
+            continue
+        closed.add(node)
+        for sim in neighbours([node])[node]:
+            known: Optional[Tuple[Optional[int], int]] = visited.get(sim)
+            if known is not None and known[1] <= depth + 1:
+                continue
+            estimate: int = depth + 1 + heuristic(sim)
+            if estimate > max_hops:
+                continue
+            visited[sim] = (node, depth + 1)
+            heappush(queue, (estimate, -depth - 1, sim))
+    return [], len(closed)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+'''
+Module containing a compact in-memory copy of the similar artists graph.
+The graph is stored in Compressed Sparse Row (CSR) form: the neighbours of
+the node i are neighbours[offsets[i]:offsets[i + 1]], nodes being the indexes
+of the sorted Artist pks. Everything lives in flat arrays of machine integers
+(about 4 bytes per relation and 16 bytes per Artist).
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
+import threading
+import time
+
+Edge = Tuple[int, int]  # Type alias
+
+
+class GraphSnapshot:
+    '''Read-only adjacency of the similar artists graph, patchable with
+    the relations added after it was built. The added relations are
+    copied on write: the searches read them without any lock while
+    add_edges (called under the lock of SharedSnapshot) replaces them.
+
+    Attributes:
+        pks: The sorted Artist pks (the position of a pk is its node index)
+        offsets: The position of the first neighbour of each node
+        neighbours: The node indexes of the neighbours
+        built_at: When the snapshot was built (time.monotonic)
+    '''
+
+    def __init__(
+        self,
+        pks: Sequence[int],
+        offsets: Sequence[int],
+        neighbours: Sequence[int],
+    ) -> None:
+        self.pks: Sequence[int] = pks
+        self.offsets: Sequence[int] = offsets
+        self.neighbours: Sequence[int] = neighbours
+        self.built_at: float = time.monotonic()
+        self._added: Dict[int, FrozenSet[int]] = {}
+        self._max_added: int = -1
+
+    @classmethod
+    def from_rows(
+        cls, pks: Iterable[int], edges: Iterable[Edge]
+    ) -> GraphSnapshot:
+        '''Build the snapshot in one pass over the rows of the database.
+
+        Params:
+            pks: All the Artist pks, sorted
+            edges: All the (from pk, to pk) relations, sorted by from pk
+
+        Returns:
+            The built snapshot
+        '''
+        nodes: array = array('q', pks)
+        offsets: array = array('q', [0])
+        neighbours: array = array('i' if len(nodes) < 2 ** 31 else 'q')
+        node: int = 0
+        for from_pk, to_pk in edges:
+            while node < len(nodes) and nodes[node] < from_pk:
+                offsets.append(len(neighbours))
+                node += 1
+            if node == len(nodes) or nodes[node] != from_pk:
+                continue  # Artist created while streaming the relations
+            if (index := _index(nodes, to_pk)) is not None:
+                neighbours.append(index)
+        while len(offsets) <= len(nodes):
+            offsets.append(len(neighbours))
+        return cls(nodes, offsets, neighbours)
+
+    def __len__(self) -> int:
+        return len(self.pks)
+
+    @property
+    def nb_edges(self) -> int:
+        '''The number of (directed) relations held by the arrays.'''
+        return len(self.neighbours)
+
+    @property
+    def nbytes(self) -> int:
+        '''The memory used by the arrays.'''
+        return sum(
+            len(values) * values.itemsize  # type: ignore
+            for values in (self.pks, self.offsets, self.neighbours)
+        )
+
+    @property
+    def age(self) -> float:
+        '''How many seconds ago the snapshot was built.'''
+        return time.monotonic() - self.built_at
+
+    @property
+    def max_pk(self) -> int:
+        '''The greatest Artist pk, the added relations included (-1 if
+        none).'''
+        return max(self.pks[-1] if len(self.pks) else -1, self._max_added)
+
+    def index(self, pk: int) -> Optional[int]:
+        '''Get the node index of an Artist pk (None if unknown).'''
+        return _index(self.pks, pk)
+
+    def degree(self, index: int) -> int:
+        '''Get the number of neighbours of a node.'''
+        return self.offsets[index + 1] - self.offsets[index]
+
+    def added(self, pk: int) -> FrozenSet[int]:
+        '''Get the similar Artists pks added to the snapshot for an Artist
+        (see add_edges).'''
+        return self._added.get(pk, frozenset())
+
+    def similar_pks(self, pks: Sequence[int]) -> Dict[int, List[int]]:
+        '''Get the similar Artists pks of several Artists at once.
+
+        Params:
+            pks: The Artists pks
+
+        Returns:
+            The similar Artists pks by Artist pk
+        '''
+        similar: Dict[int, List[int]] = {}
+        for pk in pks:
+            sims: List[int] = []
+            if (index := self.index(pk)) is not None:
+                sims.extend(
+                    self.pks[i]
+                    for i in self.neighbours[
+                        self.offsets[index] : self.offsets[index + 1]
+                    ]
+                )
+            if added := self._added.get(pk):
+                sims.extend(added.difference(sims))
+            similar[pk] = sims
+        return similar
+
+    def add_edges(self, edges: Iterable[Edge]) -> None:
+        '''Patch the snapshot with new relations (in both directions).
+
+        Params:
+            edges: The (from pk, to pk) relations to add
+        '''
+        added: Dict[int, Set[int]] = {}
+        for from_pk, to_pk in edges:
+            added.setdefault(from_pk, set()).add(to_pk)
+            added.setdefault(to_pk, set()).add(from_pk)
+        for pk, sims in added.items():
+            self._added[pk] = self._added.get(pk, frozenset()).union(sims)
+        self._max_added = max(self._max_added, max(added, default=-1))
+
+
+class Snapshot(Protocol):
+    '''In-memory data built from the database, patchable with the
+    relations added after it was built.'''
+
+    built_at: float
+
+    def add_edges(self, edges: Iterable[Edge], *args: Any) -> Any:
+        ...
+
+
+S = TypeVar('S', bound=Snapshot)
+
+
+class SharedSnapshot(Generic[S]):
+    '''Holder of a snapshot shared by the whole worker process.
+    The snapshot is built on first use, patched with the relations added by
+    this process and rebuilt once older than max_age (to catch the relations
+    added by the other processes).
+
+    Attributes:
+        loader: The function building a new snapshot
+        max_age: The number of seconds before rebuilding the snapshot
+        current: An optional function telling whether a snapshot is still
+            current, besides its age (rebuilt if not)
+    '''
+
+    def __init__(
+        self,
+        loader: Callable[[], S],
+        *,
+        max_age: float,
+        current: Optional[Callable[[S], bool]] = None,
+    ) -> None:
+        self.loader: Callable[[], S] = loader
+        self.max_age: float = max_age
+        self.current: Optional[Callable[[S], bool]] = current
+        self._snapshot: Optional[S] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self) -> S:
+        '''Get the current snapshot, building it if needed.'''
+        snapshot: Optional[S] = self._snapshot
+        if (
+            snapshot is None
+            or time.monotonic() - snapshot.built_at > self.max_age
+            or (self.current is not None and not self.current(snapshot))
+        ):
+            with self._lock:
+                if self._snapshot is snapshot:
+                    self._snapshot = self.loader()
+                snapshot = self._snapshot
+        return snapshot  # type: ignore
+
+    def add_edges(self, edges: Iterable[Edge], *args: Any) -> Any:
+        '''Patch the current snapshot (if any) with new relations.
+
+        Returns:
+            What the snapshot returns (None if no current snapshot)
+        '''
+        with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot.add_edges(edges, *args)
+        return None
+
+    def invalidate(self) -> None:
+        '''Drop the current snapshot: the next use will rebuild it.'''
+        with self._lock:
+            self._snapshot = None
+
+
+def _index(pks: Sequence[int], pk: int) -> Optional[int]:
+    '''Find the position of a pk in the sorted pks.'''
+    index: int = bisect_left(pks, pk)
+    if index < len(pks) and pks[index] == pk:
+        return index
+    return None
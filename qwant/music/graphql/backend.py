@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from functools import partial
+from hashlib import sha256
+from typing import Any, List, Optional, Tuple
+import threading
+from django.conf import settings
+from graphql.backend import GraphQLBackend, GraphQLDocument
+from graphql.error import GraphQLError
+from graphql.execution import ExecutionResult, execute
+from graphql.language import ast
+from graphql.language.parser import parse
+from graphql.type import GraphQLSchema
+from graphql.validation import validate
+from .cost import CostAnalyser, QueryCost, check_cost
+
+
+def query_hash(query: str) -> str:
+    '''Get the SHA-256 hash of a query (hexadecimal, as sent by the clients
+    of the persisted queries).'''
+    return sha256(query.encode()).hexdigest()
+
+
+class PersistedQueryBackend(GraphQLBackend):
+    '''Backend keeping the last queries of the process parsed and validated,
+    by the hash of their text: a known query skips both steps, and can be
+    sent by its hash only (see QwantGraphQLView). Each execution is checked
+    against the depth and cost limits first (see CostAnalyser), with the
+    settings of the moment (QWANT_GRAPHQL_*).
+
+    Attributes:
+        max_size: The number of queries kept, the least recently used
+            being dropped first
+    '''
+
+    def __init__(self, *, max_size: int) -> None:
+        self.max_size: int = max_size
+        self._documents: 'OrderedDict[Tuple[int, str], GraphQLDocument]'
+        self._documents = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def document_from_string(
+        self, schema: GraphQLSchema, query: str
+    ) -> GraphQLDocument:
+        '''Get a query parsed and validated, from the cache if known.
+
+        Params:
+            schema: The schema of the query
+            query: The text of the query
+
+        Returns:
+            The document of the query (executing it returns its validation
+            errors, if any)
+
+        Raises:
+            GraphQLSyntaxError: If the query cannot be parsed
+        '''
+        key: Tuple[int, str] = (id(schema), query_hash(query))
+        if document := self._get(key):
+            return document
+        document_ast: ast.Document = parse(query)
+        document = GraphQLDocument(
+            schema=schema,
+            document_string=query,
+            document_ast=document_ast,
+            execute=partial(
+                self._execute,
+                schema,
+                document_ast,
+                validate(schema, document_ast),
+            ),
+        )
+        with self._lock:
+            self._documents[key] = document
+            while len(self._documents) > self.max_size:
+                self._documents.popitem(last=False)
+        return document
+
+    def document_from_hash(
+        self, schema: GraphQLSchema, sha: str
+    ) -> Optional[GraphQLDocument]:
+        '''Get a query known by the process from its hash, if any.'''
+        return self._get((id(schema), sha))
+
+    def clear(self) -> None:
+        '''Forget all the queries of the process.'''
+        with self._lock:
+            self._documents.clear()
+
+    def _get(self, key: Tuple[int, str]) -> Optional[GraphQLDocument]:
+        with self._lock:
+            if document := self._documents.get(key):
+                self._documents.move_to_end(key)
+            return document
+
+    @staticmethod
+    def _execute(
+        schema: GraphQLSchema,
+        document_ast: ast.Document,
+        errors: List[GraphQLError],
+        **options: Any,
+    ) -> ExecutionResult:
+        '''Execute a validated query, unless invalid or too expensive.'''
+        if errors:
+            return ExecutionResult(errors=errors, invalid=True)
+        cost: QueryCost = CostAnalyser(
+            schema,
+            list_sizes=settings.QWANT_GRAPHQL_LIST_SIZES,
+            list_size=settings.QWANT_GRAPHQL_LIST_SIZE,
+            field_costs=settings.QWANT_GRAPHQL_FIELD_COSTS,
+        ).analyse(
+            document_ast,
+            options.get('operation_name'),
+            options.get('variable_values'),
+        )
+        if error := check_cost(
+            cost,
+            max_depth=settings.QWANT_GRAPHQL_MAX_DEPTH,
+            max_cost=settings.QWANT_GRAPHQL_MAX_COST,
+        ):
+            return ExecutionResult(errors=[error], invalid=True)
+        return execute(schema, document_ast, **options)
+
+
+backend: PersistedQueryBackend = PersistedQueryBackend(
+    max_size=settings.QWANT_GRAPHQL_PERSISTED_QUERIES
+)
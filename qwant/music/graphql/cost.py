@@ -0,0 +1,210 @@
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Union
+from graphql.error import GraphQLError
+from graphql.language import ast
+from graphql.type import (
+    GraphQLList,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    GraphQLSchema,
+)
+
+Selections = Union[ast.SelectionSet, None]
+
+# The lists hold as many items as these arguments, or else as the items of
+# their list arguments (one path per pair of qwantPaths, for instance); the
+# arguments of a field which is not a list (a Relay connection) size the
+# lists of its fields (the edges)
+SIZE_ARGUMENTS: List[str] = ['first', 'limit']
+
+
+class QueryCost(NamedTuple):
+    '''The static cost of a query, before its execution.
+
+    Attributes:
+        depth: The number of nested fields, at most
+        cost: The number of fields returned (the lists being assumed to be
+            full) plus the extra costs of the expensive fields
+    '''
+
+    depth: int
+    cost: int
+
+
+class CostAnalyser:
+    '''Compute the cost of a query from its document only (see QueryCost),
+    the lists holding their first/limit argument or else an assumed size,
+    so that the queries fanning out over the similar Artists graph are
+    rejected before running any resolver. The introspection fields are
+    free.
+
+    Attributes:
+        schema: The schema of the queries
+        list_sizes: The assumed sizes of the lists, by 'Type.field'
+        list_size: The assumed size of the other lists
+        field_costs: The extra costs of the items of the fields, by
+            'Type.field' (those which may call the API, for instance)
+    '''
+
+    def __init__(
+        self,
+        schema: GraphQLSchema,
+        *,
+        list_sizes: Mapping[str, int],
+        list_size: int,
+        field_costs: Mapping[str, int],
+    ) -> None:
+        self.schema: GraphQLSchema = schema
+        self.list_sizes: Mapping[str, int] = list_sizes
+        self.list_size: int = list_size
+        self.field_costs: Mapping[str, int] = field_costs
+
+    def analyse(
+        self,
+        document: ast.Document,
+        operation_name: Optional[str] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> QueryCost:
+        '''Compute the cost of the operation of a (valid) document.
+
+        Params:
+            document: The parsed query
+            operation_name: The operation executed (if several)
+            variables: The values of the variables of the query
+
+        Returns:
+            The depth and the cost of the operation (0 if not found)
+        '''
+        fragments: Dict[str, ast.FragmentDefinition] = {}
+        operation: Optional[ast.OperationDefinition] = None
+        for definition in document.definitions:
+            if isinstance(definition, ast.FragmentDefinition):
+                fragments[definition.name.value] = definition
+            elif isinstance(definition, ast.OperationDefinition) and (
+                operation_name is None
+                or getattr(definition.name, 'value', None) == operation_name
+            ):
+                operation = operation or definition
+        if operation is None:
+            return QueryCost(0, 0)
+        root: Optional[GraphQLObjectType] = {
+            'query': self.schema.get_query_type(),
+            'mutation': self.schema.get_mutation_type(),
+            'subscription': self.schema.get_subscription_type(),
+        }[operation.operation]
+        return self._cost(
+            operation.selection_set, root, fragments, variables or {}, None
+        )
+
+    def _cost(
+        self,
+        selections: Selections,
+        parent: Any,
+        fragments: Dict[str, ast.FragmentDefinition],
+        variables: Dict[str, Any],
+        page: Optional[int],
+    ) -> QueryCost:
+        '''The cost of the fields selected once in an object (sizing its
+        lists with page, if not None).'''
+        depth: int = 0
+        cost: int = 0
+        for selection in selections.selections if selections else ():
+            nested: QueryCost
+            if isinstance(selection, ast.Field):
+                nested = self._field_cost(
+                    selection, parent, fragments, variables, page
+                )
+            else:
+                fragment: Union[ast.InlineFragment, ast.FragmentDefinition]
+                fragment = (
+                    selection
+                    if isinstance(selection, ast.InlineFragment)
+                    else fragments[selection.name.value]
+                )
+                nested = self._cost(
+                    fragment.selection_set,
+                    self.schema.get_type(fragment.type_condition.name.value)
+                    if fragment.type_condition
+                    else parent,
+                    fragments,
+                    variables,
+                    page,
+                )
+            depth = max(depth, nested.depth)
+            cost += nested.cost
+        return QueryCost(depth, cost)
+
+    def _field_cost(
+        self,
+        field: ast.Field,
+        parent: Any,
+        fragments: Dict[str, ast.FragmentDefinition],
+        variables: Dict[str, Any],
+        page: Optional[int],
+    ) -> QueryCost:
+        '''The cost of a field: itself, then its extra cost and the cost of
+        its fields for each item of its list (one if not a list).'''
+        if field.name.value.startswith('__'):
+            return QueryCost(0, 0)  # Introspection
+        definition: Any = getattr(parent, 'fields', {}).get(field.name.value)
+        if definition is None:
+            return QueryCost(1, 1)
+        key: str = f'{parent.name}.{field.name.value}'
+        field_type: Any = definition.type
+        given: Optional[int] = self._argument_size(field, variables)
+        list_size: int = next(
+            candidate
+            for candidate in (
+                given, page, self.list_sizes.get(key), self.list_size
+            )
+            if candidate is not None
+        )
+        size: int = 1
+        while isinstance(field_type, (GraphQLNonNull, GraphQLList)):
+            if isinstance(field_type, GraphQLList):
+                size *= list_size
+                given = None  # Sizes the list, not its fields
+            field_type = field_type.of_type
+        nested: QueryCost = self._cost(
+            field.selection_set, field_type, fragments, variables, given
+        )
+        return QueryCost(
+            nested.depth + 1,
+            1 + size * (self.field_costs.get(key, 0) + nested.cost),
+        )
+
+    @staticmethod
+    def _argument_size(
+        field: ast.Field, variables: Dict[str, Any]
+    ) -> Optional[int]:
+        '''The size given by the arguments of a field, if any.'''
+        sizes: List[int] = []
+        for argument in field.arguments or ():
+            value: Any = argument.value
+            if isinstance(value, ast.Variable):
+                value = variables.get(value.name.value)
+            elif isinstance(value, ast.IntValue):
+                value = int(value.value)
+            elif isinstance(value, ast.ListValue):
+                value = value.values
+            if argument.name.value in SIZE_ARGUMENTS:
+                if isinstance(value, int) and value >= 0:
+                    return value
+            elif isinstance(value, list):
+                sizes.append(len(value))
+        return max(sizes, default=None)
+
+
+def check_cost(
+    cost: QueryCost, *, max_depth: int, max_cost: int
+) -> Optional[GraphQLError]:
+    '''Get the error rejecting a query too deep or too expensive, if any.'''
+    if cost.depth > max_depth:
+        return GraphQLError(
+            f'Query too deep: {cost.depth} nested fields '
+            f'({max_depth} at most)'
+        )
+    if cost.cost > max_cost:
+        return GraphQLError(
+            f'Query too expensive: cost {cost.cost} ({max_cost} at most)'
+        )
+    return None
@@ -0,0 +1,54 @@
+from typing import Any, Dict, List, Optional, Union
+from promise import Promise
+from promise.dataloader import DataLoader
+import requests
+from qwant.music.models import Artist
+
+
+class SimilarArtistsLoader(DataLoader):
+    '''Batch the similarArtists of the Artists resolved at the same level
+    of a query into one query (see Artist.similar_artists_of).'''
+
+    def batch_load_fn(self, pks: List[int]) -> Promise:
+        similar: Dict[int, List[Artist]] = Artist.similar_artists_of(pks)
+        return Promise.resolve([similar[pk] for pk in pks])
+
+
+class ArtistLoader(DataLoader):
+    '''Batch the qwantArtist lookups of a query into one query by slug,
+    searching the unknown Artists one by one (see Artist.search_or_add).
+    A failed API call only fails the lookup of its own name.'''
+
+    def batch_load_fn(self, names: List[str]) -> Promise:
+        slugs: Dict[str, str] = dict(zip(names, Artist.name_to_slugs(names)))
+        found: Dict[str, Artist] = Artist.objects.in_bulk(
+            set(slugs.values()), field_name='slug'
+        )
+        return Promise.resolve(
+            [found.get(slugs[name]) or self.search(name) for name in names]
+        )
+
+    @staticmethod
+    def search(name: str) -> Union[Artist, None, requests.RequestException]:
+        '''Search an unknown Artist, the API error being returned (so that
+        the DataLoader rejects this name only).'''
+        try:
+            return Artist.search_or_add(name)
+        except requests.RequestException as error:
+            return error
+
+
+class Loaders:
+    '''The DataLoaders of one request (their cache lives as long as it).'''
+
+    def __init__(self) -> None:
+        self.similar_artists: SimilarArtistsLoader = SimilarArtistsLoader()
+        self.artists: ArtistLoader = ArtistLoader()
+
+
+def get_loaders(context: Any) -> Loaders:
+    '''Get the DataLoaders of a request, created on first use.'''
+    loaders: Optional[Loaders] = getattr(context, 'loaders', None)
+    if loaders is None:
+        loaders = context.loaders = Loaders()
+    return loaders
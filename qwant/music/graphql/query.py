@@ -1,25 +1,144 @@
 from __future__ import annotations
-from typing import Any, Optional
-from django.db.models.manager import BaseManager
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from graphql.error import GraphQLError
 from graphql.execution.base import ResolveInfo
+from promise import Promise
 import graphene
-from qwant.music.models import Artist
-from .types import ArtistType
+from qwant.music.models import Artist, ArtistPath
+from .loaders import get_loaders
+from .types import (
+    ArtistConnection,
+    ArtistPairInput,
+    ArtistPathType,
+    ArtistType,
+    ComponentType,
+    SuggestionType,
+    artist_cursor,
+    parse_artist_cursor,
+)
 
 
 class Query(graphene.ObjectType):
     qwant_artist: graphene.Field = graphene.Field(
         ArtistType, slug=graphene.String(), name=graphene.String()
     )
-    qwant_artists: graphene.List = graphene.List(
-        ArtistType, limit=graphene.Int()
+    qwant_artists: graphene.Field = graphene.Field(
+        ArtistConnection, first=graphene.Int(), after=graphene.String()
+    )
+    qwant_paths: graphene.List = graphene.List(
+        ArtistPathType,
+        pairs=graphene.List(graphene.NonNull(ArtistPairInput), required=True),
+        timeout=graphene.Float(),
+    )
+    qwant_components: graphene.List = graphene.List(
+        ComponentType, limit=graphene.Int()
+    )
+    qwant_autocomplete: graphene.List = graphene.List(
+        SuggestionType,
+        prefix=graphene.String(required=True),
+        limit=graphene.Int(),
     )
 
-    def resolve_qwant_artist(self, info: ResolveInfo, **kwargs: Any) -> Artist:
+    def resolve_qwant_artist(
+        self, info: ResolveInfo, **kwargs: Any
+    ) -> Optional[Promise]:
         if artist_name := (kwargs.get('slug') or kwargs.get('name')):
-            return Artist.search_or_add(artist_name)
+            return get_loaders(info.context).artists.load(artist_name)
+        return None
 
     def resolve_qwant_artists(
+        self,
+        info: ResolveInfo,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ArtistConnection:
+        if first is not None and first < 0:
+            raise GraphQLError('first cannot be negative')
+        size: int = min(
+            settings.QWANT_GRAPHQL_PAGE_SIZE if first is None else first,
+            settings.QWANT_GRAPHQL_MAX_PAGE_SIZE,
+        )
+        cursor: Optional[Tuple[str, int]] = (
+            parse_artist_cursor(after) if after else None
+        )
+        # One more Artist tells whether there is a next page
+        artists: List[Artist] = Artist.page_by_name(size + 1, cursor)
+        edges: List[ArtistConnection.Edge] = [
+            ArtistConnection.Edge(node=artist, cursor=artist_cursor(artist))
+            for artist in artists[:size]
+        ]
+        return ArtistConnection(
+            edges=edges,
+            page_info=graphene.relay.PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=(
+                    cursor is not None and Artist.exists_by_name_until(cursor)
+                ),
+                has_next_page=len(artists) > size,
+            ),
+        )
+
+    def resolve_qwant_paths(
+        self,
+        info: ResolveInfo,
+        pairs: List[ArtistPairInput],
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> List[Optional[ArtistPath]]:
+        timeout = min(
+            max(
+                settings.QWANT_PATHS_BATCH_TIMEOUT
+                if timeout is None
+                else timeout,
+                0.0,
+            ),
+            settings.QWANT_PATHS_MAX_TIMEOUT,
+        )
+        artists: Dict[str, Artist] = Artist.objects.in_bulk(
+            {slug for pair in pairs for slug in (pair.source, pair.target)},
+            field_name='slug',
+        )
+        known: List[ArtistPairInput] = [
+            pair
+            for pair in pairs
+            if pair.source in artists and pair.target in artists
+        ]
+        paths: Dict[Tuple[str, str], ArtistPath] = {
+            (path.source.slug, path.target.slug): path
+            for path in Artist.paths_between(
+                [
+                    (artists[pair.source], artists[pair.target])
+                    for pair in known
+                ],
+                timeout=timeout,
+            )
+        }
+        return [paths.get((pair.source, pair.target)) for pair in pairs]
+
+    def resolve_qwant_autocomplete(
+        self,
+        info: ResolveInfo,
+        prefix: str,
+        limit: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[SuggestionType]:
+        return [
+            SuggestionType(id=suggestion.pk, name=suggestion.name)
+            for suggestion in Artist.autocomplete(
+                prefix,
+                min(limit or 10, settings.QWANT_AUTOCOMPLETE_MAX_LIMIT),
+            )
+        ]
+
+    def resolve_qwant_components(
         self, info: ResolveInfo, limit: Optional[int] = None, **kwargs: Any
-    ) -> BaseManager[Artist]:
-        return Artist.objects.all()[:limit]
+    ) -> List[ComponentType]:
+        return [
+            ComponentType(id=component, size=size)
+            for component, size in list(Artist.component_sizes().items())[
+                :limit
+            ]
+        ]
@@ -1,8 +1,14 @@
+from typing import Tuple
+import base64
+import json
 from django.urls import reverse
 from graphene_django.types import DjangoObjectType
+from graphql.error import GraphQLError
 from graphql.execution.base import ResolveInfo
+from promise import Promise
 import graphene
 from qwant.music.models import Artist
+from .loaders import get_loaders
 
 
 class ArtistType(DjangoObjectType):
@@ -18,3 +24,60 @@ class ArtistType(DjangoObjectType):
     def resolve_qwant_url(self, info: ResolveInfo) -> str:
         return self.qwant_url
 
+    def resolve_similar_artists(self, info: ResolveInfo) -> Promise:
+        return get_loaders(info.context).similar_artists.load(self.pk)
+
+
+class ArtistConnection(graphene.relay.Connection):
+    '''The Artists by name, page by page (see Artist.page_by_name).'''
+
+    class Meta:
+        node: type = ArtistType
+
+
+def artist_cursor(artist: Artist) -> str:
+    '''Get the opaque cursor of an Artist in the pages by name.'''
+    return base64.urlsafe_b64encode(
+        json.dumps([artist.name, artist.pk]).encode()
+    ).decode()
+
+
+def parse_artist_cursor(cursor: str) -> Tuple[str, int]:
+    '''Get the (name, pk) of the Artist of a cursor.
+
+    Raises:
+        GraphQLError: If the cursor was not made by artist_cursor
+    '''
+    try:
+        name, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError):
+        raise GraphQLError(f'Invalid cursor: {cursor}')
+    if not isinstance(name, str) or not isinstance(pk, int):
+        raise GraphQLError(f'Invalid cursor: {cursor}')
+    return name, pk
+
+
+class ArtistPairInput(graphene.InputObjectType):
+    source: graphene.String = graphene.String(required=True)
+    target: graphene.String = graphene.String(required=True)
+
+
+class ArtistPathType(graphene.ObjectType):
+    source: graphene.Field = graphene.Field(ArtistType)
+    target: graphene.Field = graphene.Field(ArtistType)
+    artists: graphene.List = graphene.List(ArtistType)
+    timed_out: graphene.Boolean = graphene.Boolean()
+
+
+class SuggestionType(graphene.ObjectType):
+    id: graphene.Int = graphene.Int()
+    name: graphene.String = graphene.String()
+    url: graphene.String = graphene.String()
+
+    def resolve_url(self, info: ResolveInfo) -> str:
+        return reverse('qwant:artist_detail', kwargs={'pk': self.id})
+
+
+class ComponentType(graphene.ObjectType):
+    id: graphene.Int = graphene.Int()
+    size: graphene.Int = graphene.Int()
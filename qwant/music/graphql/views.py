@@ -0,0 +1,86 @@
+from typing import Any, Dict, Optional
+import json
+from django.http import HttpRequest, HttpResponseBadRequest
+from graphene_django.views import GraphQLView, HttpError
+from graphql.backend import GraphQLDocument
+from graphql.error import GraphQLError
+from graphql.execution import ExecutionResult
+from .backend import backend, query_hash
+
+
+class QwantGraphQLView(GraphQLView):
+    '''The GraphQL endpoint, executing the queries through the persisted
+    queries backend (see PersistedQueryBackend) and following the automatic
+    persisted queries protocol of Apollo: a client sends the SHA-256 hash of
+    its query in extensions.persistedQuery.sha256Hash, alone first, then
+    with the query if it is unknown to the process (PersistedQueryNotFound).
+    '''
+
+    def __init__(self, **kwargs: Any) -> None:
+        kwargs.setdefault('backend', backend)
+        super().__init__(**kwargs)
+
+    def execute_graphql_request(
+        self,
+        request: HttpRequest,
+        data: Dict[str, Any],
+        query: Optional[str],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Optional[ExecutionResult]:
+        if (sha := self.get_persisted_hash(request, data)) is not None:
+            if query:
+                if query_hash(query) != sha:
+                    return ExecutionResult(
+                        errors=[
+                            GraphQLError('provided sha does not match query')
+                        ],
+                        invalid=True,
+                    )
+            else:
+                document: Optional[GraphQLDocument]
+                if not (
+                    document := self.backend.document_from_hash(
+                        self.schema, sha
+                    )
+                ):
+                    return ExecutionResult(
+                        errors=[
+                            GraphQLError(
+                                'PersistedQueryNotFound',
+                                extensions={
+                                    'code': 'PERSISTED_QUERY_NOT_FOUND'
+                                },
+                            )
+                        ],
+                    )
+                query = document.document_string
+        return super().execute_graphql_request(
+            request, data, query, *args, **kwargs
+        )
+
+    @staticmethod
+    def get_persisted_hash(
+        request: HttpRequest, data: Dict[str, Any]
+    ) -> Optional[str]:
+        '''Get the hash of the persisted query of a request, if any.
+
+        Raises:
+            HttpError: If the extensions are not valid JSON
+        '''
+        extensions: Any = request.GET.get('extensions') or data.get(
+            'extensions'
+        )
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(
+                    HttpResponseBadRequest('Extensions are invalid JSON.')
+                )
+        if not isinstance(extensions, dict):
+            return None
+        persisted: Any = extensions.get('persistedQuery')
+        if not isinstance(persisted, dict):
+            return None
+        return persisted.get('sha256Hash')
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+'''
+Module containing the bulk import of artists from JSON lines dumps (one API
+response per line, see ndjson), without calling the API. The dump is read
+line by line and written batch by batch, each batch in one transaction (see
+Artist.bulk_save_api_data): the memory used depends on the batch
+size, not on the size of the dump.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Callable, Dict, Iterable, List, Mapping
+import json
+import re
+import time
+from django.db import IntegrityError
+from qwant.music.models import Artist
+from qwant.music.types import APIData
+
+SLUG_PATTERN = re.compile(r'[-a-zA-Z0-9_]+')
+
+
+class InvalidRecord(ValueError):
+    '''A line of a dump which is not the data of an artist.'''
+
+
+def parse_record(line: bytes) -> APIData:
+    '''Parse and check a line of a dump: the artist and its similar artists
+    need an id and a name, their missing slugs are made from their name.
+
+    Params:
+        line: The JSON data of an artist
+
+    Returns:
+        The API data of the artist, with the known keys only
+
+    Raises:
+        InvalidRecord: The line is not the data of an artist
+    '''
+    try:
+        data: Any = json.loads(line)
+    except ValueError as error:
+        raise InvalidRecord(f'Invalid JSON ({error})') from None
+    if not isinstance(data, dict):
+        raise InvalidRecord('Not a JSON object')
+    record: Dict[str, Any] = _summary(data)
+    if isinstance(picture := data.get('picture'), str):
+        max_length: int = Artist._meta.get_field('picture').max_length
+        record['picture'] = picture[:max_length]
+    similar_artists: Any = data.get('similar_artists') or []
+    if not isinstance(similar_artists, list):
+        raise InvalidRecord(f'Invalid similar_artists (id {record["id"]})')
+    record['similar_artists'] = [
+        _summary(similar) for similar in similar_artists
+    ]
+    return record
+
+
+def _summary(data: Any) -> Dict[str, Any]:
+    '''Check the id, the name and the slug of an artist.'''
+    if not isinstance(data, Mapping):
+        raise InvalidRecord('Not a JSON object')
+    try:
+        api_id: int = int(data['id'])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidRecord('Missing or invalid id') from None
+    name: Any = data.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise InvalidRecord(f'Missing name (id {api_id})')
+    slug: Any = data.get('slug') or Artist.name_to_slug(name)
+    if (
+        not isinstance(slug, str)
+        or not SLUG_PATTERN.fullmatch(slug)
+        or len(slug) > Artist._meta.get_field('slug').max_length
+    ):
+        raise InvalidRecord(f'Invalid slug {slug!r} (id {api_id})')
+    max_length: int = Artist._meta.get_field('name').max_length
+    return {'id': api_id, 'name': name[:max_length], 'slug': slug}
+
+
+class ImportStats:
+    '''Progress of an import.
+
+    Attributes:
+        lines: The number of lines read
+        imported: The number of artists written (without their similar
+            artists)
+        invalid: The number of lines skipped
+        started: When the import started (time.monotonic)
+    '''
+
+    def __init__(self) -> None:
+        self.lines: int = 0
+        self.imported: int = 0
+        self.invalid: int = 0
+        self.started: float = time.monotonic()
+
+    @property
+    def seconds(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self) -> float:
+        '''The artists written per second.'''
+        return self.imported / (self.seconds or 1e-9)
+
+
+class Importer:
+    '''Bulk writer of the artists of a dump.
+
+    Attributes:
+        batch_size: The number of artists written per transaction
+        report_every: The seconds between two progress reports
+        report: Function printing the progress
+        warn: Function printing the invalid lines
+        stats: The progress of the current import
+    '''
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = 1000,
+        report_every: float = 5.0,
+        report: Callable[[str], Any] = print,
+        warn: Callable[[str], Any] = print,
+    ) -> None:
+        self.batch_size: int = batch_size
+        self.report_every: float = report_every
+        self.report: Callable[[str], Any] = report
+        self.warn: Callable[[str], Any] = warn
+        self.stats: ImportStats = ImportStats()
+
+    def run(self, lines: Iterable[bytes]) -> ImportStats:
+        '''Import the artists of the lines of a dump (blank lines skipped).
+
+        Params:
+            lines: The lines of the dump
+
+        Returns:
+            The final progress
+        '''
+        self.stats = ImportStats()
+        reported_at: float = self.stats.started
+        batch: List[APIData] = []
+        for number, line in enumerate(lines, 1):
+            self.stats.lines = number
+            if not line.strip():
+                continue
+            try:
+                batch.append(parse_record(line))
+            except InvalidRecord as error:
+                self._skip(f'Line {number}: {error}')
+                continue
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+                if time.monotonic() - reported_at >= self.report_every:
+                    self.report(
+                        f'{self.stats.imported} artists imported '
+                        f'({self.stats.rate:.0f}/s), '
+                        f'{self.stats.invalid} invalid lines'
+                    )
+                    reported_at = time.monotonic()
+        if batch:
+            self._write(batch)
+        return self.stats
+
+    def _write(self, batch: List[APIData]) -> None:
+        '''Write a batch at once, or artist by artist if it conflicts with
+        the database (a slug already taken by another API id).'''
+        try:
+            Artist.bulk_save_api_data(batch)
+        except IntegrityError:
+            for data in batch:
+                try:
+                    Artist.bulk_save_api_data([data])
+                except IntegrityError as error:
+                    self._skip(f'Artist {data["slug"]}: {error}')
+                    continue
+                self.stats.imported += 1
+        else:
+            self.stats.imported += len({data['id'] for data in batch})
+
+    def _skip(self, message: str) -> None:
+        self.stats.invalid += 1
+        self.warn(message)
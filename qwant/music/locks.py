@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+'''
+Module containing the per-key locks coalescing concurrent requests: the
+lookups of the same key wait for the first one, then find its result instead
+of repeating its work.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from contextlib import contextmanager
+from typing import Dict, Final, Iterator, List
+import threading
+import time
+import uuid
+from django.core.cache import BaseCache, caches
+
+
+class SingleFlight:
+    '''Per-key locks, held by one thread of one process at a time:
+    a threading lock inside the process, then a lock stored in a Django
+    cache shared by the processes (taken with the atomic cache.add).
+
+    Attributes:
+        alias: The name of the Django cache holding the shared locks
+        timeout: The seconds after which a shared lock is given up, by its
+            holder (it expires) and by the waiters (they go on without it)
+        poll: The seconds between two attempts to take a shared lock
+        waits: The number of times a lookup had to wait for another one
+    '''
+
+    PREFIX: Final[str] = 'qwant:lock:'
+
+    def __init__(
+        self, alias: str, *, timeout: float, poll: float = 0.05
+    ) -> None:
+        self.alias: str = alias
+        self.timeout: float = timeout
+        self.poll: float = poll
+        self.waits: int = 0
+        self._locks: Dict[str, List] = {}  # key => [lock, nb users]
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def cache(self) -> BaseCache:
+        return caches[self.alias]
+
+    @contextmanager
+    def __call__(self, key: str) -> Iterator[None]:
+        '''Hold the lock of a key.'''
+        with self._local_lock(key), self._shared_lock(key):
+            yield
+
+    @contextmanager
+    def _local_lock(self, key: str) -> Iterator[None]:
+        with self._lock:
+            entry: List = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            if not entry[0].acquire(blocking=False):
+                self.waits += 1
+                entry[0].acquire()
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    @contextmanager
+    def _shared_lock(self, key: str) -> Iterator[None]:
+        token: str = uuid.uuid4().hex
+        deadline: float = time.monotonic() + self.timeout
+        acquired: bool = self.cache.add(
+            self.PREFIX + key, token, timeout=self.timeout
+        )
+        if not acquired:
+            self.waits += 1
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(self.poll)
+            acquired = self.cache.add(
+                self.PREFIX + key, token, timeout=self.timeout
+            )
+        try:
+            yield
+        finally:
+            if acquired and self.cache.get(self.PREFIX + key) == token:
+                self.cache.delete(self.PREFIX + key)
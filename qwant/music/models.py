@@ -4,15 +4,59 @@ Module containing the models which collect and use the Qwant Music API data.
 Author: SebDeclercq (https://www.github.com/SebDeclercq)
 '''
 from __future__ import annotations
-from typing import Dict, Sequence
-from unicodedata import normalize
-import re
-from django.db import models
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import (
+    Callable,
+    Dict,
+    Final,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
+import time
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q
+from django.db.models.functions import Cast
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext as _
-from qwant.music.api import API
+from qwant.music.api import API, APIUnavailable
+from qwant.music.autocomplete import SharedPrefixIndex, Suggestion
+from qwant.music.cache import NegativeCache
+from qwant.music.graph.bfs import (
+    Neighbours,
+    bidirectional_search,
+    single_source_search,
+)
+from qwant.music.graph.components import UnionFind, connected_components
+from qwant.music.graph.cte import recursive_search
+from qwant.music.graph.export import Node, merge_rows
+from qwant.music.graph.landmarks import (
+    LandmarkIndex,
+    astar_search,
+    select_landmarks,
+)
+from qwant.music.graph.snapshot import GraphSnapshot, SharedSnapshot
+from qwant.music.locks import SingleFlight
+from qwant.music.slugs import SharedSlugRules
+from qwant.music.trigrams import min_shared, trigrams
 from qwant.music.types import APIData
 
+SNAPSHOT_CHUNK_SIZE: Final[int] = 10_000
+# The PostgreSQL advisory lock serialising the merges of components
+COMPONENTS_LOCK: Final[int] = 0x51C0_3E2D
+
+T = TypeVar('T')
+
 
 class Artist(models.Model):
     '''Class representing the Qwant Music API result in database.
@@ -22,6 +66,12 @@ class Artist(models.Model):
         slug: The artist slug.
         api_id: The ID of the artist in the Qwant Music API.
         similar_artists (optional): Similar artists listed by the API.
+        component (optional): The id of the connected component of the
+            similar artists graph the artist belongs to (None if unknown).
+        fetched_at (optional): When the artist was last fetched from the
+            API (None if only listed as a similar artist).
+        updated_at: When the artist was last written (the watermark of the
+            autocomplete index, see Artist.autocomplete).
     '''
 
     name: models.CharField = models.CharField(
@@ -37,29 +87,55 @@ class Artist(models.Model):
     similar_artists: models.ManyToManyField = models.ManyToManyField(
         'self', verbose_name=_('Similar Artists')
     )
+    component: models.IntegerField = models.IntegerField(
+        _('Component'), blank=True, null=True, db_index=True
+    )
+    fetched_at: models.DateTimeField = models.DateTimeField(
+        _('Fetched at'), blank=True, null=True
+    )
+    updated_at: models.DateTimeField = models.DateTimeField(
+        _('Updated at'), auto_now=True, db_index=True
+    )
 
     class Meta:
         verbose_name: str = _('artist')
         verbose_name_plural: str = _('artists')
+        indexes: List[models.Index] = [  # Covers the pages by name
+            models.Index(fields=['name', 'id'], name='qwant_artist_name_idx')
+        ]
 
     @classmethod
-    def create_from_api(cls, name: str) -> Artist:
+    def create_from_api(cls, name: str, *, reload: bool = False) -> Artist:
         '''Gather data from the Qwant Music API.
 
         Params:
             name: The artist name to find
+            reload: Ask the API even if its response is still cached
         
         Returns:
-            The Artist found
+            The Artist found (as it is in database if the API cannot be
+            called)
+
+        Raises:
+            APIUnavailable: The API cannot be called for a new Artist
         '''
         slug: str = cls.name_to_slug(name)
-        if data := API.get(slug):
+        try:
+            data: Optional[APIData] = API.get(slug, revalidate=reload)
+        except APIUnavailable:
+            if (artist := cls._lookup(slug)) is None:
+                raise
+            return artist
+        if data:
+            if reload:
+                not_found.discard(slug)
             return cls.create_from_api_data(**data)
+        not_found.add(slug)
 
     @classmethod
     def create_from_api_data(cls, **data: APIData) -> Artist:
         '''Parse the data provided by the Qwant Music API to
-        create a new Artist.
+        create a new Artist (see bulk_create_from_api_data).
 
         Params:
             data: APIData
@@ -67,36 +143,214 @@ class Artist(models.Model):
         Returns:
             Artist: the created instance
         '''
-        artist: Artist
-        artist, _ = Artist.objects.update_or_create(
-            api_id=int(data['id']),
-            defaults={
-                'name': data['name'],
-                'slug': data['slug'],
-                'picture': data.get('picture', ''),
-            },
+        return cls.bulk_create_from_api_data([data])[0]
+
+    @classmethod
+    def bulk_create_from_api_data(
+        cls, payloads: Iterable[APIData]
+    ) -> List[Artist]:
+        '''Create or update the Artists of several API responses and their
+        similar Artists in one transaction (see bulk_save_api_data).
+
+        Params:
+            payloads: The API data of the Artists
+
+        Returns:
+            The created or updated Artists, in the order of the payloads
+        '''
+        payloads = list(payloads)
+        pks: Dict[int, int] = cls.bulk_save_api_data(payloads)
+        artists: Dict[int, Artist] = Artist.objects.in_bulk(
+            [pks[int(data['id'])] for data in payloads]
         )
-        if similar_artists := data.get('similar_artists'):
-            for similar_artist in similar_artists:
-                cls._add_similar_artist(artist, similar_artist)
-        return artist
+        return [artists[pks[int(data['id'])]] for data in payloads]
 
     @classmethod
-    def _add_similar_artist(
-        cls, artist: Artist, similar_artist: Dict[str, str]
-    ) -> Artist:
-        '''Add a similar Artist to an Artist.
+    def bulk_save_api_data(cls, payloads: Iterable[APIData]) -> Dict[int, int]:
+        '''Create or update the Artists of several API responses and their
+        similar Artists in one transaction, with a handful of queries per
+        few hundred rows (as many as fit in the parameters of a query),
+        without reading the Artists back (see bulk_create_from_api_data).
+        1. Upsert all the Artists on their api_id (the similar Artists only
+           listed by the responses keep their picture, and are only written
+           when new or renamed)
+        2. Insert the missing relations, in both directions
+        3. Index the trigrams of the new or renamed Artists (see
+           ArtistTrigram), as the bulk inserts do not send post_save
+        4. Patch the in-memory data (see relations_added), as the bulk
+           inserts do not send the m2m_changed signal
 
         Params:
-            artist: The Artist for whom to add a similar Artist
-            similar_artist: The API Data for the similar Artist
+            payloads: The API data of the Artists
 
         Returns:
-            Artist: The updated Artist
+            The pks of the Artists and of their similar Artists, by api_id
+        '''
+        payloads = list(payloads)
+        now: datetime = timezone.now()
+        fetched: Dict[int, Artist] = {
+            int(data['id']): Artist(
+                api_id=int(data['id']),
+                name=data['name'],
+                slug=data['slug'],
+                picture=data.get('picture', ''),
+                fetched_at=now,
+                updated_at=now,
+            )
+            for data in payloads
+        }
+        listed: Dict[int, Artist] = {}
+        for data in payloads:
+            for similar in data.get('similar_artists') or ():
+                api_id: int = int(similar['id'])
+                if api_id not in fetched and api_id not in listed:
+                    listed[api_id] = Artist(
+                        api_id=api_id,
+                        name=similar['name'],
+                        slug=similar['slug'],
+                        picture='',
+                        updated_at=now,
+                    )
+        with transaction.atomic():
+            known: Dict[int, Tuple[str, str]] = {}
+            for api_ids in _chunks([*fetched, *listed]):
+                known.update(
+                    (api_id, (name, slug))
+                    for api_id, name, slug in Artist.objects.filter(
+                        api_id__in=api_ids
+                    ).values_list('api_id', 'name', 'slug')
+                )
+            cls._upsert(
+                list(fetched.values()),
+                ['name', 'slug', 'picture', 'fetched_at', 'updated_at'],
+            )
+            cls._upsert(  # Only the new or renamed ones (the hubs are many)
+                [
+                    artist
+                    for api_id, artist in listed.items()
+                    if known.get(api_id) != (artist.name, artist.slug)
+                ],
+                ['name', 'slug', 'updated_at'],
+            )
+            pks: Dict[int, int] = {}
+            for api_ids in _chunks([*fetched, *listed]):
+                pks.update(
+                    Artist.objects.filter(api_id__in=api_ids).values_list(
+                        'api_id', 'pk'
+                    )
+                )
+            cls._add_relations(
+                {
+                    (pks[int(data['id'])], pks[int(similar['id'])])
+                    for data in payloads
+                    for similar in data.get('similar_artists') or ()
+                }
+            )
+            ArtistTrigram.index(
+                (pks[api_id], artist.name)
+                for api_id, artist in {**listed, **fetched}.items()
+                if api_id not in known or known[api_id][0] != artist.name
+            )
+        return pks
+
+    @staticmethod
+    def _upsert(artists: List[Artist], fields: List[str]) -> None:
+        '''Insert Artists, updating the given fields of those whose api_id
+        already exists (with INSERT ... ON CONFLICT when the database and
+        Django support it, with a lookup and a bulk update otherwise).'''
+        if not artists:
+            return
+        if getattr(
+            connection.features, 'supports_update_conflicts_with_target', False
+        ):
+            Artist.objects.bulk_create(
+                artists,
+                update_conflicts=True,
+                unique_fields=['api_id'],
+                update_fields=fields,
+            )
+            return
+        existing: Dict[int, int] = {}
+        for api_ids in _chunks([artist.api_id for artist in artists]):
+            existing.update(
+                Artist.objects.filter(api_id__in=api_ids).values_list(
+                    'api_id', 'pk'
+                )
+            )
+        Artist.objects.bulk_create(
+            [artist for artist in artists if artist.api_id not in existing],
+            ignore_conflicts=True,
+        )
+        for artist in artists:
+            artist.pk = existing.get(artist.api_id)
+        Artist.objects.bulk_update(
+            [artist for artist in artists if artist.pk is not None], fields
+        )
+
+    @staticmethod
+    def _add_relations(edges: Set[Tuple[int, int]]) -> None:
+        '''Insert the missing similar Artists relations (in both directions,
+        as the relation is symmetrical) and patch the in-memory data with
+        the new ones.
+
+        Params:
+            edges: The (Artist pk, similar Artist pk) relations
+        '''
+        through: Type[models.Model] = Artist.similar_artists.through
+        existing: Set[Tuple[int, int]] = set()
+        # Both directions are always stored: reading the relations of the
+        # first Artists only spares those of the hubs they list
+        for pks in _chunks(sorted({a for a, _ in edges})):
+            existing.update(
+                through.objects.filter(from_artist_id__in=pks).values_list(
+                    'from_artist_id', 'to_artist_id'
+                )
+            )
+        if not (missing := edges - existing):
+            return
+        Artist._insert_relations(
+            sorted(missing | {(b, a) for a, b in missing})
+        )
+        Artist.relations_added(
+            sorted({(min(a, b), max(a, b)) for a, b in missing})
+        )
+
+    @staticmethod
+    def _insert_relations(rows: Sequence[Tuple[int, int]]) -> None:
+        '''Insert similar_artists rows, skipping those inserted concurrently
+        (see _insert_rows).'''
+        _insert_rows(
+            Artist.similar_artists.through,
+            ('from_artist', 'to_artist'),
+            rows,
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def relations_added(edges: Sequence[Tuple[int, int]]) -> None:
+        '''Patch the graph snapshot, the components and the landmarks (if
+        used) with new similar Artists relations. Removed relations only
+        drop the snapshot: the components are then only rebuilt by their
+        command, as an outdated component is too big but never wrong, and
+        the landmarks follow the snapshot (see Landmark.load_index).
+        The components are updated in the transaction of the relations,
+        the snapshot and the landmarks of the process once it is committed:
+        a rolled back relation never shows up in the paths.
+
+        Params:
+            edges: The (Artist pk, similar Artist pk) relations added
         '''
-        sim: Artist = cls.create_from_api_data(**similar_artist)
-        artist.similar_artists.add(sim)
-        return artist
+        edges = list(edges)
+        transaction.on_commit(lambda: Artist._relations_committed(edges))
+        Artist.merge_components(edges)
+
+    @staticmethod
+    def _relations_committed(edges: Sequence[Tuple[int, int]]) -> None:
+        '''Patch the in-memory data of the process with committed
+        relations (see relations_added).'''
+        graph_snapshot.add_edges(edges)
+        if settings.QWANT_PATH_LANDMARKS:  # Drops the shortened landmarks
+            landmark_index.add_edges(edges, Artist.similar_pks)
 
     def __str__(self):
         return self.slug
@@ -106,16 +360,21 @@ class Artist(models.Model):
 
     @property
     def qwant_url(self) -> str:
-        return API.BASE_URL.replace('api', 'www') + self.slug
+        return settings.QWANT_WEB_URL + self.slug
+
+    @property
+    def is_stale(self) -> bool:
+        '''Is the Artist due for a refresh? (never fetched itself, or more
+        than QWANT_ARTIST_MAX_AGE seconds ago)'''
+        return self.fetched_at is None or (
+            timezone.now() - self.fetched_at
+            > timedelta(seconds=settings.QWANT_ARTIST_MAX_AGE)
+        )
 
     @staticmethod
     def name_to_slug(name: str) -> str:
-        '''Create the slug based on the artist name.
-        1. Clean special characters from the Api.SPECIAL_CHARS
-        2. Normalize by removing diacritics
-        3. Pass the string to lower
-        4. Remove non expected characters
-        5. Remove multiple dashes
+        '''Create the slug based on the artist name, with the compiled
+        SpecialChar rules (see SlugRules.slugify).
 
         Params:
             name: The name to convert to slug
@@ -123,21 +382,63 @@ class Artist(models.Model):
         Returns:
             The formatted slug
         '''
-        for special_char in SpecialChar.objects.all():
-            name = name.replace(special_char.orig, special_char.dest)
-        name: str = (
-            normalize('NFKD', name).encode('ascii', 'ignore').decode()
+        return slug_rules.get().slugify(name)
+
+    @staticmethod
+    def name_to_slugs(
+        names: Iterable[str], *, workers: int = 1
+    ) -> Iterator[str]:
+        '''Create the slugs of many artist names at once, with the same
+        result as name_to_slug (see SlugRules.slugify_many).
+
+        Params:
+            names: The names to convert to slugs
+            workers: The number of processes converting them
+
+        Returns:
+            The formatted slugs, in the order of the names
+        '''
+        return slug_rules.get().slugify_many(names, workers=workers)
+
+    @staticmethod
+    def autocomplete(prefix: str, limit: int = 10) -> List[Suggestion]:
+        '''Complete the start of an artist name from the in-memory index of
+        the process (see qwant.music.autocomplete), without any query but
+        the periodic checks of the changes.
+
+        Params:
+            prefix: The start of the name
+            limit: The maximum number of Artists
+
+        Returns:
+            The Artists whose slugified names start like the prefix, in the
+            order of those
+        '''
+        if not (key := Artist.name_to_slug(prefix.strip())):
+            return []
+        return autocomplete_index.get().search(key, limit)
+
+    @staticmethod
+    def stream_names(
+        since: Optional[datetime] = None,
+    ) -> Iterator[Tuple[int, str, datetime]]:
+        '''Stream the (pk, name, updated_at) of the Artists written since a
+        date (all of them if None), chunk by chunk.'''
+        artists: models.QuerySet = Artist.objects.all()
+        if since is not None:
+            artists = artists.filter(updated_at__gte=since)
+        return artists.values_list('pk', 'name', 'updated_at').iterator(
+            chunk_size=SNAPSHOT_CHUNK_SIZE
         )
-        name = re.sub(r'\s+', '-', name.lower())
-        name = re.sub(r'[^-\w]', '', name)
-        name = re.sub(r'-+', '-', name)
-        return name
 
     @staticmethod
-    def search_or_add(artist_name: str) -> Artist:
+    def search_or_add(artist_name: str) -> Optional[Artist]:
         '''Get one Artist data from the API.
         1. Check if the Artist is already in database and return it if it does
-        2. Call the API otherwise.
+        2. Return None if the API recently did not know the Artist
+        3. Call the API otherwise, holding the lock of the slug: the
+           concurrent lookups of the same Artist (threads or processes)
+           wait for this call, then find its result at step 1 or 2.
  
         Params:
             artist_name: The name of the Artist to find
@@ -145,72 +446,764 @@ class Artist(models.Model):
         Returns:
             The found Artist
         '''
+        artist_slug: str = Artist.name_to_slug(artist_name)
+        if (artist := Artist._lookup(artist_slug)) is not None:
+            return artist
+        if artist_slug in not_found:
+            return None
+        with single_flight(artist_slug):
+            if (artist := Artist._lookup(artist_slug)) is not None:
+                return artist
+            if artist_slug in not_found:
+                return None
+            return Artist.create_from_api(artist_name)
+
+    @staticmethod
+    def _lookup(artist_slug: str) -> Optional[Artist]:
         try:
-            artist_slug: str = Artist.name_to_slug(artist_name)
             return Artist.objects.get(slug=artist_slug)
         except Artist.DoesNotExist:
-            return Artist.create_from_api(artist_name)
+            return None
+
+    @staticmethod
+    def fuzzy_search(
+        name: str, limit: int = 10, min_similarity: float = 0.0
+    ) -> List[FuzzyMatch]:
+        '''Find the Artists whose names are the closest to a name, ranked by
+        the similarity of their trigrams (see qwant.music.trigrams), from the
+        trigram index only (see ArtistTrigram).
+        A match sharing at least k of the n trigrams of the name holds one
+        of its n - k + 1 rarest trigrams: with a minimum similarity, only
+        the Artists holding those are ranked, instead of every Artist
+        sharing a common trigram (such as the first letter of a word).
+
+        Params:
+            name: The name to search for
+            limit: The maximum number of matches
+            min_similarity: The similarity of the matches at least (0 to 1)
+
+        Returns:
+            The matches, the closest first
+        '''
+        wanted: Set[str] = trigrams(Artist.name_to_slug(name))
+        if not wanted:
+            return []
+        needed: int = min_shared(len(wanted), min_similarity)
+        candidates: models.QuerySet = ArtistTrigram.objects.filter(
+            trigram__in=wanted
+        )
+        if needed > 1:
+            frequencies: Dict[str, int] = dict(
+                candidates.values('trigram')
+                .annotate(count=Count('pk'))
+                .values_list('trigram', 'count')
+            )
+            if len(frequencies) < needed:
+                return []
+            rarest: List[str] = sorted(frequencies, key=frequencies.get)
+            candidates = candidates.filter(
+                artist__in=ArtistTrigram.objects.filter(
+                    trigram__in=rarest[: len(rarest) - needed + 1]
+                ).values('artist')
+            )
+        rows: List[Dict] = list(
+            candidates.values('artist', 'nb_trigrams')
+            .annotate(
+                similarity=ExpressionWrapper(
+                    Cast(Count('pk'), FloatField())
+                    / (len(wanted) + F('nb_trigrams') - Count('pk')),
+                    output_field=FloatField(),
+                )
+            )
+            .filter(similarity__gte=min_similarity)
+            .order_by('-similarity', 'artist')[:limit]
+        )
+        artists: Dict[int, Artist] = Artist.objects.in_bulk(
+            [row['artist'] for row in rows]
+        )
+        return [
+            FuzzyMatch(artists[row['artist']], row['similarity'])
+            for row in rows
+            if row['artist'] in artists
+        ]
 
     def path_to(
-        self, other: Artist, *, nb_tryouts: int = 1
+        self,
+        other: Artist,
+        *,
+        max_hops: Optional[int] = None,
+        max_nodes: Optional[int] = None,
     ) -> Sequence[Artist]:
-        '''Search for a path between the Arist itself and an other Artist.
+        '''Search for the shortest path between the Artist itself
+        and an other Artist.
 
         Params:
             other: The Other Artist
-            nb_tryouts: An optional number of tryouts to run before giving up
-        
+            max_hops: An optional maximum length of the path
+                (default: settings.QWANT_PATH_MAX_HOPS)
+            max_nodes: An optional number of Artists to visit before giving up
+                (default: settings.QWANT_PATH_MAX_NODES, ignored by the
+                'cte' engine which only has a depth limit)
+
         Return:
             A tuple with all the Artist from the Artist itself
             to the other Artist (or empty if no path found)
         '''
-        if self._has_direct_relation_with(other):
-            return (self, other)
+        if max_hops is None:
+            max_hops = settings.QWANT_PATH_MAX_HOPS
+        if max_nodes is None:
+            max_nodes = settings.QWANT_PATH_MAX_NODES
+        components: Dict[int, Optional[int]] = Artist.components_of(
+            [self.pk, other.pk]
+        )
+        if not Artist._may_be_linked(components, self.pk, other.pk):
+            return ()
+        pks: List[int]
+        if settings.QWANT_GRAPH_ENGINE == 'cte':
+            pks = recursive_search(
+                Artist.similar_artists.through,
+                self.pk,
+                other.pk,
+                max_hops=max_hops,
+            )
+        elif (
+            settings.QWANT_GRAPH_ENGINE == 'snapshot'
+            and settings.QWANT_PATH_LANDMARKS
+            and (landmarks := landmark_index.get())
+        ):
+            pks, _ = astar_search(
+                self.pk,
+                other.pk,
+                landmarks.graph.similar_pks,  # type: ignore
+                landmarks.heuristic(other.pk),
+                max_hops=max_hops,
+                max_nodes=max_nodes,
+            )
         else:
-            relation = self._search_relation(
-                other, counter=0, nb_tryouts=nb_tryouts
+            pks = bidirectional_search(
+                self.pk,
+                other.pk,
+                Artist.graph_neighbours(),
+                max_hops=max_hops,
+                max_nodes=max_nodes,
+            )
+        artists: Dict[int, Artist] = Artist.objects.in_bulk(pks)
+        return tuple(artists[pk] for pk in pks)
+
+    @staticmethod
+    def paths_between(
+        pairs: Iterable[Tuple[Artist, Artist]],
+        *,
+        timeout: Optional[float] = None,
+        max_hops: Optional[int] = None,
+        max_nodes: Optional[int] = None,
+    ) -> Iterator[ArtistPath]:
+        '''Search for the shortest paths between many pairs of Artists.
+        The pairs are grouped by source Artist so that a single search
+        answers all the targets of a source. The paths are yielded as soon
+        as the search of their source is done.
+
+        Params:
+            pairs: The (source, target) Artists
+            timeout: An optional number of seconds for the whole batch
+                (the pairs not answered in time are marked as timed out)
+            max_hops: An optional maximum length of the paths
+                (default: settings.QWANT_PATH_MAX_HOPS)
+            max_nodes: An optional number of Artists to visit per source
+                (default: settings.QWANT_PATH_MAX_NODES)
+
+        Returns:
+            The paths, grouped by source Artist
+        '''
+        deadline: Optional[float] = (
+            time.monotonic() + timeout if timeout is not None else None
+        )
+        if max_hops is None:
+            max_hops = settings.QWANT_PATH_MAX_HOPS
+        if max_nodes is None:
+            max_nodes = settings.QWANT_PATH_MAX_NODES
+        targets: Dict[Artist, List[Artist]] = {}
+        pairs = list(pairs)
+        for source, target in pairs:
+            targets.setdefault(source, []).append(target)
+        components: Dict[int, Optional[int]] = Artist.components_of(
+            {artist.pk for pair in pairs for artist in pair}
+        )
+        neighbours: Neighbours = Artist.graph_neighbours()
+        for source, source_targets in targets.items():
+            paths: Dict[int, List[int]] = single_source_search(
+                source.pk,
+                [
+                    target.pk
+                    for target in source_targets
+                    if Artist._may_be_linked(components, source.pk, target.pk)
+                ],
+                neighbours,
+                max_hops=max_hops,
+                max_nodes=max_nodes,
+                deadline=deadline,
             )
-            if relation:
-                if nb_tryouts <= 1:
-                    return relation
-                else:
-                    return (self, *relation)
-        return ()
+            timed_out: bool = (
+                deadline is not None and time.monotonic() > deadline
+            )
+            artists: Dict[int, Artist] = Artist.objects.in_bulk(
+                {pk for path in paths.values() for pk in path}
+            )
+            for target in source_targets:
+                path: List[int] = paths.get(target.pk, [])
+                yield ArtistPath(
+                    source,
+                    target,
+                    tuple(artists[pk] for pk in path),
+                    timed_out and not path,
+                )
 
-    def _has_direct_relation_with(self, other: Artist) -> bool:
-        '''Check if the other Artist is directly linked to the Artist'''
-        return any(
-            a.api_id == other.api_id for a in self.similar_artists.all()
+    @staticmethod
+    def components_of(pks: Iterable[int]) -> Dict[int, Optional[int]]:
+        '''Get the component ids of several Artists at once.'''
+        return dict(
+            Artist.objects.filter(pk__in=pks).values_list('pk', 'component')
         )
 
-    def _search_relation(
-        self, other: Artist, *, counter: int = 0, nb_tryouts: int = 1
-    ) -> Sequence[Artist]:
-        '''Search for a relation by iterating on the similar artists.
-        The search is limited by a fixed number of tryouts otherwise
-        it'll raise a recursion error.
+    @staticmethod
+    def _may_be_linked(
+        components: Dict[int, Optional[int]], a: int, b: int
+    ) -> bool:
+        '''Check that two Artists are not known to be in different
+        components (a None component being unknown).'''
+        return (
+            components.get(a) is None
+            or components.get(b) is None
+            or components[a] == components[b]
+        )
+
+    @staticmethod
+    def merge_components(edges: Iterable[Tuple[int, int]]) -> None:
+        '''Update the component ids after adding similar Artists relations:
+        the components linked by the new relations are merged into the
+        biggest of them, the Artists without component joining it as well.
+        The merges are serialised (see _lock_components): two concurrent
+        merges of overlapping components could otherwise pick different
+        targets and split a component. Relations inside a known component
+        (the same ones again, for instance) cost a single query.
 
         Params:
-            other: The other Artist
-            counter: How many tryouts have already be done?
-            nb_tryouts: The number of tryouts to run
+            edges: The (Artist pk, similar Artist pk) relations added
+        '''
+        edges = list(edges)
+        pks: Set[int] = {pk for edge in edges for pk in edge}
+        components: Dict[int, Optional[int]] = Artist.components_of(pks)
+        if Artist._in_one_component(components):
+            return  # Components never split (until rebuilt)
+        with transaction.atomic(savepoint=False):
+            components = Artist._lock_components(pks, components)
+            sets: UnionFind[Tuple[str, int]] = UnionFind()
+            for a, b in edges:
+                sets.union(
+                    Artist._component_key(components, a),
+                    Artist._component_key(components, b),
+                )
+            sizes: Dict[int, int] = dict(
+                Artist.objects.filter(component__in=set(components.values()))
+                .values('component')
+                .annotate(size=models.Count('pk'))
+                .values_list('component', 'size')
+            )
+            for keys in sets.groups().values():
+                ids: List[int] = [
+                    key for kind, key in keys if kind == 'component'
+                ]
+                alone: List[int] = [
+                    key for kind, key in keys if kind == 'artist'
+                ]
+                target: int = (
+                    max(ids, key=sizes.__getitem__) if ids else min(alone)
+                )
+                if len(ids) == 1 and not alone:
+                    continue  # Relations inside a known component
+                Artist.objects.filter(
+                    models.Q(component__in=[i for i in ids if i != target])
+                    | models.Q(pk__in=alone)
+                ).update(component=target)
 
-        Return:
-            A tuple with all the Artist from the Artist itself
-            to the other Artist (or empty if no path found)
+    @staticmethod
+    def _in_one_component(components: Dict[int, Optional[int]]) -> bool:
+        '''Check that Artists all belong to the same known component.'''
+        return None not in components.values() and (
+            len(set(components.values())) == 1
+        )
+
+    @staticmethod
+    def _lock_components(
+        pks: Set[int], components: Dict[int, Optional[int]]
+    ) -> Dict[int, Optional[int]]:
+        '''Lock the components of Artists until the end of the transaction,
+        then get their component ids. On PostgreSQL, an advisory lock
+        serialises all the merges. Elsewhere, the Artists and the members
+        of their components are locked in pk order, again if a concurrent
+        merge moved the Artists meanwhile (SQLite serialises the writing
+        transactions anyway).
+
+        Params:
+            pks: The Artists pks
+            components: Their component ids, read before locking
+
+        Returns:
+            Their current component ids
         '''
-        for sim in self.similar_artists.all():
-            if sim._has_direct_relation_with(other):
-                return (self, sim, other)
-        if counter < nb_tryouts:
-            counter += 1
-            for sim in self.similar_artists.all():
-                relation = sim._search_relation(
-                    other, counter=counter, nb_tryouts=nb_tryouts
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s)', [COMPONENTS_LOCK]
+                )
+            return Artist.components_of(pks)
+        while True:
+            locked: Dict[int, Optional[int]] = dict(
+                Artist.objects.select_for_update()
+                .filter(
+                    models.Q(pk__in=pks)
+                    | models.Q(component__in=set(components.values()))
                 )
-                if relation:
-                    return relation
-        return ()
+                .order_by('pk')
+                .values_list('pk', 'component')
+            )
+            if {pk: locked.get(pk) for pk in components} == components:
+                return components
+            components = Artist.components_of(pks)
+
+    @staticmethod
+    def _component_key(
+        components: Dict[int, Optional[int]], pk: int
+    ) -> Tuple[str, int]:
+        '''The union-find key of an Artist: its component if known,
+        the Artist itself otherwise.'''
+        if (component := components.get(pk)) is not None:
+            return ('component', component)
+        return ('artist', pk)
+
+    @staticmethod
+    def component_sizes() -> Dict[int, int]:
+        '''Get the number of Artists of each component, biggest first.'''
+        return dict(
+            Artist.objects.exclude(component=None)
+            .values('component')
+            .annotate(size=models.Count('pk'))
+            .order_by('-size', 'component')
+            .values_list('component', 'size')
+        )
+
+    @staticmethod
+    def rebuild_components() -> Dict[int, List[int]]:
+        '''Recompute all the component ids from the similar_artists table.
+
+        Returns:
+            The Artist pks of each component, by component id
+        '''
+        components: Dict[int, List[int]] = connected_components(
+            Artist.build_snapshot()
+        )
+        batch_size: int = connection.features.max_query_params or 10_000
+        with transaction.atomic():
+            Artist.objects.exclude(component=None).update(component=None)
+            for component, pks in components.items():
+                for i in range(0, len(pks), batch_size):
+                    Artist.objects.filter(
+                        pk__in=pks[i : i + batch_size]
+                    ).update(component=component)
+        return components
+
+    @staticmethod
+    def similar_pks(pks: Sequence[int]) -> Dict[int, List[int]]:
+        '''Get the similar Artists pks of several Artists at once,
+        straight from the similar_artists table.
+
+        Params:
+            pks: The Artists pks
+
+        Returns:
+            The similar Artists pks by Artist pk
+        '''
+        similar: Dict[int, List[int]] = {pk: [] for pk in pks}
+        through: Type[models.Model] = Artist.similar_artists.through
+        for chunk in _chunks(list(pks)):
+            for from_pk, to_pk in through.objects.filter(
+                from_artist_id__in=chunk
+            ).values_list('from_artist_id', 'to_artist_id'):
+                similar[from_pk].append(to_pk)
+        return similar
+
+    @staticmethod
+    def similar_artists_of(pks: Sequence[int]) -> Dict[int, List[Artist]]:
+        '''Get the similar Artists of several Artists at once, with one
+        query joining the similar_artists table to the Artists (per few
+        hundred Artists), instead of one query per Artist.
+
+        Params:
+            pks: The Artists pks
+
+        Returns:
+            The similar Artists by Artist pk, ordered by pk
+        '''
+        similar: Dict[int, List[Artist]] = {pk: [] for pk in pks}
+        through: Type[models.Model] = Artist.similar_artists.through
+        for chunk in _chunks(list(similar)):
+            for row in (
+                through.objects.filter(from_artist_id__in=chunk)
+                .select_related('to_artist')
+                .order_by('from_artist_id', 'to_artist_id')
+            ):
+                similar[row.from_artist_id].append(row.to_artist)
+        return similar
+
+    @staticmethod
+    def page_by_name(
+        size: int, after: Optional[Tuple[str, int]] = None
+    ) -> List[Artist]:
+        '''Get a page of the Artists ordered by name (then pk), following
+        the last Artist of the previous page rather than skipping the
+        previous pages (keyset pagination, over the index on name and pk):
+        any page costs the same as the first one.
+
+        Params:
+            size: The number of Artists of the page, at most
+            after: The (name, pk) of the last Artist of the previous page
+                (None for the first page)
+
+        Returns:
+            The Artists of the page
+        '''
+        artists: models.QuerySet = Artist.objects.order_by('name', 'pk')
+        if after is not None:
+            name, pk = after
+            artists = artists.filter(
+                Q(name__gt=name) | Q(name=name, pk__gt=pk)
+            )
+        return list(artists[:size])
+
+    @staticmethod
+    def exists_by_name_until(until: Tuple[str, int]) -> bool:
+        '''Check if any Artist comes before a page by name, the one whose
+        (name, pk) is given included (see page_by_name).'''
+        name, pk = until
+        return Artist.objects.filter(
+            Q(name__lt=name) | Q(name=name, pk__lte=pk)
+        ).exists()
+
+    @staticmethod
+    def graph_neighbours() -> Neighbours:
+        '''Get the function giving the similar Artists pks, according to
+        settings.QWANT_GRAPH_ENGINE:
+        - database or cte: query the similar_artists table
+        - snapshot: read the in-memory graph snapshot of the process
+        '''
+        if settings.QWANT_GRAPH_ENGINE == 'snapshot':
+            return graph_snapshot.get().similar_pks
+        return Artist.similar_pks
+
+    def neighbourhood(self, depth: int = 1) -> Dict[int, int]:
+        '''Get the Artists close to the Artist itself.
+
+        Params:
+            depth: The maximum distance from the Artist itself
+
+        Returns:
+            The distance by Artist pk (the Artist itself included)
+        '''
+        neighbours: Neighbours = Artist.graph_neighbours()
+        distances: Dict[int, int] = {self.pk: 0}
+        frontier: List[int] = [self.pk]
+        for distance in range(1, depth + 1):
+            next_frontier: List[int] = []
+            for sims in neighbours(frontier).values():
+                for sim in sims:
+                    if sim not in distances:
+                        distances[sim] = distance
+                        next_frontier.append(sim)
+            frontier = next_frontier
+        return distances
+
+    def get_similar_artists(self) -> models.QuerySet[Artist]:
+        '''Get the similar Artists, ordered by name, using the graph engine
+        to find them.'''
+        if settings.QWANT_GRAPH_ENGINE != 'snapshot':
+            return self.similar_artists.order_by('name')
+        pks: List[int] = Artist.graph_neighbours()([self.pk])[self.pk]
+        return Artist.objects.filter(pk__in=pks).order_by('name')
+
+    @staticmethod
+    def build_snapshot() -> GraphSnapshot:
+        '''Build the in-memory graph snapshot by streaming the Artist pks
+        and the similar_artists table.'''
+        through: Type[models.Model] = Artist.similar_artists.through
+        return GraphSnapshot.from_rows(
+            Artist.objects.order_by('pk')
+            .values_list('pk', flat=True)
+            .iterator(chunk_size=SNAPSHOT_CHUNK_SIZE),
+            through.objects.order_by('from_artist_id')
+            .values_list('from_artist_id', 'to_artist_id')
+            .iterator(chunk_size=SNAPSHOT_CHUNK_SIZE),
+        )
+
+    @staticmethod
+    def stream_graph(
+        chunk_size: int = SNAPSHOT_CHUNK_SIZE,
+    ) -> Iterator[Node]:
+        '''Stream the Artists with the pks of their similar Artists,
+        reading the Artists and the similar_artists table side by side (two
+        cursors fetching chunk_size rows at a time, see merge_rows).'''
+        through: Type[models.Model] = Artist.similar_artists.through
+        return merge_rows(
+            Artist.objects.order_by('pk')
+            .values_list('pk', 'api_id', 'name', 'slug', 'picture')
+            .iterator(chunk_size=chunk_size),
+            through.objects.order_by('from_artist_id', 'to_artist_id')
+            .values_list('from_artist_id', 'to_artist_id')
+            .iterator(chunk_size=chunk_size),
+        )
+
+
+class ArtistPath(NamedTuple):
+    '''Result of the search for a path between two Artists.
+
+    Attributes:
+        source: The Artist the path starts from
+        target: The Artist the path goes to
+        artists: All the Artists from source to target (empty if not found)
+        timed_out: Was the search stopped before finding the path?
+    '''
+
+    source: Artist
+    target: Artist
+    artists: Sequence[Artist]
+    timed_out: bool
+
+
+class FuzzyMatch(NamedTuple):
+    '''Result of the fuzzy search of an Artist (see Artist.fuzzy_search).
+
+    Attributes:
+        artist: The Artist found
+        similarity: The similarity of its name with the searched one (0 to 1)
+    '''
+
+    artist: Artist
+    similarity: float
+
+
+class ArtistTrigram(models.Model):
+    '''Class storing the trigrams of the Artist names, the inverted index of
+    the fuzzy search (see Artist.fuzzy_search). The trigrams of the new or
+    renamed Artists are indexed when they are saved; changing the special
+    characters rules requires a rebuild (see the build_trigrams command).
+
+    Attributes:
+        trigram: One trigram of the name (see qwant.music.trigrams).
+        artist: The Artist whose name holds the trigram.
+        nb_trigrams: The number of trigrams of the name, stored with each
+            of them so that the similarity is computed from the index only.
+    '''
+
+    trigram: models.CharField = models.CharField(_('Trigram'), max_length=3)
+    artist: models.ForeignKey = models.ForeignKey(
+        Artist,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Artist'),
+    )
+    nb_trigrams: models.PositiveSmallIntegerField = (
+        models.PositiveSmallIntegerField(_('Number of trigrams'))
+    )
+
+    class Meta:
+        verbose_name: str = _('artist trigram')
+        verbose_name_plural: str = _('artist trigrams')
+        indexes: List[models.Index] = [  # Covers the fuzzy search
+            models.Index(
+                fields=['trigram', 'artist', 'nb_trigrams'],
+                name='qwant_trigram_search_idx',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.artist_id}: {self.trigram!r}'
+
+    @staticmethod
+    def index(artists: Iterable[Tuple[int, str]]) -> int:
+        '''Replace the trigrams of some Artists (with raw multi-row
+        INSERTs, see _insert_rows).
+
+        Params:
+            artists: The (pk, name) of the Artists
+
+        Returns:
+            The number of trigrams inserted
+        '''
+        if not (artists := list(artists)):
+            return 0
+        pks, names = zip(*artists)
+        rows: List[Tuple[str, int, int]] = []
+        for pk, slug in zip(pks, Artist.name_to_slugs(names)):
+            found: Set[str] = trigrams(slug)
+            rows.extend((trigram, pk, len(found)) for trigram in found)
+        rows.sort()  # In the order of the index: 5x faster for 200k names
+        with transaction.atomic():
+            for chunk in _chunks(pks):
+                ArtistTrigram.objects.filter(artist__in=chunk).delete()
+            _insert_rows(
+                ArtistTrigram, ('trigram', 'artist', 'nb_trigrams'), rows
+            )
+        return len(rows)
+
+    @staticmethod
+    def rebuild(chunk_size: int = SNAPSHOT_CHUNK_SIZE) -> Tuple[int, int]:
+        '''Index the trigrams of all the Artists again, chunk by chunk.
+
+        Returns:
+            The numbers of Artists and of trigrams indexed
+        '''
+        nb_artists: int = 0
+        nb_trigrams: int = 0
+        with transaction.atomic():
+            ArtistTrigram.objects.all().delete()
+            artists: Iterator[Tuple[int, str]] = (
+                Artist.objects.order_by('pk')
+                .values_list('pk', 'name')
+                .iterator(chunk_size)
+            )
+            while chunk := list(islice(artists, chunk_size)):
+                nb_artists += len(chunk)
+                nb_trigrams += ArtistTrigram.index(chunk)
+        return nb_artists, nb_trigrams
+
+
+class Landmark(models.Model):
+    '''Class storing the landmark Artists of the A* path search of the
+    'snapshot' graph engine. Their distances to every Artist are computed
+    by each process from its graph snapshot (see Landmark.load_index).
+
+    Attributes:
+        artist: The landmark Artist.
+        built_at: When the landmark was picked.
+    '''
+
+    artist: models.OneToOneField = models.OneToOneField(
+        Artist, on_delete=models.CASCADE, verbose_name=_('Artist')
+    )
+    built_at: models.DateTimeField = models.DateTimeField(
+        _('Built at'), auto_now=True
+    )
+
+    class Meta:
+        verbose_name: str = _('landmark')
+        verbose_name_plural: str = _('landmarks')
+
+    def __str__(self):
+        return str(self.artist)
+
+    @staticmethod
+    def build(count: int) -> LandmarkIndex:
+        '''Pick new landmarks, replacing the current ones.
+
+        Params:
+            count: The number of landmarks
+
+        Returns:
+            The index of the landmarks over the current graph
+        '''
+        snapshot: GraphSnapshot = Artist.build_snapshot()
+        index: LandmarkIndex = LandmarkIndex.build(
+            snapshot, select_landmarks(snapshot, count)
+        )
+        with transaction.atomic():
+            Landmark.objects.all().delete()
+            Landmark.objects.bulk_create(
+                Landmark(artist_id=pk) for pk in index.distances
+            )
+        landmark_index.invalidate()
+        return index
+
+    @staticmethod
+    def load_index() -> LandmarkIndex:
+        '''Compute the distances of the landmarks over the graph snapshot
+        of the process: the index is rebuilt with the snapshot (see
+        landmark_index), so that its lower bounds always hold for the
+        graph searched.'''
+        return LandmarkIndex.build(
+            graph_snapshot.get(),
+            Landmark.objects.order_by('pk').values_list(
+                'artist_id', flat=True
+            ),
+        )
+
+
+class RefreshJob(models.Model):
+    '''Class queuing the refreshes of Artists from the API, processed in
+    batches by the refresh worker (see qwant.music.refresh). A slug is
+    queued once: the refreshes asked while it waits are merged.
+
+    Attributes:
+        slug: The slug of the Artist to refresh.
+        queued_at: When the refresh was asked.
+        available_at: When the job can be taken by a worker (later while a
+            worker holds it, or before retrying a failed refresh).
+        attempts: The number of times the job was taken.
+    '''
+
+    slug: models.SlugField = models.SlugField(_('Slug'), unique=True)
+    queued_at: models.DateTimeField = models.DateTimeField(
+        _('Queued at'), auto_now_add=True
+    )
+    available_at: models.DateTimeField = models.DateTimeField(
+        _('Available at'), default=timezone.now, db_index=True
+    )
+    attempts: models.PositiveSmallIntegerField = (
+        models.PositiveSmallIntegerField(_('Attempts'), default=0)
+    )
+
+    class Meta:
+        verbose_name: str = _('refresh job')
+        verbose_name_plural: str = _('refresh jobs')
+
+    def __str__(self):
+        return self.slug
+
+    @staticmethod
+    def enqueue(slugs: Iterable[str]) -> None:
+        '''Queue the refresh of some Artists (once per slug).'''
+        RefreshJob.objects.bulk_create(
+            [RefreshJob(slug=slug) for slug in dict.fromkeys(slugs)],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def claim(size: int, *, lease: float) -> List[RefreshJob]:
+        '''Take the oldest available jobs for a while: they become available
+        again after `lease` seconds unless done (if the worker died).
+        The jobs are marked with the end of the lease, which tells the jobs
+        taken by this call from those taken concurrently by other workers.
+
+        Params:
+            size: The maximum number of jobs
+            lease: The seconds given to process them
+
+        Returns:
+            The jobs taken, oldest first
+        '''
+        now: datetime = timezone.now()
+        until: datetime = now + timedelta(seconds=lease)
+        pks: List[int] = list(
+            RefreshJob.objects.filter(available_at__lte=now)
+            .order_by('queued_at', 'pk')
+            .values_list('pk', flat=True)[:size]
+        )
+        RefreshJob.objects.filter(pk__in=pks, available_at__lte=now).update(
+            available_at=until, attempts=F('attempts') + 1
+        )
+        return list(
+            RefreshJob.objects.filter(pk__in=pks, available_at=until).order_by(
+                'queued_at', 'pk'
+            )
+        )
 
 
 class SpecialChar(models.Model):
@@ -229,3 +1222,87 @@ class SpecialChar(models.Model):
         _('Destination character'), max_length=50, blank=False, unique=True
     )
 
+
+slug_rules: SharedSlugRules = SharedSlugRules(
+    lambda: SpecialChar.objects.order_by('pk').values_list('orig', 'dest'),
+    alias=settings.QWANT_SLUG_RULES_CACHE,
+    check_every=settings.QWANT_SLUG_RULES_CHECK,
+    cache_size=settings.QWANT_SLUG_CACHE_SIZE,
+)
+
+
+autocomplete_index: SharedPrefixIndex = SharedPrefixIndex(
+    Artist.stream_names,
+    Artist.name_to_slugs,
+    check_every=settings.QWANT_AUTOCOMPLETE_CHECK,
+    max_age=settings.QWANT_AUTOCOMPLETE_MAX_AGE,
+)
+
+graph_snapshot: SharedSnapshot[GraphSnapshot] = SharedSnapshot(
+    Artist.build_snapshot, max_age=settings.QWANT_GRAPH_SNAPSHOT_MAX_AGE
+)
+
+landmark_index: SharedSnapshot[LandmarkIndex] = SharedSnapshot(
+    Landmark.load_index,
+    max_age=settings.QWANT_GRAPH_SNAPSHOT_MAX_AGE,
+    current=lambda index: index.graph is graph_snapshot.get(),
+)
+
+not_found: NegativeCache = NegativeCache(
+    settings.QWANT_NOT_FOUND_CACHE, ttl=settings.QWANT_NOT_FOUND_TTL
+)
+
+single_flight: SingleFlight = SingleFlight(
+    settings.QWANT_LOCK_CACHE, timeout=settings.QWANT_LOCK_TIMEOUT
+)
+
+
+def _insert_rows(
+    model: Type[models.Model],
+    fields: Sequence[str],
+    rows: Sequence[Sequence],
+    *,
+    ignore_conflicts: bool = False,
+) -> None:
+    '''Insert rows with raw multi-row INSERTs: building a model instance per
+    row costs much more than inserting it (10x for a bulk import).
+
+    Params:
+        model: The model of the table
+        fields: The names of the fields of the rows
+        rows: The values of the fields, row by row
+        ignore_conflicts: Skip the rows breaking a unique constraint (those
+            inserted concurrently)
+    '''
+    quote: Callable[[str], str] = connection.ops.quote_name
+    columns: str = ', '.join(
+        quote(model._meta.get_field(name).column) for name in fields
+    )
+    insert, suffix = 'INSERT INTO', ''
+    if ignore_conflicts:
+        insert, suffix = {
+            'sqlite': ('INSERT OR IGNORE INTO', ''),
+            'mysql': ('INSERT IGNORE INTO', ''),
+        }.get(connection.vendor, ('INSERT INTO', ' ON CONFLICT DO NOTHING'))
+    placeholders: str = f'({", ".join(["%s"] * len(fields))})'
+    with connection.cursor() as cursor:
+        for chunk in _chunks(rows, width=len(fields)):
+            cursor.execute(
+                f'{insert} {quote(model._meta.db_table)} ({columns}) '
+                f'VALUES {", ".join([placeholders] * len(chunk))}{suffix}',
+                [value for row in chunk for value in row],
+            )
+
+
+def _chunks(values: Sequence[T], width: int = 1) -> Iterator[Sequence[T]]:
+    '''Split values into slices fitting in the parameters of a query.
+
+    Params:
+        values: The values to split
+        width: The number of parameters of each value
+    '''
+    size: int = (
+        (connection.features.max_query_params or len(values) or 1) // width
+    ) or 1
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+'''
+Module reading and writing the JSON lines files of artists (one API response
+or one node of an exported graph per line), gzipped if their name ends with
+.gz. The files are streamed: the memory used does not depend on their size.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, Mapping
+import gzip
+import json
+from qwant.music.types import APIData
+
+
+def open_file(path: Path, mode: str) -> IO[bytes]:
+    '''Open a file in binary mode, through gzip if named *.gz.'''
+    if Path(path).suffix == '.gz':
+        return gzip.open(path, mode)  # type: ignore
+    return open(path, mode)
+
+
+def read_lines(path: Path) -> Iterator[APIData]:
+    '''Read the artists of a file, skipping the blank lines.'''
+    with open_file(path, 'rb') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_lines(path: Path, records: Iterable[Mapping[str, Any]]) -> int:
+    '''Write records to a file, one per line, and get their number.'''
+    count: int = 0
+    with open_file(path, 'wb') as file:
+        for count, record in enumerate(records, 1):
+            file.write(json.dumps(record).encode() + b'\n')
+    return count
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+'''
+Module containing the worker refreshing the Artists queued as RefreshJobs,
+so that the web requests never wait for the API to update an Artist: they
+queue a refresh and answer with the data at hand (stale-while-revalidate).
+The jobs are fetched from the API in parallel, batch by batch, each batch
+being written in one transaction (see Artist.bulk_create_from_api_data).
+The API is always asked again (with the validators of the cached response,
+if any), as a refresh is queued for a stale Artist or a reload.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from datetime import timedelta
+from typing import Any, Callable, Dict, List
+import asyncio
+import time
+from django.utils import timezone
+import requests
+from qwant.music.api import API, AsyncAPI, Fetched
+from qwant.music.models import Artist, RefreshJob
+from qwant.music.types import APIData
+
+
+class RefreshWorker:
+    '''Process consuming the refresh queue.
+
+    Attributes:
+        batch_size: The number of jobs taken at once
+        workers: The number of concurrent API calls
+        idle: The seconds waited when the queue is empty
+        lease: The seconds after which the jobs of a dead worker are
+            taken again
+        max_attempts: The number of failed refreshes before dropping a job
+        retry_delay: The seconds before retrying a failed refresh, doubled
+            at each attempt
+        report: Function printing the progress
+    '''
+
+    def __init__(
+        self,
+        *,
+        batch_size: int = 50,
+        workers: int = 8,
+        idle: float = 5.0,
+        lease: float = 300.0,
+        max_attempts: int = 5,
+        retry_delay: float = 60.0,
+        report: Callable[[str], Any] = print,
+    ) -> None:
+        self.batch_size: int = batch_size
+        self.workers: int = workers
+        self.idle: float = idle
+        self.lease: float = lease
+        self.max_attempts: int = max_attempts
+        self.retry_delay: float = retry_delay
+        self.report: Callable[[str], Any] = report
+
+    def run(self, *, once: bool = False) -> int:
+        '''Refresh the queued Artists, waiting for new jobs when the queue
+        is empty.
+
+        Params:
+            once: Stop when the queue is empty instead
+
+        Returns:
+            The number of Artists refreshed
+        '''
+        session: requests.Session = API.new_session(self.workers)
+        refreshed: int = 0
+        try:
+            while True:
+                jobs: List[RefreshJob] = RefreshJob.claim(
+                    self.batch_size, lease=self.lease
+                )
+                if jobs:
+                    refreshed += self._refresh_batch(jobs, session)
+                elif once:
+                    return refreshed
+                else:
+                    time.sleep(self.idle)
+        finally:
+            session.close()
+
+    def _refresh_batch(
+        self, jobs: List[RefreshJob], session: requests.Session
+    ) -> int:
+        '''Fetch a batch of jobs and write it.
+
+        Returns:
+            The number of Artists refreshed
+        '''
+        by_slug: Dict[str, RefreshJob] = {job.slug: job for job in jobs}
+        results: List[Fetched] = asyncio.run(self._fetch(by_slug, session))
+        payloads: Dict[int, APIData] = {
+            int(result.data['id']): result.data
+            for result in results
+            if result.data is not None
+        }
+        Artist.bulk_create_from_api_data(payloads.values())
+        failed: List[RefreshJob] = [
+            by_slug[result.slug] for result in results if result.error
+        ]
+        RefreshJob.objects.filter(
+            pk__in=[job.pk for job in jobs if job not in failed]
+        ).delete()
+        self._retry_later(failed)
+        self.report(
+            f'{len(payloads)} artists refreshed, '
+            f'{len(results) - len(payloads) - len(failed)} not found, '
+            f'{len(failed)} errors'
+        )
+        return len(payloads)
+
+    def _retry_later(self, jobs: List[RefreshJob]) -> None:
+        '''Make the failed jobs available again after an exponential delay,
+        or drop them after max_attempts.'''
+        dropped: List[int] = [
+            job.pk for job in jobs if job.attempts >= self.max_attempts
+        ]
+        RefreshJob.objects.filter(pk__in=dropped).delete()
+        for job in jobs:
+            if job.pk not in dropped:
+                delay: float = self.retry_delay * 2 ** (job.attempts - 1)
+                RefreshJob.objects.filter(pk=job.pk).update(
+                    available_at=timezone.now() + timedelta(seconds=delay)
+                )
+
+    async def _fetch(
+        self, slugs: Dict[str, RefreshJob], session: requests.Session
+    ) -> List[Fetched]:
+        return [
+            result
+            async for result in AsyncAPI.get_many(
+                slugs,
+                concurrency=self.workers,
+                session=session,
+                revalidate=True,
+            )
+        ]
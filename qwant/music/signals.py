@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+'''
+Module containing the receivers keeping the in-memory data of the process
+in sync with the database.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, FrozenSet, Optional, Set
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from qwant.music.models import (
+    Artist,
+    ArtistTrigram,
+    SpecialChar,
+    autocomplete_index,
+    graph_snapshot,
+    slug_rules,
+)
+
+
+@receiver(m2m_changed, sender=Artist.similar_artists.through)
+def similar_artists_changed(
+    sender: type,
+    instance: Artist,
+    action: str,
+    pk_set: Optional[Set[int]],
+    **kwargs: Any,
+) -> None:
+    '''Patch the in-memory data with the new similar Artists, or drop the
+    graph snapshot when similar Artists are removed
+    (see Artist.relations_added).'''
+    if action == 'post_add' and pk_set:
+        Artist.relations_added([(instance.pk, pk) for pk in sorted(pk_set)])
+    elif action in ('post_remove', 'post_clear'):
+        graph_snapshot.invalidate()
+
+
+@receiver(post_save, sender=Artist)
+def artist_saved(
+    sender: type,
+    instance: Artist,
+    update_fields: Optional[FrozenSet[str]],
+    **kwargs: Any,
+) -> None:
+    '''Index the trigrams of the saved Artist, unless its name was not
+    saved (see ArtistTrigram).'''
+    if update_fields is None or 'name' in update_fields:
+        ArtistTrigram.index([(instance.pk, instance.name)])
+
+
+@receiver(post_delete, sender=Artist)
+def artist_deleted(sender: type, instance: Artist, **kwargs: Any) -> None:
+    '''Drop the graph snapshot, which still holds the deleted Artist, and
+    the Artist from the autocomplete index of the process.'''
+    graph_snapshot.invalidate()
+    autocomplete_index.remove([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=SpecialChar)
+def special_char_changed(sender: type, **kwargs: Any) -> None:
+    '''Drop the compiled slug rules of all the processes, again once
+    committed (for the processes which compiled them meanwhile).'''
+    slug_rules.invalidate()
+    transaction.on_commit(slug_rules.invalidate)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+'''
+Module containing the conversion of the artist names to slugs. The special
+characters rules (see SpecialChar) are compiled once per process into a
+translation table (or a regex when some rules convert several characters),
+the rest of the conversion works on ASCII bytes with a byte translation
+table, and the slugs of the last names converted are cached: a known name
+costs a dict lookup, a new one a few C calls, instead of a SQL query, a
+replace per rule and three regex substitutions.
+The names of the bulk pipelines are converted by chunks, each chunk being
+converted at once (see SlugRules.slugify_chunk), in worker processes when
+there are many.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from string import ascii_lowercase, digits
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Final,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+)
+from unicodedata import normalize
+import multiprocessing
+import re
+import threading
+import time
+import uuid
+from django.core.cache import BaseCache, caches
+
+Rule = Tuple[str, str]  # Type alias: (orig, dest)
+
+WHITESPACE: Final[bytes] = b' \t\n\x0b\x0c\r\x1c\x1d\x1e\x1f'  # ASCII \s
+TO_DASH: Final[bytes] = bytes.maketrans(WHITESPACE, b'-' * len(WHITESPACE))
+NOT_SLUG: Final[bytes] = bytes(
+    set(range(256)).difference(
+        (ascii_lowercase + digits + '-_').encode(), WHITESPACE
+    )
+)
+DASHES: Final[Pattern[bytes]] = re.compile(rb'-{2,}')
+# Joins the names of a chunk: a starter for NFKD, left as it is by the rules
+# and the translations, so that each step converts the names apart
+SEPARATOR: Final[str] = '\0'
+NOT_SLUG_NOR_SEPARATOR: Final[bytes] = NOT_SLUG.replace(b'\0', b'')
+CHUNK_SIZE: Final[int] = 10_000
+
+
+class SlugRules:
+    '''Special characters rules compiled for the conversion of names.
+    The rules are applied in one pass over the name: the characters
+    written by a rule are not converted again by another one.
+
+    Attributes:
+        rules: The characters to convert, by characters to convert to
+        slugify: The conversion of a name to its slug (cached)
+    '''
+
+    def __init__(self, rules: Iterable[Rule], *, cache_size: int) -> None:
+        self.rules: Dict[str, str] = dict(rules)
+        self._table: Dict[int, str] = {}
+        self._pattern: Optional[Pattern[str]] = None
+        if all(len(orig) == 1 for orig in self.rules):
+            self._table = str.maketrans(self.rules)
+        else:  # The longest first, when some start the same
+            self._pattern = re.compile(
+                '|'.join(
+                    map(re.escape, sorted(self.rules, key=len, reverse=True))
+                )
+            )
+        self.slugify: Callable[[str], str] = lru_cache(cache_size)(
+            self._slugify
+        )
+        self._joinable: bool = not any(
+            SEPARATOR in orig + dest for orig, dest in self.rules.items()
+        )
+
+    def translate(self, name: str) -> str:
+        '''Convert the special characters of a name.'''
+        if self._pattern is None:
+            return str.translate(name, self._table)  # TypeError if no str
+        return self._pattern.sub(lambda match: self.rules[match[0]], name)
+
+    def _slugify(self, name: str) -> str:
+        '''Convert a name to its slug:
+        1. Convert the special characters
+        2. Normalize by removing diacritics (and the non-ASCII left)
+        3. Pass the string to lower
+        4. Turn the whitespaces to dashes, remove the other non expected
+           characters (one byte translation)
+        5. Remove multiple dashes
+        '''
+        data: bytes = (
+            normalize('NFKD', self.translate(name))
+            .encode('ascii', 'ignore')
+            .lower()
+            .translate(TO_DASH, NOT_SLUG)
+        )
+        return DASHES.sub(b'-', data).decode()
+
+    def slugify_chunk(self, names: Sequence[str]) -> List[str]:
+        '''Convert several names to their slugs, running each step once
+        for the names joined by SEPARATOR (the same slugs as slugify, the
+        cost of a call being paid once per chunk instead of once per name).
+        '''
+        if not names:
+            return []
+        joined: str = SEPARATOR.join(names)
+        if not self._joinable or joined.count(SEPARATOR) != len(names) - 1:
+            return [self._slugify(name) for name in names]
+        data: bytes = (
+            normalize('NFKD', self.translate(joined))
+            .encode('ascii', 'ignore')
+            .lower()
+            .translate(TO_DASH, NOT_SLUG_NOR_SEPARATOR)
+        )
+        return DASHES.sub(b'-', data).decode().split(SEPARATOR)
+
+    def slugify_many(
+        self,
+        names: Iterable[str],
+        *,
+        workers: int = 1,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> Iterator[str]:
+        '''Convert many names to their slugs, by chunks (the slugs of the
+        names are not cached, as they are rarely converted again).
+
+        Params:
+            names: The names to convert (read chunk by chunk)
+            workers: The number of processes converting the chunks (spawned
+                with the rules only: no connection nor lock is inherited)
+            chunk_size: The number of names per chunk
+
+        Returns:
+            The slugs, in the order of the names
+        '''
+        names = iter(names)
+        chunks: Iterator[List[str]] = iter(
+            lambda: list(islice(names, chunk_size)), []
+        )
+        if workers <= 1:
+            for chunk in chunks:
+                yield from self.slugify_chunk(chunk)
+            return
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(list(self.rules.items()),),
+        ) as executor:
+            pending: Deque[Future] = deque()
+            for chunk in chunks:  # At most 2 chunks per worker in memory
+                pending.append(executor.submit(_slugify_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+
+_worker_rules: Optional[SlugRules] = None  # Compiled by each worker
+
+
+def _init_worker(rules: List[Rule]) -> None:
+    global _worker_rules
+    _worker_rules = SlugRules(rules, cache_size=0)
+
+
+def _slugify_chunk(names: List[str]) -> List[str]:
+    return _worker_rules.slugify_chunk(names)  # type: ignore
+
+
+class SharedSlugRules:
+    '''Holder of the rules compiled by the process, reloaded once changed
+    by any process: the changes store a new version token in a Django cache
+    shared by the processes, compared with the one of the compiled rules
+    every check_every seconds.
+
+    Attributes:
+        loader: The function reading the (orig, dest) rules
+        alias: The name of the Django cache holding the version token
+        check_every: The seconds between two checks of the version token
+        cache_size: The number of slugs cached by the compiled rules
+    '''
+
+    VERSION_KEY: Final[str] = 'qwant:slug-rules-version'
+
+    def __init__(
+        self,
+        loader: Callable[[], Iterable[Rule]],
+        *,
+        alias: str,
+        check_every: float,
+        cache_size: int,
+    ) -> None:
+        self.loader: Callable[[], Iterable[Rule]] = loader
+        self.alias: str = alias
+        self.check_every: float = check_every
+        self.cache_size: int = cache_size
+        self._rules: Optional[SlugRules] = None
+        self._version: Optional[str] = None
+        self._checked_at: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def cache(self) -> BaseCache:
+        return caches[self.alias]
+
+    def get(self) -> SlugRules:
+        '''Get the compiled rules, compiling them if needed.'''
+        rules: Optional[SlugRules] = self._rules
+        if (
+            rules is None
+            or time.monotonic() - self._checked_at > self.check_every
+        ):
+            with self._lock:
+                if self._rules is rules:
+                    # Read before the rules: a change made meanwhile is
+                    # caught by the next check
+                    version: Optional[str] = self.cache.get(self.VERSION_KEY)
+                    if rules is None or version != self._version:
+                        self._rules = SlugRules(
+                            self.loader(), cache_size=self.cache_size
+                        )
+                        self._version = version
+                    self._checked_at = time.monotonic()
+                rules = self._rules
+        return rules  # type: ignore
+
+    def invalidate(self) -> None:
+        '''Drop the compiled rules of all the processes.'''
+        self.cache.set(self.VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        self.clear()
+
+    def clear(self) -> None:
+        '''Drop the compiled rules of the current process only.'''
+        with self._lock:
+            self._rules = None
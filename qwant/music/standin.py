@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+'''
+Module containing a local HTTP server standing in for the unofficial Qwant
+Music API (GET <QWANT_API_BASE_URL><slug>), to load-test the crawls, the
+imports and the views offline and reproducibly. The artists come from:
+- a recording: the responses of the API saved as JSON lines (see ndjson),
+  replayed as they are
+- a recorder: the live API, its responses being added to a recording
+- a synthetic graph of any size, whose similar artists follow a power law
+  (a few hubs listed by many artists, a long tail listed by few)
+The latency and the errors of the live API can be injected as well.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import (
+    Dict,
+    Final,
+    List,
+    Optional,
+    Protocol,
+    Set,
+    Tuple,
+)
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import requests
+from qwant.music.ndjson import open_file, read_lines
+from qwant.music.types import APIData
+
+LIVE_URL: Final[str] = 'https://api.qwant.com/music/artist/'
+
+
+class Source(Protocol):
+    '''Where a stand-in finds the artists (a dict by slug will do).'''
+
+    def get(self, slug: str) -> Optional[APIData]:
+        ...
+
+
+class Recording:
+    '''Responses of the API saved as JSON lines, one artist per line.
+
+    Attributes:
+        path: The file (see ndjson)
+        artists: The responses read or added, by slug
+    '''
+
+    def __init__(self, path: Path) -> None:
+        self.path: Path = Path(path)
+        self.artists: Dict[str, APIData] = {}
+        self._lock: threading.Lock = threading.Lock()
+        if self.path.exists():
+            for data in read_lines(self.path):
+                self.artists[str(data['slug'])] = data
+
+    def get(self, slug: str) -> Optional[APIData]:
+        return self.artists.get(slug)
+
+    def add(self, data: APIData) -> None:
+        '''Save a response, at the end of the file.'''
+        line: bytes = json.dumps(data).encode() + b'\n'
+        with self._lock:
+            self.artists[str(data['slug'])] = data
+            with open_file(self.path, 'ab') as file:
+                file.write(line)
+
+    def __len__(self) -> int:
+        return len(self.artists)
+
+
+class Recorder:
+    '''The live API, recording the artists it answers with.
+
+    Attributes:
+        recording: Where the responses are saved (and served from when
+            already there)
+        upstream: The base URL of the artists of the live API
+    '''
+
+    def __init__(self, recording: Recording, upstream: str = LIVE_URL):
+        self.recording: Recording = recording
+        self.upstream: str = upstream
+        self._session: requests.Session = requests.Session()
+
+    def get(self, slug: str) -> Optional[APIData]:
+        if (data := self.recording.get(slug)) is not None:
+            return data
+        resp: requests.Response = self._session.get(
+            self.upstream + slug, timeout=(3.05, 10)
+        )
+        data = resp.json()
+        if not resp.ok or 'error' in data:
+            return None
+        self.recording.add(data)
+        return data
+
+
+class SyntheticGraph:
+    '''Artists generated on the fly, the same ones for the same seed.
+    The artist n (0 <= n < size) is 'synthetic-artist-<n>', with the API
+    id n + 1; the number of its similar artists is drawn from a Pareto
+    distribution averaging mean_degree, and each of them is picked with a
+    probability decreasing with its number: the low numbers are the hubs.
+
+    Attributes:
+        size: The number of artists
+        mean_degree: The average number of similar artists listed
+        skew: How much the lists favour the hubs (1: not at all)
+        seed: The seed of the graph
+    '''
+
+    PATTERN: Final = re.compile(r'synthetic-artist-(\d+)')
+    PARETO_SHAPE: Final[float] = 2.0  # Mean: 2 * scale, heavy tail
+
+    def __init__(
+        self,
+        size: int,
+        *,
+        mean_degree: int = 10,
+        skew: float = 3.0,
+        seed: int = 0,
+    ) -> None:
+        self.size: int = size
+        self.mean_degree: int = mean_degree
+        self.skew: float = skew
+        self.seed: int = seed
+
+    @staticmethod
+    def slug(number: int) -> str:
+        return f'synthetic-artist-{number}'
+
+    def get(self, slug: str) -> Optional[APIData]:
+        if not (match := self.PATTERN.fullmatch(slug)):
+            return None
+        if (number := int(match[1])) >= self.size:
+            return None
+        data: APIData = self._summary(number)
+        data['picture'] = f'https://example.org/synthetic/{number}.jpg'
+        data['similar_artists'] = [
+            self._summary(similar) for similar in self.similar(number)
+        ]
+        return data
+
+    def similar(self, number: int) -> List[int]:
+        '''Draw the similar artists of an artist.'''
+        rng: random.Random = random.Random(f'{self.seed}:{number}')
+        scale: float = self.mean_degree / 2
+        count: int = min(
+            int(scale * rng.paretovariate(self.PARETO_SHAPE)),
+            10 * self.mean_degree,
+            self.size - 1,
+        )
+        similar: Set[int] = set()
+        for _ in range(4 * count):  # Bounded, in case of many repeats
+            if len(similar) == count:
+                break
+            if (drawn := int(self.size * rng.random() ** self.skew)) != number:
+                similar.add(drawn)
+        return sorted(similar)
+
+    def _summary(self, number: int) -> APIData:
+        return {
+            'id': number + 1,
+            'name': f'Synthetic Artist {number}',
+            'slug': self.slug(number),
+        }
+
+
+class StandIn:
+    '''HTTP server answering GET .../<slug> with the artists of a source.
+
+    Attributes:
+        source: Where the artists are found
+        latency: The seconds waited before answering
+        jitter: The mean of the random seconds added to the latency
+            (exponentially distributed: a few answers are much slower)
+        error_rate: The share of the requests answered with ERROR_STATUSES
+        connections: The number of TCP connections accepted
+        in_flight: The number of requests being served
+        max_in_flight: The highest number of requests served at once
+        not_modified: The number of 304 responses (matching ETag)
+    '''
+
+    ERROR_STATUSES: Final[Tuple[int, ...]] = (429, 500, 502, 503)
+
+    def __init__(
+        self,
+        source: Source,
+        *,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.source: Source = source
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.error_rate: float = error_rate
+        self.connections: int = 0
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+        self.not_modified: int = 0
+        self._random: random.Random = random.Random(seed)
+        self._lock: threading.Lock = threading.Lock()
+        handler = type('Handler', (_Handler,), {'api': self})
+        self._server: ThreadingHTTPServer = _Server((host, port), handler)
+
+    @property
+    def url(self) -> str:
+        '''The base URL of the artists (see QWANT_API_BASE_URL).'''
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/music/artist/'
+
+    def start(self) -> None:
+        '''Serve from a background thread.'''
+        thread: threading.Thread = threading.Thread(
+            target=self.serve_forever, daemon=True
+        )
+        thread.start()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever(poll_interval=0.01)
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def delay(self) -> float:
+        '''Get the seconds to wait before the next answer.'''
+        if not self.jitter:
+            return self.latency
+        with self._lock:
+            return self.latency + self._random.expovariate(1 / self.jitter)
+
+    def respond(self, slug: str) -> Tuple[int, object]:
+        '''Get the status and the body of the response for a slug.'''
+        if self.error_rate:
+            with self._lock:
+                if self._random.random() < self.error_rate:
+                    status: int = self._random.choice(self.ERROR_STATUSES)
+                    return status, {'error': status}
+        if (data := self.source.get(slug)) is not None:
+            return 200, data
+        return 404, {'error': 'Artist not found'}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads: bool = True
+    request_queue_size: int = 256  # Accept many concurrent clients
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version: str = 'HTTP/1.1'  # Keep the connections alive
+    disable_nagle_algorithm: bool = True  # Headers and body sent apart
+    api: StandIn
+
+    def setup(self) -> None:
+        super().setup()
+        with self.api._lock:
+            self.api.connections += 1
+
+    def do_GET(self) -> None:
+        with self.api._lock:
+            self.api.in_flight += 1
+            self.api.max_in_flight = max(
+                self.api.max_in_flight, self.api.in_flight
+            )
+        try:
+            time.sleep(self.api.delay())
+            status, data = self.api.respond(self.path.rsplit('/', 1)[-1])
+        finally:
+            with self.api._lock:
+                self.api.in_flight -= 1
+        body: bytes = json.dumps(data).encode()
+        etag: str = f'"{hashlib.md5(body).hexdigest()}"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            status, body = 304, b''
+            with self.api._lock:
+                self.api.not_modified += 1
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status in (200, 304):
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+'''
+Module containing the client-side protections of the API:
+- the rate limiter, a token bucket per budget (interactive and background
+  calls) in a SQLite file shared by the processes, so that the bulk jobs
+  cannot use the calls left to the users
+- the circuit breaker of the process, making the calls fail fast while the
+  API keeps failing instead of piling up behind its timeouts
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from collections import Counter, deque
+from pathlib import Path
+from typing import Deque, Mapping, NamedTuple, Optional, Tuple
+import threading
+import time
+from qwant.music.cache import SQLiteStore, _transaction
+
+SCHEMA: str = '''
+CREATE TABLE IF NOT EXISTS bucket (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+'''
+
+
+class Budget(NamedTuple):
+    '''The share of the API calls given to a kind of traffic.'''
+
+    rate: float  # Calls per second
+    burst: int  # Calls allowed at once after an idle period
+    wait: Optional[float] = None  # Seconds waited for a call, None: no limit
+
+
+class RateLimiter(SQLiteStore):
+    '''Token buckets shared by the processes, one per budget.
+    A call takes a token, or reserves the next one and waits for it, so the
+    waiting callers are served in turn without polling.
+
+    Attributes:
+        budgets: The budgets by name
+        rejected: The calls refused by the current process, by budget
+    '''
+
+    SCHEMA: str = SCHEMA
+
+    def __init__(self, path: Path, budgets: Mapping[str, Budget]) -> None:
+        self.budgets: Mapping[str, Budget] = budgets
+        self.rejected: Counter = Counter()
+        super().__init__(path)
+
+    def acquire(self, name: str) -> bool:
+        '''Take a token of a budget, waiting for it if needed.
+
+        Params:
+            name: The name of the budget
+
+        Returns:
+            False if the call would wait longer than the budget allows
+        '''
+        wait: Optional[float] = self._reserve(name)
+        if wait is None:
+            self.rejected[name] += 1
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def _reserve(self, name: str) -> Optional[float]:
+        '''Take a token, possibly one not refilled yet.
+
+        Returns:
+            The seconds to wait for the token (None: too long, not taken)
+        '''
+        budget: Budget = self.budgets[name]
+        connection = self._connection()
+        with _transaction(connection):
+            row: Optional[Tuple[float, float]] = connection.execute(
+                'SELECT tokens, updated_at FROM bucket WHERE name = ?', (name,)
+            ).fetchone()
+            now: float = time.time()
+            tokens: float = budget.burst
+            if row is not None:
+                tokens = min(tokens, row[0] + (now - row[1]) * budget.rate)
+            wait: float = max(0.0, (1 - tokens) / budget.rate)
+            if budget.wait is not None and wait > budget.wait:
+                return None
+            connection.execute(
+                'INSERT OR REPLACE INTO bucket VALUES (?, ?, ?)',
+                (name, tokens - 1, now),
+            )
+        return wait
+
+
+class CircuitBreaker:
+    '''Failures of the recent calls of the process.
+    - closed: the calls go through, until `threshold` of the last `window`
+      calls failed
+    - open: the calls are refused during `cooldown` seconds
+    - half-open: one trial call goes through, closing the breaker if it
+      succeeds, opening it again otherwise
+    Each allowed call gets a ticket (see allow), the generation of the
+    breaker: the outcomes of the calls allowed before its last change of
+    state are ignored, and only the trial call moves a half-open breaker.
+
+    Attributes:
+        window: The number of recent calls considered
+        threshold: The rate of failed calls opening the breaker
+        cooldown: The seconds before the trial call
+        min_calls: The number of calls needed to open the breaker
+        opened: The number of times the breaker opened
+    '''
+
+    def __init__(
+        self,
+        *,
+        window: int,
+        threshold: float,
+        cooldown: float,
+        min_calls: int = 5,
+    ) -> None:
+        self.window: int = window
+        self.threshold: float = threshold
+        self.cooldown: float = cooldown
+        self.min_calls: int = min(min_calls, window)
+        self.opened: int = 0
+        self._failures: Deque[bool] = deque(maxlen=window)
+        self._opened_at: Optional[float] = None
+        self._generation: int = 1
+        self._trial: Optional[int] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        return 'half-open' if self.retry_in() == 0 else 'open'
+
+    def retry_in(self) -> float:
+        '''Get the seconds before the trial call (0 if closed).'''
+        if self._opened_at is None:
+            return 0.0
+        elapsed: float = time.monotonic() - self._opened_at
+        return max(0.0, self.cooldown - elapsed)
+
+    def allow(self) -> Optional[int]:
+        '''Check if a call can be made, taking the trial call if it can.
+
+        Returns:
+            The ticket of the call, to give back to record (None if the
+            call must not be made)
+        '''
+        with self._lock:
+            if self._opened_at is None:
+                return self._generation
+            if self._trial is not None or self.retry_in() > 0:
+                return None
+            self._generation += 1
+            self._trial = self._generation
+            return self._trial
+
+    def record(self, ticket: int, *, failed: bool) -> None:
+        '''Add the outcome of an allowed call.
+
+        Params:
+            ticket: The ticket given by allow to the call
+            failed: Whether the call failed
+        '''
+        with self._lock:
+            if ticket != self._generation:  # Allowed before a change
+                return
+            if self._opened_at is not None:
+                if ticket != self._trial:  # Allowed before the opening
+                    return
+                self._trial = None
+                self._generation += 1
+                self._opened_at = time.monotonic() if failed else None
+                return
+            self._failures.append(failed)
+            if (
+                len(self._failures) >= self.min_calls
+                and sum(self._failures) / len(self._failures) >= self.threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._generation += 1
+                self._failures.clear()
+                self.opened += 1
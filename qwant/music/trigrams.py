@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+'''
+Module containing the trigrams of the artist names, the terms of the inverted
+index of the fuzzy search (see ArtistTrigram and Artist.fuzzy_search).
+As with pg_trgm, each word of the slug of a name is padded with two spaces
+before and one after, so that the starts of the words weigh more than their
+ends, and the names are ranked by the Jaccard similarity of their trigrams.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Set
+import math
+
+
+def trigrams(slug: str) -> Set[str]:
+    '''Get the trigrams of the words of a slug (see Artist.name_to_slug).
+
+    Params:
+        slug: The slug of a name (words split by dashes)
+
+    Returns:
+        The trigrams, empty if the slug has no word
+    '''
+    found: Set[str] = set()
+    for word in slug.split('-'):
+        if word:
+            padded: str = f'  {word} '
+            found.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return found
+
+
+def similarity(first: Set[str], second: Set[str]) -> float:
+    '''Get the Jaccard similarity of two sets of trigrams (0 to 1).'''
+    if not first and not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def min_shared(nb_trigrams: int, min_similarity: float) -> int:
+    '''Get the number of trigrams a name shares at least with a searched
+    name of nb_trigrams trigrams to reach min_similarity: the similarity is
+    at most the shared trigrams divided by the searched ones.'''
+    return max(1, math.ceil(min_similarity * nb_trigrams - 1e-9))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+'''
+Synthetic similar artists graphs used by the benchmarks.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Iterator, List, Set, Tuple, Type
+import random
+from django.db import models
+from qwant.music.models import Artist
+
+
+def build_graph(
+    nb_artists: int, nb_edges: int, *, seed: int = 0
+) -> List[int]:
+    '''Insert a random graph of Artists in the database.
+
+    Params:
+        nb_artists: The number of Artists to create
+        nb_edges: The number of similar Artists relations to create
+        seed: The seed of the random generator
+
+    Returns:
+        The pks of the created Artists
+    '''
+    Artist.objects.bulk_create(
+        (
+            Artist(name=f'Artist {i}', slug=f'artist-{i}', api_id=i)
+            for i in range(nb_artists)
+        ),
+        batch_size=5000,
+    )
+    pks: List[int] = list(
+        Artist.objects.order_by('pk').values_list('pk', flat=True)
+    )
+    rng: random.Random = random.Random(seed)
+    edges: Set[Tuple[int, int]] = set()
+    while len(edges) < nb_edges:
+        a, b = sorted(rng.sample(pks, 2))
+        edges.add((a, b))
+    through: Type[models.Model] = Artist.similar_artists.through
+    through.objects.bulk_create(
+        _through_rows(through, edges), batch_size=5000
+    )
+    return pks
+
+
+def _through_rows(
+    through: Type[models.Model], edges: Set[Tuple[int, int]]
+) -> Iterator[models.Model]:
+    '''Both directions of each relation, as stored by the symmetrical M2M.'''
+    for a, b in edges:
+        yield through(from_artist_id=a, to_artist_id=b)
+        yield through(from_artist_id=b, to_artist_id=a)
+
+
+def random_pairs(
+    pks: List[int], nb_pairs: int, *, seed: int = 1
+) -> List[Tuple[int, int]]:
+    '''Pick random (source, target) pairs among the given pks.'''
+    rng: random.Random = random.Random(seed)
+    return [tuple(rng.sample(pks, 2)) for _ in range(nb_pairs)]  # type: ignore
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the concurrent fetches of the API client, against a local
+server answering with a fixed latency (in a process of its own, so that it
+does not compete with the client for the GIL).
+Run with: pytest --benchmark=on -s qwant/tests/benchmarks
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Iterator, List
+import subprocess
+import sys
+import time
+import pytest
+from qwant.music.api import API
+from qwant.tests.test_api import get_many
+
+LATENCY: float = 0.02
+NB_SLUGS: int = 1024
+
+
+@pytest.fixture
+def remote_api(settings: Any) -> Iterator[None]:
+    server: subprocess.Popen = subprocess.Popen(
+        [sys.executable, '-m', 'qwant.tests.server', str(LATENCY)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    settings.QWANT_API_BASE_URL = server.stdout.readline().strip()
+    settings.QWANT_API_BACKOFF = 0
+    settings.QWANT_API_THROTTLE_PATH = ''  # Unlimited
+    API.metrics.reset()
+    yield
+    server.terminate()
+    server.wait()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('concurrency', (1, 8, 32, 128))
+def test_get_many(remote_api: None, concurrency: int) -> None:
+    slugs: List[str] = [f'artist-{i}' for i in range(NB_SLUGS)]
+    if concurrency == 1:
+        slugs = slugs[: NB_SLUGS // 16]  # Keep the sequential run short
+    start: float = time.perf_counter()
+    assert len(get_many(slugs, concurrency)) == len(slugs)
+    elapsed: float = time.perf_counter() - start
+    print(
+        f'\nconcurrency {concurrency}: {len(slugs) / elapsed:.0f} calls/s '
+        f'with {LATENCY * 1000:.0f} ms of server latency, '
+        f'p50 {API.metrics.percentile(50) * 1000:.1f} ms, '
+        f'p95 {API.metrics.percentile(95) * 1000:.1f} ms'
+    )
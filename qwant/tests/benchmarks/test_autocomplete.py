@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the completion of the artist names.
+Run with: pytest --benchmark=on -s qwant/tests/benchmarks
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Callable, List
+import random
+import time
+import pytest
+from qwant.music.autocomplete import PrefixIndex
+from qwant.music.models import Artist, autocomplete_index
+from qwant.tests.benchmarks.test_trigrams import names
+
+NB_ARTISTS: int = 100_000
+NB_SEARCHES: int = 2000
+NB_CHANGES: int = 1000
+
+
+def database(prefix: str) -> List[str]:
+    '''Complete the names with a query.'''
+    return list(
+        Artist.objects.filter(name__istartswith=prefix)
+        .order_by('name')
+        .values_list('name', flat=True)[:10]
+    )
+
+
+def index(prefix: str) -> List[str]:
+    return [suggestion.name for suggestion in Artist.autocomplete(prefix)]
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('complete', (database, index))
+def test_autocomplete(complete: Callable[[str], List[str]]) -> None:
+    rand: random.Random = random.Random(NB_ARTISTS)
+    batch: List[str] = names(NB_ARTISTS, rand)
+    Artist.objects.bulk_create(
+        Artist(name=name, slug=f'artist-{i}', api_id=i)
+        for i, name in enumerate(batch)
+    )
+    start: float = time.perf_counter()
+    built: PrefixIndex = autocomplete_index.get()
+    print(
+        f'\nindex: {len(built):,} artists in '
+        f'{time.perf_counter() - start:.2f} s, '
+        f'{built.nbytes / 1e6:.1f} MB'
+    )
+    autocomplete_index._index = built.patched(  # type: ignore
+        (i, f'changed-{i}', f'Changed {i}') for i in range(NB_CHANGES)
+    )
+    prefixes: List[str] = [
+        name[: rand.randint(1, 8)]
+        for name in rand.choices(batch, k=NB_SEARCHES)
+    ]
+    latencies: List[float] = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        complete(prefix)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(
+        f'{complete.__name__}: p50 {latencies[NB_SEARCHES // 2] * 1e6:.0f} '
+        f'µs, p99 {latencies[NB_SEARCHES * 99 // 100] * 1e6:.0f} µs '
+        f'per completion ({NB_CHANGES} changes apart)'
+    )
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the path search engines (QWANT_GRAPH_ENGINE).
+Run with: pytest --benchmark=on -s qwant/tests/benchmarks
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Dict, List, Tuple
+import time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import pytest
+from qwant.music.models import Artist, graph_snapshot
+from qwant.tests.benchmarks.graphs import build_graph, random_pairs
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'nb_artists,nb_edges',
+    ((1_000, 10_000), (10_000, 100_000), (100_000, 1_000_000)),
+)
+def test_engines(settings: Any, nb_artists: int, nb_edges: int) -> None:
+    pks: List[int] = build_graph(nb_artists, nb_edges)
+    pairs: List[Tuple[int, int]] = random_pairs(pks, 20)
+    artists: Dict[int, Artist] = Artist.objects.in_bulk(
+        {pk for pair in pairs for pk in pair}
+    )
+    graph_snapshot.invalidate()
+    start: float = time.perf_counter()
+    graph_snapshot.get()
+    print(
+        f'\n{nb_edges} relations: snapshot built in '
+        f'{time.perf_counter() - start:.2f} s'
+    )
+    for engine in ('database', 'snapshot', 'cte'):
+        settings.QWANT_GRAPH_ENGINE = engine
+        hops: int = 0
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for source, target in pairs:
+                hops += len(artists[source].path_to(artists[target])) - 1
+        elapsed: float = time.perf_counter() - start
+        print(
+            f'{engine}: {len(queries) / len(pairs):.1f} queries/path, '
+            f'{elapsed / len(pairs) * 1000:.2f} ms/path, '
+            f'{hops} hops in total'
+        )
+    graph_snapshot.invalidate()
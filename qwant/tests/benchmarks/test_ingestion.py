@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the ingestion of API responses.
+Run with: pytest --benchmark=on -s qwant/tests/benchmarks
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Callable, List
+import json
+import random
+import time
+from django.db import connection
+import pytest
+from qwant.music.importer import Importer, ImportStats
+from qwant.music.models import Artist
+from qwant.music.standin import SyntheticGraph
+from qwant.music.types import APIData
+
+NB_SIMILAR: int = 10
+
+
+def legacy_create_from_api_data(**data: APIData) -> Artist:
+    '''The recursive update_or_create Artist.create_from_api_data used to
+    run (one update_or_create per Artist and one add per relation).'''
+    artist: Artist
+    artist, _ = Artist.objects.update_or_create(
+        api_id=int(data['id']),
+        defaults={
+            'name': data['name'],
+            'slug': data['slug'],
+            'picture': data.get('picture', ''),
+        },
+    )
+    for similar_artist in data.get('similar_artists') or ():
+        artist.similar_artists.add(
+            legacy_create_from_api_data(**similar_artist)
+        )
+    return artist
+
+
+def payloads(nb_artists: int) -> List[APIData]:
+    '''Responses of nb_artists Artists similar to 10 random ones among
+    four times more.'''
+    rand: random.Random = random.Random(nb_artists)
+
+    def artist(i: int) -> APIData:
+        return {'name': f'Artist {i}', 'slug': f'artist-{i}', 'id': i}
+
+    return [
+        {
+            **artist(i),
+            'similar_artists': [
+                artist(j)
+                for j in rand.sample(range(4 * nb_artists), NB_SIMILAR)
+                if j != i
+            ],
+        }
+        for i in range(nb_artists)
+    ]
+
+
+def legacy(batch: List[APIData]) -> None:
+    for data in batch:
+        legacy_create_from_api_data(**data)
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('nb_artists', (100, 1000))
+@pytest.mark.parametrize(
+    'ingest',
+    (legacy, Artist.bulk_create_from_api_data),
+    ids=('legacy', 'bulk'),
+)
+def test_ingestion(
+    nb_artists: int, ingest: Callable[[List[APIData]], None]
+) -> None:
+    batch: List[APIData] = payloads(nb_artists)
+    queries: List[str] = []
+
+    def count(execute: Callable, sql: str, *args: Any) -> Any:
+        queries.append(sql)
+        return execute(sql, *args)
+
+    start: float = time.perf_counter()
+    with connection.execute_wrapper(count):
+        ingest(batch)
+    elapsed: float = time.perf_counter() - start
+    print(
+        f'\n{getattr(ingest, "__name__")} x {nb_artists}: '
+        f'{len(queries) / nb_artists:.2f} queries per imported artist, '
+        f'{elapsed / nb_artists * 1000:.2f} ms per imported artist '
+        f'({Artist.objects.count()} artists, '
+        f'{Artist.similar_artists.through.objects.count()} relations)'
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('batch_size', (500, 2000))
+def test_import(batch_size: int) -> None:
+    graph: SyntheticGraph = SyntheticGraph(10000)
+    importer: Importer = Importer(batch_size=batch_size, report=print)
+    stats: ImportStats = importer.run(
+        json.dumps(graph.get(graph.slug(n))).encode()
+        for n in range(graph.size)
+    )
+    print(
+        f'\nimport x {stats.imported} (batches of {batch_size}): '
+        f'{stats.rate:.0f} artists per second '
+        f'({Artist.objects.count()} artists, '
+        f'{Artist.similar_artists.through.objects.count()} relations)'
+    )
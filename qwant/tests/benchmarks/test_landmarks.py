@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the A* path search with and without landmarks.
+Run with: pytest --benchmark=on -s qwant/tests/benchmarks
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import List, Tuple
+import time
+import pytest
+from qwant.music.graph.bfs import bidirectional_search
+from qwant.music.graph.landmarks import (
+    Heuristic,
+    LandmarkIndex,
+    astar_search,
+    select_landmarks,
+)
+from qwant.music.graph.snapshot import GraphSnapshot
+from qwant.music.models import Artist
+from qwant.tests.benchmarks.graphs import build_graph, random_pairs
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'nb_artists,nb_edges', ((10_000, 30_000), (50_000, 150_000))
+)
+def test_landmarks(nb_artists: int, nb_edges: int) -> None:
+    pks: List[int] = build_graph(nb_artists, nb_edges)
+    pairs: List[Tuple[int, int]] = random_pairs(pks, 50)
+    snapshot: GraphSnapshot = Artist.build_snapshot()
+    start: float = time.perf_counter()
+    index: LandmarkIndex = LandmarkIndex.build(
+        snapshot, select_landmarks(snapshot, 16)
+    )
+    print(
+        f'\n{nb_edges} relations: 16 landmarks built in '
+        f'{time.perf_counter() - start:.2f} s'
+    )
+    for name, heuristic in (
+        ('without landmarks', lambda target: lambda pk: 0),
+        ('with landmarks', index.heuristic),
+    ):
+        expanded: int = 0
+        hops: int = 0
+        start = time.perf_counter()
+        for source, target in pairs:
+            lower_bound: Heuristic = heuristic(target)  # type: ignore
+            path, nb_expanded = astar_search(
+                source,
+                target,
+                snapshot.similar_pks,
+                lower_bound,
+                max_hops=20,
+                max_nodes=nb_artists,
+            )
+            expanded += nb_expanded
+            hops += len(path) - 1
+        elapsed: float = time.perf_counter() - start
+        print(
+            f'A* {name}: {expanded / len(pairs):.0f} nodes expanded/path, '
+            f'{elapsed / len(pairs) * 1000:.2f} ms/path, {hops} hops in total'
+        )
+    start = time.perf_counter()
+    for source, target in pairs:
+        bidirectional_search(
+            source,
+            target,
+            snapshot.similar_pks,
+            max_hops=20,
+            max_nodes=nb_artists,
+        )
+    print(
+        'bidirectional bfs: '
+        f'{(time.perf_counter() - start) / len(pairs) * 1000:.2f} ms/path'
+    )
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the path search between two Artists.
+Run with: pytest --benchmark=on -s qwant/tests/benchmarks
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import List, Sequence, Tuple
+import time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+import pytest
+from qwant.music.models import Artist
+from qwant.tests.benchmarks.graphs import build_graph, random_pairs
+
+
+def legacy_path_to(
+    artist: Artist, other: Artist, *, nb_tryouts: int = 1
+) -> Sequence[Artist]:
+    '''The depth-first search Artist.path_to used to run.'''
+    if _has_direct_relation_with(artist, other):
+        return (artist, other)
+    relation = _search_relation(artist, other, 0, nb_tryouts)
+    if relation:
+        return relation if nb_tryouts <= 1 else (artist, *relation)
+    return ()
+
+
+def _has_direct_relation_with(artist: Artist, other: Artist) -> bool:
+    return any(a.api_id == other.api_id for a in artist.similar_artists.all())
+
+
+def _search_relation(
+    artist: Artist, other: Artist, counter: int, nb_tryouts: int
+) -> Sequence[Artist]:
+    for sim in artist.similar_artists.all():
+        if _has_direct_relation_with(sim, other):
+            return (artist, sim, other)
+    if counter < nb_tryouts:
+        for sim in artist.similar_artists.all():
+            if relation := _search_relation(
+                sim, other, counter + 1, nb_tryouts
+            ):
+                return relation
+    return ()
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('nb_tryouts', (1, 2))
+def test_path_to(nb_tryouts: int) -> None:
+    pks: List[int] = build_graph(2_000, 8_000)
+    pairs: List[Tuple[int, int]] = random_pairs(pks, 10)
+    artists = Artist.objects.in_bulk(pks)
+    for name, search in (
+        (
+            f'legacy dfs (nb_tryouts={nb_tryouts})',
+            lambda a, b: legacy_path_to(a, b, nb_tryouts=nb_tryouts),
+        ),
+        ('bidirectional bfs', lambda a, b: a.path_to(b)),
+    ):
+        found: int = 0
+        hops: int = 0
+        start: float = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for source, target in pairs:
+                if path := search(artists[source], artists[target]):
+                    found += 1
+                    hops += len(path) - 1
+        elapsed: float = time.perf_counter() - start
+        print(
+            f'\n{name}: {len(queries) / len(pairs):.1f} queries/path, '
+            f'{elapsed / len(pairs) * 1000:.2f} ms/path, '
+            f'{found}/{len(pairs)} found, {hops} hops in total'
+        )
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the conversion of the artist names to slugs.
+Run with: pytest --benchmark=on -s qwant/tests/benchmarks
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Callable, Dict, List
+from unicodedata import normalize
+import random
+import re
+import time
+import pytest
+from qwant.music.models import Artist, SpecialChar, slug_rules
+
+NB_NAMES: int = 20_000
+SPECIAL_CHARS: Dict[str, str] = {
+    'ø': 'o',
+    'æ': 'ae',
+    'œ': 'oe',
+    'ð': 'd',
+    'þ': 'th',
+    'ł': 'l',
+    'ß': 'ss',
+    'Ø': 'O',
+    'Æ': 'AE',
+    'Œ': 'OE',
+}
+
+
+def legacy_name_to_slug(name: str) -> str:
+    '''The Artist.name_to_slug used to run (a query, then one replace per
+    special character and three regex substitutions).'''
+    for special_char in SpecialChar.objects.all():
+        name = name.replace(special_char.orig, special_char.dest)
+    name = normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    name = re.sub(r'\s+', '-', name.lower())
+    name = re.sub(r'[^-\w]', '', name)
+    name = re.sub(r'-+', '-', name)
+    return name
+
+
+def names(nb_names: int) -> List[str]:
+    '''Names of a few words, some with diacritics or special characters.'''
+    rand: random.Random = random.Random(nb_names)
+    letters: str = 'abcdefghijklmnopqrstuvwxyzéèëïôü' + ''.join(SPECIAL_CHARS)
+    return [
+        ' '.join(
+            ''.join(rand.choices(letters, k=rand.randint(2, 9))).title()
+            for _ in range(rand.randint(1, 3))
+        )
+        for _ in range(nb_names)
+    ]
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'to_slug',
+    (legacy_name_to_slug, Artist.name_to_slug),
+    ids=('legacy', 'compiled'),
+)
+def test_name_to_slug(to_slug: Callable[[str], str]) -> None:
+    SpecialChar.objects.bulk_create(
+        SpecialChar(orig=orig, dest=dest)
+        for orig, dest in SPECIAL_CHARS.items()
+    )
+    slug_rules.clear()
+    batch: List[str] = names(NB_NAMES)
+    for label in ('new names', 'known names'):
+        start: float = time.perf_counter()
+        for name in batch:
+            to_slug(name)
+        elapsed: float = time.perf_counter() - start
+        print(
+            f'\n{getattr(to_slug, "__name__")}, {label}: '
+            f'{NB_NAMES / elapsed:,.0f} slugs per second'
+        )
+    assert [to_slug(name) for name in batch[:1000]] == [
+        legacy_name_to_slug(name) for name in batch[:1000]
+    ]
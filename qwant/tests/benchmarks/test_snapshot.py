@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the in-memory snapshot of the similar artists graph.
+Run with: pytest --benchmark=on -s qwant/tests/benchmarks
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import List, Tuple
+import time
+import tracemalloc
+import pytest
+from qwant.music.graph.snapshot import GraphSnapshot
+from qwant.music.models import Artist
+from qwant.tests.benchmarks.graphs import build_graph, random_pairs
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'nb_artists,nb_edges', ((1_000, 10_000), (10_000, 100_000))
+)
+def test_build_snapshot(nb_artists: int, nb_edges: int) -> None:
+    pks: List[int] = build_graph(nb_artists, nb_edges)
+    start: float = time.perf_counter()
+    snapshot: GraphSnapshot = Artist.build_snapshot()
+    elapsed: float = time.perf_counter() - start
+    tracemalloc.start()
+    Artist.build_snapshot()
+    peak: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    pairs: List[Tuple[int, int]] = random_pairs(pks, 1000)
+    start = time.perf_counter()
+    for source, target in pairs:
+        snapshot.similar_pks([source, target])
+    lookup: float = time.perf_counter() - start
+    print(
+        f'\n{nb_edges} relations: built in {elapsed:.2f} s, '
+        f'{snapshot.nbytes / 2 ** 20:.2f} MiB of arrays '
+        f'({snapshot.nbytes / nb_edges:.1f} bytes/relation), '
+        f'{peak / 2 ** 20:.2f} MiB peak while building, '
+        f'{lookup / len(pairs) * 1e6:.1f} us per neighbours lookup'
+    )
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the fuzzy artist search over the trigram index.
+Run with: pytest --benchmark=on -s qwant/tests/benchmarks
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from string import ascii_lowercase
+from typing import List
+import random
+import time
+import pytest
+from qwant.music.models import Artist, ArtistTrigram, FuzzyMatch
+
+NB_ARTISTS: int = 200_000
+NB_SEARCHES: int = 200
+
+
+def names(nb_names: int, rand: random.Random) -> List[str]:
+    '''Distinct names of one to three words, from a vocabulary of a few
+    thousand words (so that the trigrams are shared as in real names).'''
+    vocabulary: List[str] = [
+        ''.join(rand.choices(ascii_lowercase, k=rand.randint(3, 8)))
+        for _ in range(5000)
+    ]
+    found: List[str] = []
+    while len(found) < nb_names:
+        found.extend(
+            ' '.join(rand.sample(vocabulary, rand.randint(1, 3))).title()
+            for _ in range(nb_names - len(found))
+        )
+        found = list(dict.fromkeys(found))
+    return found
+
+
+def typo(name: str, rand: random.Random) -> str:
+    '''Swap two letters of a name.'''
+    i: int = rand.randrange(len(name) - 1)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2 :]
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_fuzzy_search() -> None:
+    rand: random.Random = random.Random(NB_ARTISTS)
+    Artist.objects.bulk_create(
+        Artist(name=name, slug=f'artist-{i}', api_id=i)
+        for i, name in enumerate(names(NB_ARTISTS, rand))
+    )
+    start: float = time.perf_counter()
+    nb_artists, nb_trigrams = ArtistTrigram.rebuild()
+    print(
+        f'\nindex: {nb_artists:,} artists, {nb_trigrams:,} trigrams in '
+        f'{time.perf_counter() - start:.1f} s'
+    )
+    searched: List[Artist] = rand.sample(
+        list(Artist.objects.all()), NB_SEARCHES
+    )
+    for min_similarity in (0.0, 0.5):
+        found: int = 0
+        start = time.perf_counter()
+        for artist in searched:
+            matches: List[FuzzyMatch] = Artist.fuzzy_search(
+                typo(artist.name, rand),
+                limit=10,
+                min_similarity=min_similarity,
+            )
+            found += artist in [match.artist for match in matches]
+        elapsed: float = time.perf_counter() - start
+        print(
+            f'fuzzy_search, min_similarity={min_similarity}: '
+            f'{elapsed / NB_SEARCHES * 1000:.1f} ms per search, '
+            f'{found / NB_SEARCHES:.0%} found in the top 10'
+        )
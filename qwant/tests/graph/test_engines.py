@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+'''
+Test module for the path search engines (QWANT_GRAPH_ENGINE).
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+import pytest
+from qwant.music.models import Artist, ArtistPath, graph_snapshot
+from qwant.tests import data
+from qwant.tests.benchmarks.graphs import build_graph, random_pairs
+
+ENGINES: Sequence[str] = ('database', 'snapshot', 'cte')
+
+
+@pytest.fixture(params=ENGINES)
+def engine(request: Any, settings: Any) -> Iterator[str]:
+    settings.QWANT_GRAPH_ENGINE = request.param
+    graph_snapshot.invalidate()
+    yield request.param
+    graph_snapshot.invalidate()
+
+
+@pytest.fixture
+def artists() -> Dict[str, Artist]:
+    for artist_data in data.API_DATA:
+        Artist.create_from_api_data(**artist_data)
+    return {artist.slug: artist for artist in Artist.objects.all()}
+
+
+class TestEngines:
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        'orig,dest,slugs',
+        (
+            ('artist-3', 'artist-4', ('artist-3', 'artist-4')),
+            ('artist-4', 'artist-5', ('artist-4', 'artist-3', 'artist-5')),
+            (
+                'artist-6',
+                'artist-5',
+                ('artist-6', 'artist-4', 'artist-3', 'artist-5'),
+            ),
+            (
+                'artist-5',
+                'artist-6',
+                ('artist-5', 'artist-3', 'artist-4', 'artist-6'),
+            ),
+            ('artist-1', 'artist-5', ()),
+            ('artist-2', 'artist-2', ('artist-2',)),
+        ),
+    )
+    def test_path_to(
+        self,
+        engine: str,
+        artists: Dict[str, Artist],
+        orig: str,
+        dest: str,
+        slugs: Sequence[str],
+    ) -> None:
+        path: Sequence[Artist] = artists[orig].path_to(artists[dest])
+        assert tuple(artist.slug for artist in path) == slugs
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('max_hops', (1, 2, 3))
+    def test_max_hops(
+        self, engine: str, artists: Dict[str, Artist], max_hops: int
+    ) -> None:
+        path: Sequence[Artist] = artists['artist-6'].path_to(
+            artists['artist-5'], max_hops=max_hops
+        )
+        assert len(path) == (4 if max_hops >= 3 else 0)
+
+    @pytest.mark.django_db
+    def test_same_length_as_database(self, engine: str) -> None:
+        pks: List[int] = build_graph(300, 450, seed=3)
+        pairs: List[Tuple[int, int]] = random_pairs(pks, 30, seed=4)
+        artists: Dict[int, Artist] = Artist.objects.in_bulk(pks)
+        for source, target in pairs:
+            path: Sequence[Artist] = artists[source].path_to(artists[target])
+            expected: List[int] = _reference_path(source, target)
+            assert len(path) == len(expected)
+            if path:
+                assert path[0].pk == source and path[-1].pk == target
+                for artist, sim in zip(path, path[1:]):
+                    assert sim.pk in Artist.similar_pks([artist.pk])[artist.pk]
+
+    @pytest.mark.django_db
+    def test_paths_between(self, engine: str) -> None:
+        pks: List[int] = build_graph(300, 450, seed=3)
+        pairs: List[Tuple[int, int]] = random_pairs(pks, 30, seed=4)
+        pairs += [(pairs[0][0], target) for _, target in pairs[1:10]]
+        artists: Dict[int, Artist] = Artist.objects.in_bulk(pks)
+        paths: List[ArtistPath] = list(
+            Artist.paths_between(
+                (artists[source], artists[target]) for source, target in pairs
+            )
+        )
+        assert len(paths) == len(pairs)
+        for path in paths:
+            assert not path.timed_out
+            assert len(path.artists) == len(
+                path.source.path_to(path.target)
+            )
+
+    @pytest.mark.django_db
+    def test_paths_between_timeout(self, engine: str) -> None:
+        pks: List[int] = build_graph(300, 450, seed=3)
+        artists: Dict[int, Artist] = Artist.objects.in_bulk(pks)
+        pairs: List[Tuple[int, int]] = random_pairs(pks, 5, seed=4)
+        for path in Artist.paths_between(
+            ((artists[source], artists[target]) for source, target in pairs),
+            timeout=0,
+        ):
+            assert path.timed_out
+            assert path.artists == ()
+
+
+def _reference_path(source: int, target: int) -> List[int]:
+    '''Plain breadth-first search, as the reference.'''
+    parents: Dict[int, int] = {source: source}
+    frontier: List[int] = [source]
+    while frontier and target not in parents:
+        next_frontier: List[int] = []
+        for node, sims in Artist.similar_pks(frontier).items():
+            for sim in sims:
+                if sim not in parents:
+                    parents[sim] = node
+                    next_frontier.append(sim)
+        frontier = next_frontier
+    if target not in parents:
+        return []
+    path: List[int] = [target]
+    while path[-1] != source:
+        path.append(parents[path[-1]])
+    return path[::-1] if len(path) <= 7 else []
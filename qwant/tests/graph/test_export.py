@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+'''
+Test module for the streamed exports of the similar artists graph.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+from _pytest.monkeypatch import MonkeyPatch
+import pytest
+from qwant.music.graph import export
+from qwant.music.graph.export import (
+    GraphFile,
+    Node,
+    merge_rows,
+    write_binary,
+    write_ndjson,
+)
+from qwant.music.graph.snapshot import GraphSnapshot
+from qwant.music.models import Artist
+from qwant.music.ndjson import read_lines
+from qwant.tests import data
+
+
+@pytest.fixture
+def artists() -> Sequence[Artist]:
+    Artist.bulk_create_from_api_data(data.API_DATA)
+    return Artist.objects.order_by('pk')
+
+
+def test_merge_rows() -> None:
+    nodes: List[Node] = list(
+        merge_rows(
+            [(2, 20, 'B', 'b', ''), (5, 50, 'E', 'e', 'http://p')],
+            [(1, 2), (2, 5), (2, 7), (4, 2), (5, 2), (6, 5)],
+        )
+    )
+    assert nodes == [
+        Node(2, 20, 'B', 'b', '', [5, 7]),
+        Node(5, 50, 'E', 'e', 'http://p', [2]),
+    ]
+
+
+@pytest.mark.django_db
+def test_write_ndjson(artists: Sequence[Artist], tmp_path: Path) -> None:
+    path: Path = tmp_path / 'graph.ndjson.gz'
+    assert write_ndjson(path, Artist.stream_graph(chunk_size=3)) == (8, 10)
+    lines: List[Dict[str, Any]] = list(read_lines(path))
+    assert [line['pk'] for line in lines] == [a.pk for a in artists]
+    artist: Artist = Artist.objects.get(slug='artist-3')
+    assert lines[list(artists).index(artist)] == {
+        'pk': artist.pk,
+        'api_id': 654321,
+        'name': 'Artist-3',
+        'slug': 'artist-3',
+        'picture': artist.picture,
+        'similar': sorted(artist.similar_artists.values_list('pk', flat=True)),
+    }
+
+
+@pytest.mark.django_db
+def test_write_binary(
+    artists: Sequence[Artist], tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    monkeypatch.setattr(export, 'BUFFER_SIZE', 2)
+    path: Path = tmp_path / 'graph.bin'
+    assert write_binary(path, Artist.stream_graph(chunk_size=3)) == (8, 10)
+    assert [p.name for p in tmp_path.iterdir()] == ['graph.bin']
+    graph: GraphFile = GraphFile(path)
+    assert len(graph) == 8
+    assert graph.nb_edges == 10
+    assert list(graph.pks) == [artist.pk for artist in artists]
+    for index, artist in enumerate(artists):
+        assert graph.index(artist.pk) == index
+        assert graph.api_ids[index] == artist.api_id
+        assert graph.name(index) == artist.name
+        assert graph.slug(index) == artist.slug
+    snapshot: GraphSnapshot = graph.snapshot()
+    built: GraphSnapshot = Artist.build_snapshot()
+    pks: List[int] = list(built.pks)
+    assert snapshot.similar_pks(pks) == built.similar_pks(pks)
+    assert snapshot.nbytes == built.nbytes
+
+
+def test_write_binary_dangling(tmp_path: Path) -> None:
+    '''The relations to Artists missing from the stream are dropped.'''
+    path: Path = tmp_path / 'graph.bin'
+    nodes: List[Node] = [
+        Node(1, 10, 'Ä', 'a', '', [2, 3]),
+        Node(3, 30, 'C', 'c', '', [1]),
+    ]
+    assert write_binary(path, nodes) == (2, 2)
+    graph: GraphFile = GraphFile(path)
+    assert graph.name(0) == 'Ä'
+    assert graph.snapshot().similar_pks([1, 3]) == {1: [3], 3: [1]}
+    assert write_binary(path, []) == (0, 0)
+    assert len(GraphFile(path)) == 0
+
+
+def test_write_binary_buffers(
+    tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    '''The columns are flushed as they fill, isolated nodes included.'''
+    monkeypatch.setattr(export, 'BUFFER_SIZE', 2)
+    flushed: List[int] = []
+    flush = export._flush
+
+    def counted_flush(values: Any, file: Any) -> None:
+        flushed.append(len(values))
+        flush(values, file)
+
+    monkeypatch.setattr(export, '_flush', counted_flush)
+    nodes: List[Node] = [
+        Node(pk, pk * 10, str(pk), str(pk), '', []) for pk in range(1, 8)
+    ]
+    assert write_binary(tmp_path / 'graph.bin', nodes) == (7, 0)
+    assert max(flushed) <= 2
+    assert list(GraphFile(tmp_path / 'graph.bin').api_ids) == [
+        pk * 10 for pk in range(1, 8)
+    ]
+
+
+@pytest.mark.parametrize(
+    'content', (b'', b'QMGRAPH\0', b'NOTGRAPH' + bytes(48))
+)
+def test_graph_file_invalid(tmp_path: Path, content: bytes) -> None:
+    path: Path = tmp_path / 'graph.bin'
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        GraphFile(path)
+
+
+def test_graph_file_truncated(tmp_path: Path) -> None:
+    path: Path = tmp_path / 'graph.bin'
+    write_binary(path, [Node(1, 10, 'A', 'a', '', [])])
+    path.write_bytes(path.read_bytes()[:-16])
+    with pytest.raises(ValueError):
+        GraphFile(path)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+'''
+Test module for the landmark index and the A* path search.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Dict, Iterator, List, Tuple
+from django.db import transaction
+import pytest
+from qwant.music.graph.bfs import Neighbours, bidirectional_search
+from qwant.music.graph.landmarks import (
+    UNKNOWN,
+    LandmarkIndex,
+    astar_search,
+    select_landmarks,
+)
+from qwant.music.graph.snapshot import GraphSnapshot
+from qwant.music.models import (
+    Artist,
+    Landmark,
+    graph_snapshot,
+    landmark_index,
+)
+from qwant.tests import data
+from qwant.tests.benchmarks.graphs import build_graph, random_pairs
+
+
+def chain(size: int) -> GraphSnapshot:
+    '''A snapshot of 1 - 2 - ... - size.'''
+    edges: List[Tuple[int, int]] = []
+    for pk in range(1, size + 1):
+        edges.extend((pk, sim) for sim in (pk - 1, pk + 1) if 0 < sim <= size)
+    return GraphSnapshot.from_rows(range(1, size + 1), edges)
+
+
+def neighbours(sims: Dict[int, List[int]]) -> Neighbours:
+    return lambda pks: {pk: sims.get(pk, []) for pk in pks}
+
+
+@pytest.fixture
+def snapshot_engine(settings: Any) -> Iterator[None]:
+    settings.QWANT_GRAPH_ENGINE = 'snapshot'
+    settings.QWANT_PATH_LANDMARKS = True
+    graph_snapshot.invalidate()
+    landmark_index.invalidate()
+    yield
+    graph_snapshot.invalidate()
+    landmark_index.invalidate()
+
+
+class TestLandmarkIndex:
+    def test_build(self) -> None:
+        index: LandmarkIndex = LandmarkIndex.build(chain(5), [2])
+        assert [index.distance(2, pk) for pk in range(7)] == [
+            UNKNOWN,
+            1,
+            0,
+            1,
+            2,
+            3,
+            UNKNOWN,
+        ]
+
+    def test_heuristic(self) -> None:
+        index: LandmarkIndex = LandmarkIndex.build(chain(5), [1, 5])
+        assert [index.heuristic(4)(pk) for pk in range(1, 6)] == [
+            3,
+            2,
+            1,
+            0,
+            1,
+        ]
+
+    def test_build_added_edges(self) -> None:
+        '''The relations added to the snapshot are walked as well.'''
+        snapshot: GraphSnapshot = chain(5)
+        snapshot.add_edges([(1, 5), (5, 7)])
+        index: LandmarkIndex = LandmarkIndex.build(snapshot, [1, 6])
+        assert index.graph is snapshot
+        assert [index.distance(1, pk) for pk in range(1, 8)] == [
+            0,
+            1,
+            2,
+            2,
+            1,
+            UNKNOWN,
+            2,
+        ]
+        assert list(index.distances) == [1]  # 6 is unknown
+
+    def test_select_landmarks(self) -> None:
+        snapshot: GraphSnapshot = GraphSnapshot.from_rows(
+            range(1, 6), [(1, 2), (1, 3), (1, 4), (2, 1), (3, 1), (4, 1)]
+        )
+        assert select_landmarks(snapshot, 3) == [1]
+
+    def test_add_edges(self) -> None:
+        index: LandmarkIndex = LandmarkIndex.build(chain(5), [1, 3])
+        sims: Dict[int, List[int]] = {7: [5], 8: [1, 2, 3]}
+        assert index.add_edges([(5, 7)], neighbours(sims)) == set()
+        assert index.distance(1, 7) == 5
+        assert index.add_edges([(1, 8)], neighbours(sims)) == set()
+        assert index.distance(3, 8) == 1
+        assert index.add_edges([(2, 5)], neighbours(sims)) == {1}
+        assert len(index) == 1
+
+    def test_add_edges_through_unknown(self) -> None:
+        index: LandmarkIndex = LandmarkIndex.build(chain(5), [1])
+        sims: Dict[int, List[int]] = {9: [1, 4]}
+        assert index.add_edges([(9, 4)], neighbours(sims)) == {1}
+
+
+class TestAStar:
+    @pytest.mark.django_db
+    def test_same_length_as_bfs(self) -> None:
+        pks: List[int] = build_graph(300, 450, seed=3)
+        snapshot: GraphSnapshot = Artist.build_snapshot()
+        index: LandmarkIndex = LandmarkIndex.build(
+            snapshot, select_landmarks(snapshot, 4)
+        )
+        for source, target in random_pairs(pks, 50, seed=5):
+            path, expanded = astar_search(
+                source,
+                target,
+                snapshot.similar_pks,
+                index.heuristic(target),
+                max_hops=20,
+                max_nodes=10_000,
+            )
+            blind_path, blind_expanded = astar_search(
+                source,
+                target,
+                snapshot.similar_pks,
+                lambda pk: 0,
+                max_hops=20,
+                max_nodes=10_000,
+            )
+            assert len(path) == len(blind_path)
+            assert len(path) == len(
+                bidirectional_search(
+                    source,
+                    target,
+                    snapshot.similar_pks,
+                    max_hops=20,
+                    max_nodes=10_000,
+                )
+            )
+            assert expanded <= blind_expanded
+
+    @pytest.mark.django_db
+    def test_path_to(self, snapshot_engine: None) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        Landmark.build(2)
+        assert len(landmark_index.get()) == 2
+        orig: Artist = Artist.objects.get(slug='artist-6')
+        dest: Artist = Artist.objects.get(slug='artist-5')
+        assert [artist.slug for artist in orig.path_to(dest)] == [
+            'artist-6',
+            'artist-4',
+            'artist-3',
+            'artist-5',
+        ]
+        assert orig.path_to(dest, max_hops=2) == ()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_invalidated_by_new_relation(self, snapshot_engine: None) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        Artist.objects.get(slug='artist-3').similar_artists.add(
+            Artist.objects.get(slug='artist-2')
+        )
+        Landmark.build(1)
+        landmark: Landmark = Landmark.objects.get()
+        assert landmark.artist.slug == 'artist-3'
+        assert len(landmark_index.get()) == 1
+        Artist.objects.get(slug='artist-1').similar_artists.add(
+            Artist.objects.get(slug='artist-6')
+        )
+        assert len(landmark_index.get()) == 1
+        Artist.objects.get(slug='artist-5').similar_artists.add(
+            Artist.objects.get(slug='artist-1')
+        )
+        assert len(landmark_index.get()) == 0  # Dropped until rebuilt
+        orig: Artist = Artist.objects.get(slug='artist-6')
+        dest: Artist = Artist.objects.get(slug='similar-1')
+        assert len(orig.path_to(dest)) == 3
+        graph_snapshot.invalidate()
+        assert len(landmark_index.get()) == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_kept_on_rollback(self, snapshot_engine: None) -> None:
+        '''The relations rolled back never reach the landmarks.'''
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        Artist.objects.get(slug='artist-3').similar_artists.add(
+            Artist.objects.get(slug='artist-2')
+        )
+        Landmark.build(1)
+        index: LandmarkIndex = landmark_index.get()
+        assert len(index) == 1
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                Artist.objects.get(slug='artist-1').similar_artists.add(
+                    Artist.objects.get(slug='artist-6')
+                )
+                Artist.objects.get(slug='artist-5').similar_artists.add(
+                    Artist.objects.get(slug='artist-1')
+                )
+                raise RuntimeError
+        assert landmark_index.get() is index
+        assert len(index) == 1
+
+    @pytest.mark.django_db
+    def test_rebuilt_with_snapshot(self, snapshot_engine: None) -> None:
+        '''The landmark distances are always the ones of the snapshot.'''
+        Artist.bulk_create_from_api_data(data.API_DATA)
+        Landmark.build(1)
+        graph: GraphSnapshot = graph_snapshot.get()
+        assert landmark_index.get().graph is graph
+        graph_snapshot.invalidate()
+        assert landmark_index.get().graph is graph_snapshot.get()
+        assert landmark_index.get().graph is not graph
+
+    @pytest.mark.django_db(transaction=True)
+    def test_not_loaded_if_unused(
+        self, snapshot_engine: None, settings: Any
+    ) -> None:
+        settings.QWANT_PATH_LANDMARKS = False
+        loaded: List[int] = []
+        load_index = landmark_index.loader
+        landmark_index.loader = lambda: loaded.append(1) or load_index()
+        try:
+            Artist.bulk_create_from_api_data(data.API_DATA)
+        finally:
+            landmark_index.loader = load_index
+        assert not loaded
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+'''
+Test module for the in-memory snapshot of the similar artists graph.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, Callable, FrozenSet, Iterator, List, Sequence
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import Client
+from django.urls import reverse
+import pytest
+from qwant.music.graph.snapshot import GraphSnapshot, SharedSnapshot
+from qwant.music.models import Artist, graph_snapshot
+from qwant.tests import data
+
+
+@pytest.fixture
+def snapshot_engine(settings: Any) -> Iterator[None]:
+    settings.QWANT_GRAPH_ENGINE = 'snapshot'
+    graph_snapshot.invalidate()
+    yield
+    graph_snapshot.invalidate()
+
+
+@pytest.fixture
+def artists() -> Sequence[Artist]:
+    for artist_data in data.API_DATA:
+        Artist.create_from_api_data(**artist_data)
+    return Artist.objects.order_by('pk')
+
+
+class TestGraphSnapshot:
+    def test_from_rows(self) -> None:
+        snapshot: GraphSnapshot = GraphSnapshot.from_rows(
+            [2, 5, 7, 9], [(2, 7), (2, 9), (7, 2), (9, 2), (12, 2)]
+        )
+        assert len(snapshot) == 4
+        assert snapshot.nb_edges == 4
+        assert list(snapshot.offsets) == [0, 2, 2, 3, 4]
+        assert snapshot.similar_pks([2, 5, 9, 11]) == {
+            2: [7, 9],
+            5: [],
+            9: [2],
+            11: [],
+        }
+        assert snapshot.degree(snapshot.index(2)) == 2  # type: ignore
+        assert snapshot.index(3) is None
+
+    def test_add_edges(self) -> None:
+        snapshot: GraphSnapshot = GraphSnapshot.from_rows([1, 2], [])
+        snapshot.add_edges([(1, 2), (2, 3)])
+        assert snapshot.similar_pks([1, 2, 3]) == {
+            1: [2],
+            2: [1, 3],
+            3: [2],
+        }
+        assert snapshot.max_pk == 3
+
+    def test_add_edges_copy_on_write(self) -> None:
+        '''The added relations read by a search are never changed.'''
+        snapshot: GraphSnapshot = GraphSnapshot.from_rows([1], [])
+        snapshot.add_edges([(1, 2)])
+        added: FrozenSet[int] = snapshot.added(1)
+        snapshot.add_edges([(1, 3), (4, 1)])
+        assert added == {2}
+        assert snapshot.added(1) == {2, 3, 4}
+        assert snapshot.max_pk == 4
+
+    def test_nbytes(self) -> None:
+        snapshot: GraphSnapshot = GraphSnapshot.from_rows(
+            range(1000), ((i, (i + 1) % 1000) for i in range(1000))
+        )
+        assert snapshot.nbytes == 1000 * 8 + 1001 * 8 + 1000 * 4
+
+    def test_shared_snapshot_max_age(self) -> None:
+        def loader() -> GraphSnapshot:
+            return GraphSnapshot([], [0], [])
+
+        shared: SharedSnapshot = SharedSnapshot(loader, max_age=60)
+        assert shared.get() is shared.get()
+        shared.max_age = -1
+        first: GraphSnapshot = shared.get()
+        assert shared.get() is not first
+
+
+class TestSnapshotEngine:
+    @pytest.mark.django_db
+    def test_build_snapshot(self, artists: Sequence[Artist]) -> None:
+        snapshot: GraphSnapshot = Artist.build_snapshot()
+        assert list(snapshot.pks) == [artist.pk for artist in artists]
+        for artist in artists:
+            assert set(snapshot.similar_pks([artist.pk])[artist.pk]) == {
+                sim.pk for sim in artist.similar_artists.all()
+            }
+
+    @pytest.mark.django_db(transaction=True)
+    def test_patched_on_new_relation(
+        self, snapshot_engine: None, artists: Sequence[Artist]
+    ) -> None:
+        orig: Artist = Artist.objects.get(slug='artist-1')
+        dest: Artist = Artist.objects.get(slug='artist-2')
+        assert orig.path_to(dest) == ()
+        orig.similar_artists.add(dest)
+        assert orig.path_to(dest) == (orig, dest)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_not_patched_on_rollback(
+        self, snapshot_engine: None, artists: Sequence[Artist]
+    ) -> None:
+        '''The relations rolled back never reach the snapshot.'''
+        orig: Artist = Artist.objects.get(slug='artist-1')
+        dest: Artist = Artist.objects.get(slug='artist-2')
+        snapshot: GraphSnapshot = graph_snapshot.get()
+        similar: List[int] = snapshot.similar_pks([orig.pk])[orig.pk]
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                orig.similar_artists.add(dest)
+                raise RuntimeError
+        assert graph_snapshot.get() is snapshot
+        assert snapshot.similar_pks([orig.pk])[orig.pk] == similar
+        assert orig.path_to(dest) == ()
+
+    @pytest.mark.django_db
+    def test_path_without_queries(
+        self,
+        snapshot_engine: None,
+        artists: Sequence[Artist],
+        django_assert_num_queries: Callable[..., Any],
+    ) -> None:
+        orig: Artist = Artist.objects.get(slug='artist-6')
+        dest: Artist = Artist.objects.get(slug='artist-5')
+        graph_snapshot.get()
+        with django_assert_num_queries(2):  # Components and Artists only
+            assert len(orig.path_to(dest)) == 4
+
+    @pytest.mark.django_db
+    def test_neighbourhood(
+        self, snapshot_engine: None, artists: Sequence[Artist]
+    ) -> None:
+        artist: Artist = Artist.objects.get(slug='artist-6')
+        assert {
+            Artist.objects.get(pk=pk).slug: distance
+            for pk, distance in artist.neighbourhood(2).items()
+        } == {'artist-6': 0, 'artist-4': 1, 'artist-3': 2}
+
+    @pytest.mark.django_db
+    def test_detail_view(
+        self, snapshot_engine: None, artists: Sequence[Artist]
+    ) -> None:
+        artist: Artist = Artist.objects.get(slug='artist-3')
+        resp: HttpResponse = Client().get(
+            reverse('qwant:artist_detail', args=[artist.pk])
+        )
+        assert resp.status_code == 200
+        for sim in ('Artist-4', 'Artist-5'):
+            assert sim in resp.content.decode('utf-8')
@@ -0,0 +1,158 @@
+from typing import Any, Callable, Dict, Optional
+from django.http import HttpResponse
+from graphql.language.parser import parse
+import pytest
+from qwant.music.graphql.cost import CostAnalyser, QueryCost
+from seb_music.graphql import schema
+
+GraphQLClient = Callable[..., HttpResponse]
+
+
+def analyse(
+    query: str,
+    variables: Optional[Dict[str, Any]] = None,
+    operation_name: Optional[str] = None,
+) -> QueryCost:
+    return CostAnalyser(
+        schema,
+        list_sizes={
+            'ArtistType.similarArtists': 10,
+            'ArtistConnection.edges': 20,
+        },
+        list_size=100,
+        field_costs={'Query.qwantArtist': 50, 'Query.qwantPaths': 20},
+    ).analyse(parse(query), operation_name, variables)
+
+
+class TestCostAnalyser:
+    def test_fields(self) -> None:
+        assert analyse('{ qwantArtist(slug: "a") { name slug } }') == (
+            QueryCost(depth=2, cost=53)
+        )
+
+    def test_lists(self) -> None:
+        assert analyse('{ qwantComponents(limit: 5) { id } }') == (
+            QueryCost(depth=2, cost=6)
+        )
+        assert analyse('{ qwantComponents { id } }') == QueryCost(2, 101)
+        assert analyse(
+            'query($n: Int) { qwantComponents(limit: $n) { id } }', {'n': 3}
+        ) == QueryCost(2, 4)
+        assert analyse(
+            '{ qwantArtist(slug: "a") { similarArtists { name } } }'
+        ) == QueryCost(3, 1 + 50 + (1 + 10))
+
+    def test_connection(self) -> None:
+        '''The first argument of a connection sizes its edges.'''
+        query: str = '''
+            query($first: Int) {
+                qwantArtists(first: $first) {
+                    edges { node { name similarArtists { name } } }
+                    pageInfo { hasNextPage }
+                }
+            }
+        '''
+        node: int = 1 + 1 + (1 + 10)
+        assert analyse(query, {'first': 5}) == QueryCost(
+            5, 1 + (1 + 5 * node) + 2
+        )
+        assert analyse(query) == QueryCost(5, 1 + (1 + 20 * node) + 2)
+
+    def test_list_arguments(self) -> None:
+        '''A list answering a list argument holds one item per item.'''
+        query: str = '''
+            query($pairs: [ArtistPairInput!]!) {
+                qwantPaths(pairs: $pairs) { hops }
+            }
+        '''
+        pair: Dict[str, str] = {'source': 'a', 'target': 'b'}
+        assert analyse(query, {'pairs': [pair] * 3}) == QueryCost(
+            2, 1 + 3 * (20 + 1)
+        )
+        assert analyse(
+            '''{
+                qwantPaths(pairs: [{source: "a", target: "b"}]) { hops }
+            }'''
+        ) == QueryCost(2, 22)
+
+    def test_fragments(self) -> None:
+        query: str = '''
+            query Named {
+                qwantArtist(slug: "a") {
+                    ...Names
+                    ... on ArtistType { similarArtists { ...Names } }
+                }
+            }
+            fragment Names on ArtistType { name slug }
+            query Other { qwantComponents(limit: 2) { id } }
+        '''
+        assert analyse(query, operation_name='Named') == QueryCost(
+            3, 1 + 50 + 2 + (1 + 10 * 2)
+        )
+        assert analyse(query, operation_name='Other') == QueryCost(2, 3)
+        assert analyse(query, operation_name='Unknown') == QueryCost(0, 0)
+
+    def test_introspection(self) -> None:
+        assert analyse('{ __schema { types { name } } }') == QueryCost(0, 0)
+        assert analyse('{ qwantComponents(limit: 1) { __typename } }') == (
+            QueryCost(1, 1)
+        )
+
+
+class TestGraphQLLimits:
+    @pytest.mark.django_db
+    def test_too_deep(
+        self, graphql_client: GraphQLClient, settings: Any
+    ) -> None:
+        settings.QWANT_GRAPHQL_MAX_DEPTH = 3
+        resp: HttpResponse = graphql_client(
+            '{ qwantArtists { edges { node { name } } } }'
+        )
+        assert resp.status_code == 400
+        assert resp.json()['errors'][0]['message'] == (
+            'Query too deep: 4 nested fields (3 at most)'
+        )
+        resp = graphql_client('{ qwantArtists { edges { cursor } } }')
+        assert resp.status_code == 200
+        assert resp.json()['data'] == {'qwantArtists': {'edges': []}}
+
+    @pytest.mark.django_db
+    def test_too_expensive(
+        self, graphql_client: GraphQLClient, settings: Any
+    ) -> None:
+        '''The cost is computed from the variables of each execution.'''
+        settings.QWANT_GRAPHQL_MAX_COST = 1000
+        query: str = '''
+            query($first: Int) {
+                qwantArtists(first: $first) {
+                    edges {
+                        node { similarArtists { similarArtists { name } } }
+                    }
+                }
+            }
+        '''
+        resp: HttpResponse = graphql_client(query, variables={'first': 5})
+        assert resp.status_code == 200
+        resp = graphql_client(query, variables={'first': 10})
+        assert resp.status_code == 400
+        assert resp.json()['errors'][0]['message'] == (
+            'Query too expensive: cost 1122 (1000 at most)'
+        )
+
+    def test_api_calls(
+        self, graphql_client: GraphQLClient, settings: Any
+    ) -> None:
+        '''The fields which may call the API are rejected before that.'''
+        settings.QWANT_GRAPHQL_FIELD_COSTS = {'Query.qwantArtist': 1000}
+        settings.QWANT_GRAPHQL_MAX_COST = 2500
+        resp: HttpResponse = graphql_client(
+            '''{
+                a: qwantArtist(name: "A") { name }
+                b: qwantArtist(name: "B") { name }
+                c: qwantArtist(name: "C") { name }
+            }'''
+        )
+        assert resp.status_code == 400
+        assert resp.json()['errors'][0]['message'] == (
+            'Query too expensive: cost 3006 (2500 at most)'
+        )
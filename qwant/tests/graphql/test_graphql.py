@@ -1,10 +1,17 @@
-from typing import Any, Callable, Dict, Set, Union
+from typing import Any, Callable, Dict, List, Optional, Set, Union
 import json
 from django.http import HttpResponse
+from django.test import Client
+from pytest import MonkeyPatch
 import pytest
+from qwant.music.api import API, APIUnavailable
+from qwant.music.graphql import backend
+from qwant.music.graphql.backend import query_hash
+from qwant.music.graphql.types import artist_cursor
 from qwant.music.models import Artist
 from qwant.music.types import APIData
 from qwant.tests import data
+from seb_music.graphql import schema
 
 GraphQLClient = Callable[..., HttpResponse]
 GraphQLResponse = Dict[str, Any]
@@ -74,15 +81,22 @@ class TestGraphQLModel:
         resp: HttpResponse = graphql_client(
             '''
             query {
-                qwantArtists {
-                    name
-                    slug
-                    apiId
+                qwantArtists(first: 100) {
+                    edges {
+                        node {
+                            name
+                            slug
+                            apiId
+                        }
+                    }
                 }
             }
             '''
         )
-        artists: GraphQLResponse = resp.json()['data']['qwantArtists']
+        artists: List[GraphQLResponse] = [
+            edge['node']
+            for edge in resp.json()['data']['qwantArtists']['edges']
+        ]
         assert {artist['slug'] for artist in artists} == slugs  # type: ignore
 
     @pytest.mark.real_api_call
@@ -109,19 +123,442 @@ class TestGraphQLModel:
         assert content['qwantArtist']['apiId'] == artist['id']
 
     @pytest.mark.django_db
-    def test_artists_search_limit(self, graphql_client: GraphQLClient) -> None:
+    def test_artists_search_first(self, graphql_client: GraphQLClient) -> None:
         for artist_data in data.API_DATA:
             Artist.create_from_api_data(**artist_data)
-        limit: int = 2
+        first: int = 2
         resp: HttpResponse = graphql_client(
             '''
-            query($limit: Int) {
-                qwantArtists(limit: $limit) {
-                    slug
+            query($first: Int) {
+                qwantArtists(first: $first) {
+                    edges { node { slug } }
+                    pageInfo { hasNextPage }
                 }
             }
             ''',
-            variables={'limit': limit},
+            variables={'first': first},
         )
         content: GraphQLResponse = resp.json()['data']
-        assert len(content['qwantArtists']) == limit
+        assert len(content['qwantArtists']['edges']) == first
+        assert content['qwantArtists']['pageInfo']['hasNextPage']
+
+    @pytest.mark.django_db
+    def test_paths(self, graphql_client: GraphQLClient) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        resp: HttpResponse = graphql_client(
+            '''
+            query($pairs: [ArtistPairInput!]!) {
+                qwantPaths(pairs: $pairs) {
+                    source { slug }
+                    target { slug }
+                    artists { slug }
+                    timedOut
+                }
+            }
+            ''',
+            variables={
+                'pairs': [
+                    {'source': 'artist-6', 'target': 'artist-5'},
+                    {'source': 'artist-1', 'target': 'artist-5'},
+                    {'source': 'artist-6', 'target': 'artist-3'},
+                    {'source': 'unknown', 'target': 'artist-3'},
+                ]
+            },
+        )
+        paths: GraphQLResponse = resp.json()['data']['qwantPaths']
+        assert [
+            [artist['slug'] for artist in path['artists']] if path else None
+            for path in paths
+        ] == [
+            ['artist-6', 'artist-4', 'artist-3', 'artist-5'],
+            [],
+            ['artist-6', 'artist-4', 'artist-3'],
+            None,
+        ]
+        assert paths[0]['source']['slug'] == 'artist-6'
+        assert paths[0]['target']['slug'] == 'artist-5'
+        assert not paths[1]['timedOut']
+
+    @pytest.mark.django_db
+    def test_paths_timeout(
+        self,
+        graphql_client: GraphQLClient,
+        monkeypatch: MonkeyPatch,
+        settings: Any,
+    ) -> None:
+        '''The timeout asked for is capped (0 being no time at all).'''
+        settings.QWANT_PATHS_BATCH_TIMEOUT = 10.0
+        settings.QWANT_PATHS_MAX_TIMEOUT = 30.0
+        timeouts: List[float] = []
+
+        def paths_between(pairs: Any, *, timeout: float) -> List[Any]:
+            timeouts.append(timeout)
+            return []
+
+        monkeypatch.setattr(Artist, 'paths_between', paths_between)
+        query: str = '''
+            query($timeout: Float) {
+                qwantPaths(pairs: [], timeout: $timeout) { timedOut }
+            }
+        '''
+        for timeout in (None, 0, 5, 3600, -1):
+            graphql_client(query, variables={'timeout': timeout})
+        assert timeouts == [10.0, 0.0, 5.0, 30.0, 0.0]
+
+    @pytest.mark.django_db
+    def test_components(self, graphql_client: GraphQLClient) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        resp: HttpResponse = graphql_client(
+            '''
+            query {
+                qwantComponents(limit: 1) {
+                    id
+                    size
+                }
+            }
+            '''
+        )
+        components: GraphQLResponse = resp.json()['data']['qwantComponents']
+        assert components == [
+            {'id': Artist.objects.get(slug='artist-3').component, 'size': 4}
+        ]
+
+    @pytest.mark.django_db
+    def test_autocomplete(
+        self, graphql_client: GraphQLClient, settings: Any
+    ) -> None:
+        settings.QWANT_AUTOCOMPLETE_MAX_LIMIT = 3
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        resp: HttpResponse = graphql_client(
+            '''
+            query {
+                qwantAutocomplete(prefix: "Artist", limit: 5) {
+                    id
+                    name
+                    url
+                }
+            }
+            '''
+        )
+        artists: GraphQLResponse = resp.json()['data']['qwantAutocomplete']
+        assert [artist['name'] for artist in artists] == [
+            'Artist-1',
+            'Artist-2',
+            'Artist-3',
+        ]
+        assert artists[2]['url'] == (
+            Artist.objects.get(slug='artist-3').get_absolute_url()
+        )
+
+
+class TestGraphQLPagination:
+    QUERY: str = '''
+        query($first: Int, $after: String) {
+            qwantArtists(first: $first, after: $after) {
+                edges { cursor node { name slug } }
+                pageInfo {
+                    startCursor
+                    endCursor
+                    hasNextPage
+                    hasPreviousPage
+                }
+            }
+        }
+    '''
+
+    @pytest.mark.django_db
+    def test_pages(
+        self,
+        graphql_client: GraphQLClient,
+        django_assert_num_queries: Callable[..., Any],
+    ) -> None:
+        '''The pages follow the cursors, with one query without OFFSET
+        (and one telling whether Artists come before the cursor).'''
+        for i, name in enumerate(('B', 'A', 'C', 'B', 'A')):
+            Artist.objects.create(name=name, slug=f'artist-{i}', api_id=i)
+        slugs: List[str] = []
+        after: Optional[str] = None
+        while True:
+            with django_assert_num_queries(1 + bool(after)) as queries:
+                resp: HttpResponse = graphql_client(
+                    self.QUERY, variables={'first': 2, 'after': after}
+                )
+            assert 'OFFSET' not in queries.captured_queries[0]['sql']
+            page: GraphQLResponse = resp.json()['data']['qwantArtists']
+            slugs.extend(edge['node']['slug'] for edge in page['edges'])
+            assert page['pageInfo']['hasPreviousPage'] == (after is not None)
+            if page['edges']:
+                assert page['pageInfo']['endCursor'] == (
+                    page['edges'][-1]['cursor']
+                )
+            if not page['pageInfo']['hasNextPage']:
+                break
+            after = page['pageInfo']['endCursor']
+        assert len(page['edges']) == 1
+        assert slugs == [
+            artist.slug for artist in Artist.objects.order_by('name', 'pk')
+        ]
+
+    @pytest.mark.django_db
+    def test_previous_page(self, graphql_client: GraphQLClient) -> None:
+        '''A cursor before the first Artist has no previous page.'''
+        first: Artist = Artist.objects.create(name='B', slug='b', api_id=1)
+        Artist.objects.create(name='C', slug='c', api_id=2)
+        previous: List[bool] = []
+        for before in (Artist(name='A', pk=first.pk + 10), first):
+            resp: HttpResponse = graphql_client(
+                self.QUERY,
+                variables={'first': 1, 'after': artist_cursor(before)},
+            )
+            page: GraphQLResponse = resp.json()['data']['qwantArtists']
+            previous.append(page['pageInfo']['hasPreviousPage'])
+        assert previous == [False, True]
+
+    @pytest.mark.django_db
+    def test_page_sizes(
+        self, graphql_client: GraphQLClient, settings: Any
+    ) -> None:
+        settings.QWANT_GRAPHQL_PAGE_SIZE = 2
+        settings.QWANT_GRAPHQL_MAX_PAGE_SIZE = 3
+        Artist.bulk_create_from_api_data(data.API_DATA)
+        sizes: List[int] = []
+        for first in (None, 10, 0):
+            resp: HttpResponse = graphql_client(
+                self.QUERY, variables={'first': first}
+            )
+            page: GraphQLResponse = resp.json()['data']['qwantArtists']
+            sizes.append(len(page['edges']))
+        assert sizes == [2, 3, 0]
+        assert page['pageInfo']['startCursor'] is None
+        assert page['pageInfo']['hasNextPage']
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        'first, after', ((-1, None), (1, 'abc'), (1, 'WzFd'))  # WzFd: [1]
+    )
+    def test_invalid_arguments(
+        self,
+        graphql_client: GraphQLClient,
+        first: int,
+        after: Optional[str],
+    ) -> None:
+        resp: HttpResponse = graphql_client(
+            self.QUERY, variables={'first': first, 'after': after}
+        )
+        assert resp.json()['data']['qwantArtists'] is None
+        assert resp.json()['errors'][0]['message'] in (
+            'first cannot be negative',
+            f'Invalid cursor: {after}',
+        )
+
+
+class TestGraphQLBatching:
+    @staticmethod
+    def similar_artists(depth: int) -> str:
+        '''The selection of the similar Artists nested depth times.'''
+        if not depth:
+            return 'name'
+        nested: str = TestGraphQLBatching.similar_artists(depth - 1)
+        return f'name similarArtists {{ {nested} }}'
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('nb_artists', (5, 50))
+    @pytest.mark.parametrize('depth', (1, 3))
+    def test_similar_artists_queries(
+        self,
+        graphql_client: GraphQLClient,
+        django_assert_max_num_queries: Callable[..., Any],
+        nb_artists: int,
+        depth: int,
+    ) -> None:
+        Artist.bulk_create_from_api_data(
+            {
+                'name': f'Artist-{i}',
+                'slug': f'artist-{i}',
+                'id': i,
+                'similar_artists': [
+                    {'name': f'Artist-{j}', 'slug': f'artist-{j}', 'id': j}
+                    for j in range(i + 1, i + 4)
+                ],
+            }
+            for i in range(nb_artists)
+        )
+        # One query per level at most (the Artists already loaded by the
+        # previous levels are not asked again)
+        with django_assert_max_num_queries(1 + depth):
+            resp: HttpResponse = graphql_client(
+                f'''
+                query($first: Int) {{
+                    qwantArtists(first: $first) {{
+                        edges {{ node {{ {self.similar_artists(depth)} }} }}
+                    }}
+                }}
+                ''',
+                variables={'first': nb_artists},
+            )
+        artists: List[GraphQLResponse] = [
+            edge['node']
+            for edge in resp.json()['data']['qwantArtists']['edges']
+        ]
+        assert len(artists) == nb_artists
+        artist: GraphQLResponse = next(
+            artist for artist in artists if artist['name'] == 'Artist-1'
+        )
+        assert [similar['name'] for similar in artist['similarArtists']] == [
+            'Artist-0',
+            'Artist-2',
+            'Artist-3',
+            'Artist-4',
+        ]
+
+    @pytest.mark.django_db
+    def test_artists_by_slug_queries(
+        self,
+        graphql_client: GraphQLClient,
+        django_assert_num_queries: Callable[..., Any],
+    ) -> None:
+        Artist.bulk_create_from_api_data(data.API_DATA)
+        Artist.name_to_slug('')  # Loads the slug rules
+        with django_assert_num_queries(2):  # The Artists, their similar ones
+            resp: HttpResponse = graphql_client(
+                '''
+                query {
+                    first: qwantArtist(slug: "artist-1") {
+                        slug
+                        similarArtists { slug }
+                    }
+                    second: qwantArtist(name: "Artist 3") {
+                        slug
+                        similarArtists { slug }
+                    }
+                    again: qwantArtist(slug: "artist-1") { slug }
+                }
+                '''
+            )
+        content: GraphQLResponse = resp.json()['data']
+        assert content['first']['slug'] == content['again']['slug']
+        assert content['second']['slug'] == 'artist-3'
+        assert [a['slug'] for a in content['second']['similarArtists']] == [
+            'artist-4',
+            'artist-5',
+        ]
+
+    @pytest.mark.django_db
+    def test_artists_api_unavailable(
+        self, graphql_client: GraphQLClient, monkeypatch: MonkeyPatch
+    ) -> None:
+        '''An API failure only fails the lookup of its own Artist.'''
+        Artist.bulk_create_from_api_data(data.API_DATA)
+
+        def get(slug: str, **kwargs: Any) -> Optional[APIData]:
+            raise APIUnavailable(f'Qwant API not called for {slug}')
+
+        monkeypatch.setattr(API, 'get', get)
+        resp: HttpResponse = graphql_client(
+            '''
+            query {
+                known: qwantArtist(name: "Artist 1") { slug }
+                unknown: qwantArtist(name: "Unknown") { slug }
+            }
+            '''
+        )
+        content: Dict[str, Any] = resp.json()
+        assert content['data'] == {
+            'known': {'slug': 'artist-1'},
+            'unknown': None,
+        }
+        assert [
+            (error['path'], error['message']) for error in content['errors']
+        ] == [(['unknown'], 'Qwant API not called for unknown')]
+
+
+class TestPersistedQueries:
+    QUERY: str = '{ qwantArtist(slug: "artist-1") { slug } }'
+
+    @staticmethod
+    def post(client: Client, **params: Any) -> HttpResponse:
+        return client.post(
+            '/graphql/', json.dumps(params), content_type='application/json'
+        )
+
+    @staticmethod
+    def persisted(sha: str) -> Dict[str, Any]:
+        return {'persistedQuery': {'version': 1, 'sha256Hash': sha}}
+
+    @pytest.mark.django_db
+    def test_persisted_query(
+        self, client: Client, monkeypatch: MonkeyPatch
+    ) -> None:
+        '''The hash alone runs a query known by the process, parsed and
+        validated once.'''
+        Artist.bulk_create_from_api_data(data.API_DATA)
+        backend.backend.clear()
+        validated: List[str] = []
+        validate: Callable[..., Any] = backend.validate
+        monkeypatch.setattr(
+            backend,
+            'validate',
+            lambda *args: validated.append('') or validate(*args),
+        )
+        sha: str = query_hash(self.QUERY)
+        resp: HttpResponse = self.post(
+            client, extensions=self.persisted(sha)
+        )
+        assert resp.status_code == 200
+        assert resp.json()['errors'] == [
+            {
+                'message': 'PersistedQueryNotFound',
+                'extensions': {'code': 'PERSISTED_QUERY_NOT_FOUND'},
+            }
+        ]
+        resp = self.post(
+            client, query=self.QUERY, extensions=self.persisted(sha)
+        )
+        assert resp.json() == {'data': {'qwantArtist': {'slug': 'artist-1'}}}
+        for _ in range(2):
+            resp = client.get(
+                '/graphql/',
+                {'extensions': json.dumps(self.persisted(sha))},
+                HTTP_ACCEPT='application/json',
+            )
+            assert resp.json() == {
+                'data': {'qwantArtist': {'slug': 'artist-1'}}
+            }
+        assert len(validated) == 1
+
+    @pytest.mark.django_db
+    def test_invalid_hash(self, client: Client) -> None:
+        resp: HttpResponse = self.post(
+            client, query=self.QUERY, extensions=self.persisted('0' * 64)
+        )
+        assert resp.status_code == 400
+        assert resp.json()['errors'][0]['message'] == (
+            'provided sha does not match query'
+        )
+        resp = self.post(client, query=self.QUERY, extensions='{')
+        assert resp.status_code == 400
+
+    @pytest.mark.django_db
+    def test_invalid_query_cached(self, client: Client) -> None:
+        '''The validation errors are kept along the query.'''
+        query: str = '{ qwantArtist { unknown } }'
+        for _ in range(2):
+            resp: HttpResponse = self.post(client, query=query)
+            assert resp.status_code == 400
+            assert 'unknown' in resp.json()['errors'][0]['message']
+
+    def test_least_recently_used(self) -> None:
+        cache: backend.PersistedQueryBackend = backend.PersistedQueryBackend(
+            max_size=2
+        )
+        queries: List[str] = [
+            f'{{ qwantComponents(limit: {i}) {{ id }} }}' for i in range(3)
+        ]
+        for query in (queries[0], queries[1], queries[0], queries[2]):
+            cache.document_from_string(schema, query)
+        assert cache.document_from_hash(schema, query_hash(queries[0]))
+        assert not cache.document_from_hash(schema, query_hash(queries[1]))
+        assert cache.document_from_hash(schema, query_hash(queries[2]))
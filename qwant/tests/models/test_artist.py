@@ -3,11 +3,28 @@
 Test module for the Artist class handling the Qwant API response.
 Author: SebDeclercq (https://www.github.com/SebDeclercq)
 '''
-from typing import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import copy
+import math
+import threading
+from _pytest.monkeypatch import MonkeyPatch
+from django.db import connection, connections
 import pytest
-from qwant.music.models import Artist, SpecialChar
+from qwant.music.api import API, APIUnavailable
+from qwant.music.models import (
+    Artist,
+    ArtistTrigram,
+    FuzzyMatch,
+    SpecialChar,
+    not_found,
+    single_flight,
+)
+from qwant.music.trigrams import trigrams
 from qwant.music.types import APIData
 from qwant.tests import data
+from qwant.tests.server import FakeAPI
 
 
 @pytest.fixture(autouse=True)
@@ -102,7 +119,7 @@ class TestArtist:
     def test_no_relation(self) -> None:
         orig: Artist = Artist.create_from_api_data(**data.API_DATA[0])
         dest: Artist = Artist.create_from_api_data(**data.API_DATA[4])
-        path: Sequence[Artist] = orig.path_to(dest, nb_tryouts=20)
+        path: Sequence[Artist] = orig.path_to(dest, max_hops=20)
         assert path == ()
 
     @pytest.mark.django_db
@@ -111,6 +128,317 @@ class TestArtist:
         middle1: Artist = Artist.create_from_api_data(**data.API_DATA[3])
         middle2: Artist = Artist.create_from_api_data(**data.API_DATA[2])
         dest: Artist = Artist.create_from_api_data(**data.API_DATA[4])
-        path: Sequence[Artist] = orig.path_to(dest, nb_tryouts=10)
-        assert set(path) == {orig, middle1, middle2, dest}
+        path: Sequence[Artist] = orig.path_to(dest, max_hops=10)
+        assert path == (orig, middle1, middle2, dest)
 
+    @pytest.mark.django_db
+    def test_shortest_relation(self) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        orig: Artist = Artist.objects.get(slug='artist-6')
+        dest: Artist = Artist.objects.get(slug='artist-5')
+        dest.similar_artists.add(orig)
+        path: Sequence[Artist] = orig.path_to(dest)
+        assert path == (orig, dest)
+
+    @pytest.mark.django_db
+    def test_relation_out_of_budget(self) -> None:
+        orig: Artist = Artist.create_from_api_data(**data.API_DATA[5])
+        middle: Artist = Artist.create_from_api_data(**data.API_DATA[3])
+        Artist.create_from_api_data(**data.API_DATA[2])
+        dest: Artist = Artist.create_from_api_data(**data.API_DATA[4])
+        assert orig.path_to(dest, max_hops=2) == ()
+        assert orig.path_to(dest, max_nodes=2) == ()
+        assert orig.path_to(middle, max_hops=0) == ()  # Not the default
+
+    @pytest.mark.django_db
+    def test_similar_pks(self, monkeypatch: MonkeyPatch) -> None:
+        '''The pks are chunked even without a parameters limit.'''
+        orig: Artist = Artist.create_from_api_data(**data.API_DATA[5])
+        middle: Artist = Artist.objects.get(slug='artist-4')
+        monkeypatch.setattr(connection.features, 'max_query_params', None)
+        assert Artist.similar_pks([]) == {}
+        assert Artist.similar_pks([orig.pk]) == {orig.pk: [middle.pk]}
+
+    @pytest.mark.django_db
+    def test_relation_queries(
+        self, django_assert_max_num_queries: Callable[..., Any]
+    ) -> None:
+        orig: Artist = Artist.create_from_api_data(**data.API_DATA[5])
+        Artist.create_from_api_data(**data.API_DATA[3])
+        Artist.create_from_api_data(**data.API_DATA[2])
+        dest: Artist = Artist.create_from_api_data(**data.API_DATA[4])
+        with django_assert_max_num_queries(5):
+            assert len(orig.path_to(dest)) == 4
+
+    @pytest.mark.django_db
+    def test_components(self) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        components: Dict[str, Optional[int]] = dict(
+            Artist.objects.values_list('slug', 'component')
+        )
+        assert components['artist-2'] is None
+        assert (
+            components['artist-1']
+            == components['similar-1']
+            == components['similar-2']
+        )
+        assert (
+            components['artist-3']
+            == components['artist-4']
+            == components['artist-5']
+            == components['artist-6']
+        )
+        assert components['artist-1'] != components['artist-3']
+        assert sorted(Artist.component_sizes().values()) == [3, 4]
+
+    @pytest.mark.django_db
+    def test_merge_components(self) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        Artist.objects.get(slug='similar-2').similar_artists.add(
+            Artist.objects.get(slug='artist-6'),
+            Artist.objects.get(slug='artist-2'),
+        )
+        assert list(Artist.component_sizes().values()) == [8]
+        assert Artist.objects.get(slug='artist-3').component == (
+            Artist.objects.get(slug='artist-2').component
+        )
+
+    @pytest.mark.django_db
+    def test_merge_inside_component(
+        self, django_assert_num_queries: Callable[..., Any]
+    ) -> None:
+        '''Relations inside a known component are neither locked nor
+        written.'''
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        pks: List[int] = list(
+            Artist.objects.filter(
+                slug__in=['artist-3', 'artist-6']
+            ).values_list('pk', flat=True)
+        )
+        with django_assert_num_queries(1):
+            Artist.merge_components([(pks[0], pks[1])] * 2)
+
+    @pytest.mark.django_db
+    def test_merge_moved_meanwhile(self, monkeypatch: MonkeyPatch) -> None:
+        '''The components are read again once locked if a concurrent merge
+        moved the Artists meanwhile.'''
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        first: Artist = Artist.objects.get(slug='artist-1')
+        third: Artist = Artist.objects.get(slug='artist-3')
+        stale: Dict[int, Optional[int]] = Artist.components_of(
+            [first.pk, third.pk]
+        )
+        Artist.objects.filter(component=third.component).update(
+            component=first.component
+        )  # The concurrent merge
+        reads: List[int] = []
+        components_of = Artist.components_of
+
+        def read(pks: Any) -> Dict[int, Optional[int]]:
+            reads.append(1)
+            return stale if len(reads) < 2 else components_of(pks)
+
+        monkeypatch.setattr(Artist, 'components_of', staticmethod(read))
+        Artist.merge_components([(first.pk, third.pk)])
+        assert len(reads) == 2
+        assert list(Artist.component_sizes().values()) == [7]
+
+    @pytest.mark.django_db
+    def test_rebuild_components(self) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        expected: Dict[int, int] = Artist.component_sizes()
+        Artist.objects.update(component=None)
+        Artist.rebuild_components()
+        assert sorted(Artist.component_sizes().values()) == sorted(
+            expected.values()
+        )
+
+    @pytest.mark.django_db
+    def test_no_relation_between_components(
+        self, django_assert_num_queries: Callable[..., Any]
+    ) -> None:
+        orig: Artist = Artist.create_from_api_data(**data.API_DATA[0])
+        dest: Artist = Artist.create_from_api_data(**data.API_DATA[4])
+        with django_assert_num_queries(1):
+            assert orig.path_to(dest) == ()
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('update_conflicts', [True, False])
+    def test_bulk_create_from_api_data(
+        self, monkeypatch: MonkeyPatch, update_conflicts: bool
+    ) -> None:
+        monkeypatch.setattr(
+            connection.features,
+            'supports_update_conflicts_with_target',
+            update_conflicts,
+        )
+        Artist.objects.create(
+            name='Old', slug='artist-5', api_id=876543, picture='http://p'
+        )
+        artists: List[Artist] = Artist.bulk_create_from_api_data(
+            data.API_DATA
+        )
+        assert [artist.slug for artist in artists] == [
+            artist_data['slug'] for artist_data in data.API_DATA
+        ]
+        assert Artist.objects.count() == 8
+        assert Artist.objects.get(slug='artist-5').name == 'Artist-5'
+        assert Artist.objects.get(slug='artist-5').picture == ''
+        assert Artist.objects.get(slug='artist-1').picture == (
+            'http://www.example.org/pic1'
+        )
+        similar: Artist = Artist.objects.get(slug='similar-1')
+        assert list(similar.similar_artists.all()) == [artists[0]]
+        assert sorted(
+            artists[2].similar_artists.values_list('slug', flat=True)
+        ) == ['artist-4', 'artist-5']
+        assert sorted(Artist.component_sizes().values()) == [3, 4]
+
+    @pytest.mark.django_db
+    def test_bulk_create_keeps_listed_pictures(self) -> None:
+        Artist.bulk_create_from_api_data(data.API_DATA[:1])
+        Artist.objects.filter(slug='similar-1').update(picture='http://p')
+        Artist.bulk_create_from_api_data(data.API_DATA[:1])
+        assert Artist.objects.get(slug='similar-1').picture == 'http://p'
+
+    @pytest.mark.django_db
+    def test_bulk_save_api_data(self) -> None:
+        pks: Dict[int, int] = Artist.bulk_save_api_data(data.API_DATA[:1])
+        assert pks == dict(Artist.objects.values_list('api_id', 'pk'))
+        renamed: APIData = copy.deepcopy(data.API_DATA[0])
+        renamed['similar_artists'][0]['name'] = 'Renamed'
+        assert Artist.bulk_save_api_data([renamed]) == pks
+        assert Artist.objects.get(slug='similar-1').name == 'Renamed'
+        assert Artist.fuzzy_search('Renamed', min_similarity=1.0) == [
+            FuzzyMatch(Artist.objects.get(slug='similar-1'), 1.0)
+        ]
+        assert Artist.objects.get(slug='similar-2').name == 'Similar-2'
+        assert Artist.similar_artists.through.objects.count() == 4
+
+    @pytest.mark.django_db
+    def test_bulk_create_queries(
+        self, django_assert_max_num_queries: Callable[..., Any]
+    ) -> None:
+        payloads: List[APIData] = [
+            {
+                'name': f'Artist-{i}',
+                'slug': f'artist-{i}',
+                'id': i,
+                'similar_artists': [
+                    {'name': f'Artist-{j}', 'slug': f'artist-{j}', 'id': j}
+                    for j in range(i + 1, i + 10)
+                ],
+            }
+            for i in range(0, 500, 5)
+        ]
+        nb_trigrams: int = sum(
+            len(trigrams(f'artist-{i}')) for i in range(505)
+        )
+        # Plus the INSERTs of the trigram index, a DELETE, a savepoint and
+        # the loading of the slug rules
+        with django_assert_max_num_queries(
+            22
+            + math.ceil(
+                nb_trigrams / (connection.features.max_query_params // 3)
+            )
+        ):
+            Artist.bulk_create_from_api_data(payloads)
+        assert Artist.objects.count() == 505
+        assert ArtistTrigram.objects.count() == nb_trigrams
+        assert Artist.similar_artists.through.objects.count() == 2 * 900
+
+    @pytest.mark.django_db
+    def test_search_not_found_cached(self, api_server: FakeAPI) -> None:
+        saved: int = not_found.saved
+        assert Artist.search_or_add('Unknown') is None
+        assert Artist.search_or_add('Unknown') is None
+        assert Artist.search_or_add('UNKNOWN') is None
+        assert api_server.hits == ['unknown']
+        assert not_found.saved - saved == 2
+        assert not_found.total_saved == 2
+
+    @pytest.mark.django_db
+    def test_not_found_expires(self, api_server: FakeAPI) -> None:
+        not_found.cache.set(not_found.PREFIX + 'artist-1', True, timeout=0)
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        assert Artist.search_or_add('Artist 1').slug == 'artist-1'
+        assert api_server.hits == ['artist-1']
+
+    @pytest.mark.django_db
+    def test_reload_forgets_not_found(self, api_server: FakeAPI) -> None:
+        assert Artist.search_or_add('Artist 1') is None
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        assert Artist.search_or_add('Artist 1') is None
+        assert Artist.create_from_api('Artist 1', reload=True)
+        assert 'artist-1' not in not_found
+        assert api_server.hits == ['artist-1', 'artist-1']
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('name', ('Artist 1', 'Unknown'))
+    def test_search_coalesced(
+        self, api_server: FakeAPI, monkeypatch: MonkeyPatch, name: str
+    ) -> None:
+        # Thread-safe in-memory caches instead of the shared SQLite database
+        monkeypatch.setattr(not_found, 'alias', 'default')
+        monkeypatch.setattr(single_flight, 'alias', 'default')
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        api_server.latency = 0.2
+        barrier: threading.Barrier = threading.Barrier(8)
+
+        def search(name: str) -> Optional[str]:
+            barrier.wait()
+            try:
+                artist: Optional[Artist] = Artist.search_or_add(name)
+                return artist.slug if artist else None
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(8) as executor:
+            slugs: List[Optional[str]] = list(executor.map(search, [name] * 8))
+        slug: str = Artist.name_to_slug(name)
+        assert slugs == [slug if name == 'Artist 1' else None] * 8
+        assert api_server.hits == [slug]
+        assert Artist.objects.filter(slug=slug).count() == bool(slugs[0])
+        assert not single_flight._locks
+
+    @pytest.mark.django_db
+    def test_reload_api_unavailable(self, monkeypatch: MonkeyPatch) -> None:
+        def unavailable(slug: str, **kwargs: Any) -> None:
+            raise APIUnavailable
+
+        artist: Artist = Artist.create_from_api_data(**data.API_DATA[0])
+        monkeypatch.setattr(API, 'get', unavailable)
+        assert Artist.create_from_api(artist.name, reload=True) == artist
+        with pytest.raises(APIUnavailable):
+            Artist.search_or_add('Unknown')
+
+    @pytest.mark.django_db
+    def test_fetched_at(self, settings: Any) -> None:
+        settings.QWANT_ARTIST_MAX_AGE = 60
+        artist: Artist = Artist.create_from_api_data(**data.API_DATA[2])
+        assert artist.fetched_at is not None
+        assert not artist.is_stale
+        listed: Artist = artist.similar_artists.get(slug='artist-5')
+        assert listed.fetched_at is None
+        assert listed.is_stale
+        artist.fetched_at -= timedelta(seconds=61)
+        assert artist.is_stale
+
+    @pytest.mark.django_db
+    def test_page_by_name(self) -> None:
+        '''The pages follow the names, then the pks of the homonyms.'''
+        for i, name in enumerate(('B', 'A', 'C', 'B', 'A')):
+            Artist.objects.create(name=name, slug=f'artist-{i}', api_id=i)
+        expected: List[Artist] = list(Artist.objects.order_by('name', 'pk'))
+        pages: List[List[Artist]] = [Artist.page_by_name(2)]
+        while pages[-1]:
+            last: Artist = pages[-1][-1]
+            pages.append(Artist.page_by_name(2, (last.name, last.pk)))
+        assert [len(page) for page in pages] == [2, 2, 1, 0]
+        assert [artist for page in pages for artist in page] == expected
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+'''
+Local HTTP server standing for the unofficial Qwant Music API in the tests.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Dict, List, Tuple
+import sys
+from qwant.music.standin import StandIn
+from qwant.music.types import APIData
+
+
+class FakeAPI(StandIn):
+    '''Stand-in answering GET /music/artist/<slug> with the given data.
+
+    Attributes:
+        artists: The API data served, by slug
+        failures: The statuses to answer before the data, by slug
+        hits: The requested slugs, in order
+    '''
+
+    def __init__(self) -> None:
+        self.artists: Dict[str, APIData] = {}
+        self.failures: Dict[str, List[int]] = {}
+        self.hits: List[str] = []
+        super().__init__(self.artists)
+
+    def respond(self, slug: str) -> Tuple[int, object]:
+        '''Get the status and the body of the response for a slug.'''
+        with self._lock:
+            self.hits.append(slug)
+            if failures := self.failures.get(slug):
+                status: int = failures.pop(0)
+                return status, {'error': status}
+        return super().respond(slug)
+
+
+if __name__ == '__main__':
+    # Serve in a process of its own: python -m qwant.tests.server [LATENCY]
+    server: FakeAPI = FakeAPI()
+    server.latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.0
+    print(server.url, flush=True)
+    server.serve_forever()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+'''
+Test module for the client of the unofficial Qwant Music API.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import Any, List
+import asyncio
+import time
+from _pytest.monkeypatch import MonkeyPatch
+import pytest
+import requests
+from qwant.music.api import (
+    API,
+    APIUnavailable,
+    AsyncAPI,
+    Fetched,
+    LatencyMetrics,
+)
+from qwant.tests import data
+from qwant.tests.server import FakeAPI
+
+
+@pytest.fixture
+def cached_api(api_server: FakeAPI, settings: Any, tmp_path: Path) -> FakeAPI:
+    settings.QWANT_API_CACHE_PATH = str(tmp_path / 'cache.sqlite3')
+    API.close()
+    for artist_data in data.API_DATA:
+        api_server.artists[str(artist_data['slug'])] = artist_data
+    return api_server
+
+
+class TestAPI:
+    def test_get(self, api_server: FakeAPI) -> None:
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        assert API.get('artist-1') == data.API_DATA[0]
+        assert API.get('unknown') is None
+
+    def test_keep_alive(self, api_server: FakeAPI) -> None:
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        for _ in range(5):
+            API.get('artist-1')
+        assert len(api_server.hits) == 5
+        assert api_server.connections == 1
+
+    @pytest.mark.parametrize('status', [429, 500, 503])
+    def test_retry(self, api_server: FakeAPI, status: int) -> None:
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        api_server.failures['artist-1'] = [status, status]
+        assert API.get('artist-1') == data.API_DATA[0]
+        assert api_server.hits == ['artist-1'] * 3
+
+    def test_retries_exhausted(
+        self, api_server: FakeAPI, settings: Any
+    ) -> None:
+        settings.QWANT_API_RETRIES = 2
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        api_server.failures['artist-1'] = [502] * 5
+        with pytest.raises(requests.HTTPError):
+            API.get('artist-1')
+        assert len(api_server.hits) == 3
+        assert API.metrics.errors == 1
+
+    def test_read_timeout(self, api_server: FakeAPI, settings: Any) -> None:
+        settings.QWANT_API_RETRIES = 0
+        settings.QWANT_API_READ_TIMEOUT = 0.1
+        api_server.latency = 1
+        started: float = time.perf_counter()
+        with pytest.raises(requests.RequestException):
+            API.get('artist-1')
+        assert time.perf_counter() - started < 0.9
+
+    def test_metrics(self, api_server: FakeAPI) -> None:
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        for _ in range(4):
+            API.get('artist-1')
+        stats = API.metrics.stats()
+        assert stats['calls'] == 4
+        assert stats['errors'] == 0
+        assert 0 < stats['p50_ms'] <= stats['p95_ms'] <= stats['max_ms']
+
+    def test_one_session_per_process(self, api_server: FakeAPI) -> None:
+        session: requests.Session = API.session()
+        assert API.session() is session
+        API.close()
+        assert API.session() is not session
+
+
+class TestAPICache:
+    def test_fresh_responses_served_from_cache(
+        self, cached_api: FakeAPI
+    ) -> None:
+        assert API.get('artist-1') == data.API_DATA[0]
+        assert API.get('artist-1') == data.API_DATA[0]
+        assert cached_api.hits == ['artist-1']
+        assert API.metrics.calls == 1
+        assert API.cache().stats.hits == 1
+
+    def test_errors_not_cached(self, cached_api: FakeAPI) -> None:
+        assert API.get('unknown') is None
+        assert API.get('unknown') is None
+        assert cached_api.hits == ['unknown', 'unknown']
+        assert len(API.cache()) == 0
+
+    def test_revalidation(
+        self, cached_api: FakeAPI, monkeypatch: MonkeyPatch
+    ) -> None:
+        API.get('artist-1')
+        now: float = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now + 25 * 60 * 60)
+        assert API.get('artist-1') == data.API_DATA[0]
+        assert cached_api.not_modified == 1
+        assert API.cache().stats.revalidations == 1
+        cached_api.artists['artist-1'] = data.API_DATA[1]
+        assert API.get('artist-1') == data.API_DATA[0]  # Fresh again
+        assert API.get('artist-1', revalidate=True) == data.API_DATA[1]
+        assert API.get('artist-1') == data.API_DATA[1]
+        assert len(cached_api.hits) == 3
+
+
+@pytest.fixture
+def failing_api(api_server: FakeAPI, settings: Any) -> FakeAPI:
+    '''Open the circuit breaker after 5 failures out of 10 calls.'''
+    settings.QWANT_API_RETRIES = 0
+    settings.QWANT_API_BREAKER_WINDOW = 10
+    settings.QWANT_API_BREAKER_THRESHOLD = 0.5
+    settings.QWANT_API_BREAKER_COOLDOWN = 0.2
+    api_server.artists['artist-1'] = data.API_DATA[0]
+    api_server.failures['artist-1'] = [503] * 5
+    for _ in range(5):
+        with pytest.raises(requests.HTTPError):
+            API.get('artist-1')
+    return api_server
+
+
+class TestAPIThrottle:
+    def test_fail_fast(self, failing_api: FakeAPI) -> None:
+        assert API.circuit_breaker().state == 'open'
+        with pytest.raises(APIUnavailable):
+            API.get('artist-1')
+        assert len(failing_api.hits) == 5
+
+    def test_serve_stale_response(
+        self, failing_api: FakeAPI, settings: Any, tmp_path: Path
+    ) -> None:
+        settings.QWANT_API_CACHE_PATH = str(tmp_path / 'cache.sqlite3')
+        settings.QWANT_API_CACHE_TTL = 0
+        API.cache().put('artist-1', b'{"id": 1}')
+        assert API.get('artist-1') == {'id': 1}
+        assert len(failing_api.hits) == 5
+
+    def test_background_waits(self, failing_api: FakeAPI) -> None:
+        started: float = time.perf_counter()
+        assert API.get('artist-1', budget=API.BACKGROUND)
+        assert time.perf_counter() - started >= 0.15
+        assert API.circuit_breaker().state == 'closed'
+
+    def test_interactive_budget(
+        self, api_server: FakeAPI, settings: Any, tmp_path: Path
+    ) -> None:
+        settings.QWANT_API_THROTTLE_PATH = str(tmp_path / 'throttle.sqlite3')
+        settings.QWANT_API_BUDGETS = {
+            'interactive': {'rate': 1, 'burst': 2, 'wait': 0},
+            'background': {'rate': 100, 'burst': 1},
+        }
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        slugs: List[str] = ['artist-1'] * 3
+        assert all(result.data for result in get_many(slugs, 3))
+        API.get('artist-1')
+        API.get('artist-1')
+        with pytest.raises(APIUnavailable):
+            API.get('artist-1')
+        assert API.limiter().rejected == {'interactive': 1}
+        assert len(api_server.hits) == 5
+
+
+def get_many(slugs: List[str], concurrency: int) -> List[Fetched]:
+    async def fetch() -> List[Fetched]:
+        return [
+            result
+            async for result in AsyncAPI.get_many(
+                slugs, concurrency=concurrency
+            )
+        ]
+
+    return asyncio.run(fetch())
+
+
+class TestAsyncAPI:
+    def test_get_many(self, api_server: FakeAPI, settings: Any) -> None:
+        settings.QWANT_API_RETRIES = 0
+        for artist_data in data.API_DATA:
+            api_server.artists[str(artist_data['slug'])] = artist_data
+        api_server.failures['artist-2'] = [500]
+        slugs: List[str] = ['artist-1', 'artist-2', 'unknown', 'artist-3']
+        results: List[Fetched] = get_many(slugs, concurrency=2)
+        assert sorted(result.slug for result in results) == sorted(slugs)
+        by_slug = {result.slug: result for result in results}
+        assert by_slug['artist-1'].data == data.API_DATA[0]
+        assert by_slug['artist-3'].data == data.API_DATA[2]
+        assert by_slug['unknown'] == Fetched('unknown', None)
+        assert isinstance(by_slug['artist-2'].error, requests.HTTPError)
+        assert API.metrics.calls == 4
+
+    @pytest.mark.parametrize('concurrency', [1, 4])
+    def test_bounded_concurrency(
+        self, api_server: FakeAPI, concurrency: int
+    ) -> None:
+        api_server.latency = 0.05
+        slugs: List[str] = [f'artist-{i}' for i in range(12)]
+        assert len(get_many(slugs, concurrency)) == len(slugs)
+        assert api_server.max_in_flight == concurrency
+        assert api_server.connections == concurrency
+
+    def test_yield_as_they_arrive(self, api_server: FakeAPI) -> None:
+        api_server.latency = 0.1
+        slugs: List[str] = [f'artist-{i}' for i in range(8)]
+
+        async def first() -> float:
+            started: float = time.perf_counter()
+            async for _ in AsyncAPI.get_many(slugs, concurrency=2):
+                return time.perf_counter() - started
+            return 0
+
+        assert asyncio.run(first()) < 0.3
+
+
+class TestLatencyMetrics:
+    def test_percentiles(self) -> None:
+        metrics: LatencyMetrics = LatencyMetrics(size=10)
+        for seconds in range(1, 21):
+            metrics.record(seconds / 1000, error=seconds > 18)
+        assert metrics.calls == 20
+        assert metrics.errors == 2
+        assert metrics.percentile(0) == 0.011  # Only the last 10 are kept
+        assert metrics.percentile(100) == 0.020
+        assert metrics.stats()['max_ms'] == 20
+        metrics.reset()
+        assert metrics.stats()['calls'] == 0
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+'''
+Test module for the in-memory index completing the artist names.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from _pytest.monkeypatch import MonkeyPatch
+import pytest
+from qwant.music import autocomplete
+from qwant.music.autocomplete import (
+    PrefixIndex,
+    Row,
+    SharedPrefixIndex,
+    Suggestion,
+)
+from qwant.music.models import Artist, autocomplete_index
+from qwant.tests import data
+
+ROWS: List[Row] = [
+    (1, 'daft-punk', 'Daft Punk'),
+    (2, 'moby', 'Moby'),
+    (3, 'mome', 'Møme'),
+    (4, 'daft', 'Daft'),
+    (5, 'mobyx', 'Mobyx'),
+]
+
+
+class TestPrefixIndex:
+    def test_search(self) -> None:
+        index: PrefixIndex = PrefixIndex(ROWS)
+        assert len(index) == 5
+        assert index.search('daft', 10) == [
+            Suggestion(4, 'Daft'),
+            Suggestion(1, 'Daft Punk'),
+        ]
+        assert index.search('mo', 2) == [
+            Suggestion(2, 'Moby'),
+            Suggestion(5, 'Mobyx'),
+        ]
+        assert index.search('mom', 10) == [Suggestion(3, 'Møme')]
+        assert index.search('daft-punkx', 10) == []
+        assert index.search('zz', 10) == []
+        assert [pk for pk, _, _ in index.rows()] == [4, 1, 2, 5, 3]
+        assert PrefixIndex([]).search('', 10) == []
+
+    def test_nbytes(self) -> None:
+        index: PrefixIndex = PrefixIndex(ROWS)
+        assert index.nbytes == (
+            sum(len(key) + len(name.encode()) for _, key, name in ROWS)
+            + 8 * 5
+            + 2 * 4 * 6
+        )
+
+    def test_patched(self) -> None:
+        index: PrefixIndex = PrefixIndex(ROWS)
+        patched: PrefixIndex = index.patched(
+            [(2, 'moby-dick', 'Moby Dick'), (6, 'daft-punk', 'Daft Punk!')],
+            removed=[4],
+        )
+        assert index.search('daft', 10) == [
+            Suggestion(4, 'Daft'),
+            Suggestion(1, 'Daft Punk'),
+        ]
+        assert patched.search('daft', 10) == [
+            Suggestion(1, 'Daft Punk'),
+            Suggestion(6, 'Daft Punk!'),
+        ]
+        assert patched.search('moby', 10) == [
+            Suggestion(2, 'Moby Dick'),
+            Suggestion(5, 'Mobyx'),
+        ]
+        patched = patched.patched([(2, 'moby', 'Moby')], removed=[6])
+        assert patched.search('mob', 10) == index.search('mob', 10)
+        assert patched.search('daft', 10) == [Suggestion(1, 'Daft Punk')]
+        assert patched.nb_changes == 3
+
+    def test_patched_rebuilt(self, monkeypatch: MonkeyPatch) -> None:
+        monkeypatch.setattr(autocomplete, 'MAX_CHANGES', 2)
+        index: PrefixIndex = PrefixIndex(ROWS)
+        patched: PrefixIndex = index.patched(
+            [(6, 'mo', 'Mo'), (7, 'a', 'A')], removed=[1]
+        )
+        assert patched.nb_changes == 0
+        assert patched.built_at == index.built_at
+        assert [pk for pk, _, _ in patched.rows()] == [7, 4, 6, 2, 5, 3]
+
+
+class TestSharedPrefixIndex:
+    def test_get(self) -> None:
+        now: datetime = datetime(2026, 10, 18)
+        artists: List[Tuple[int, str, datetime]] = [(1, 'Moby', now)]
+        since: List[Optional[datetime]] = []
+
+        def loader(
+            date: Optional[datetime],
+        ) -> List[Tuple[int, str, datetime]]:
+            since.append(date)
+            return [row for row in artists if date is None or row[2] >= date]
+
+        shared: SharedPrefixIndex = SharedPrefixIndex(
+            loader,
+            lambda names: (name.lower() for name in names),
+            check_every=0,
+            max_age=60,
+        )
+        assert shared.get().search('mo', 10) == [Suggestion(1, 'Moby')]
+        artists.append((2, 'Mome', now + timedelta(seconds=1)))
+        assert shared.get().search('mo', 10) == [
+            Suggestion(1, 'Moby'),
+            Suggestion(2, 'Mome'),
+        ]
+        shared.get()
+        assert since == [None, now, now + timedelta(seconds=1)]
+        shared.remove([1])
+        shared.check_every = 60
+        assert shared.get().search('mo', 10) == [Suggestion(2, 'Mome')]
+        shared.max_age = 0
+        assert len(shared.get().search('mo', 10)) == 2
+        assert since[-1] is None
+
+
+@pytest.mark.django_db
+class TestArtistAutocomplete:
+    def test_autocomplete(self, monkeypatch: MonkeyPatch) -> None:
+        monkeypatch.setattr(autocomplete_index, 'check_every', 0)
+        Artist.bulk_create_from_api_data(data.API_DATA[:2])
+        assert Artist.autocomplete('  Similar ') == [
+            Suggestion(Artist.objects.get(slug=slug).pk, name)
+            for slug, name in (
+                ('similar-1', 'Similar-1'),
+                ('similar-2', 'Similar-2'),
+            )
+        ]
+        assert Artist.autocomplete('') == Artist.autocomplete('!') == []
+        artist: Artist = Artist.objects.get(slug='artist-1')
+        artist.name = 'Similar Artist'
+        artist.save()
+        assert [s.name for s in Artist.autocomplete('similar-', 1)] == [
+            'Similar-1'
+        ]
+        assert [s.name for s in Artist.autocomplete('similar a')] == [
+            'Similar Artist'
+        ]
+        artist.delete()
+        assert Artist.autocomplete('similar a') == []
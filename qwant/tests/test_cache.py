@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+'''
+Test module for the on-disk cache of the API responses.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+import time
+from _pytest.monkeypatch import MonkeyPatch
+import pytest
+from qwant.music.cache import CachedResponse, ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> ResponseCache:
+    return ResponseCache(tmp_path / 'cache.sqlite3', ttl=60, max_bytes=100)
+
+
+class TestResponseCache:
+    def test_get_put(self, cache: ResponseCache) -> None:
+        assert cache.get('artist-1') is None
+        cache.put('artist-1', b'{"id": 1}', etag='"a"')
+        cached: CachedResponse = cache.get('artist-1')
+        assert cached == CachedResponse(b'{"id": 1}', '"a"', None, True)
+        assert cached.validators == {'If-None-Match': '"a"'}
+        assert cache.stats.as_dict() == {
+            'hits': 1,
+            'misses': 1,
+            'revalidations': 0,
+            'stores': 1,
+            'evictions': 0,
+        }
+
+    def test_ttl(
+        self, cache: ResponseCache, monkeypatch: MonkeyPatch
+    ) -> None:
+        cache.put('artist-1', b'{}', last_modified='Mon')
+        now: float = time.time()
+        monkeypatch.setattr(time, 'time', lambda: now + 61)
+        stale: CachedResponse = cache.get('artist-1')
+        assert not stale.fresh
+        assert stale.validators == {'If-Modified-Since': 'Mon'}
+        cache.revalidated('artist-1')
+        assert cache.get('artist-1').fresh
+        assert cache.stats.revalidations == 1
+
+    def test_size_and_lru_eviction(self, cache: ResponseCache) -> None:
+        for i in range(4):
+            cache.put(f'artist-{i}', b'x' * 20)
+        cache.put('artist-0', b'x' * 30)  # Replaced, so most recent
+        cache.get('artist-1')
+        assert cache.size == 90
+        cache.put('artist-4', b'x' * 20)  # Over 100: back under 90
+        assert cache.size == 90
+        assert cache.get('artist-2') is None
+        assert cache.get('artist-3') is not None
+        assert cache.stats.evictions == 1
+        assert len(cache) == 4
+
+    def test_shared_between_instances(
+        self, cache: ResponseCache, tmp_path: Path
+    ) -> None:
+        cache.put('artist-1', b'{}')
+        other: ResponseCache = ResponseCache(
+            tmp_path / 'cache.sqlite3', ttl=60, max_bytes=100
+        )
+        assert other.get('artist-1') is not None
+        other.clear()
+        assert cache.get('artist-1') is None
+        assert cache.size == 0
@@ -3,11 +3,18 @@
 Test module for the custom commands.
 Author: SebDeclercq (https://www.github.com/SebDeclercq)
 '''
+from typing import List
+from io import StringIO
+from pathlib import Path
+import gzip
+import json
 from django.core.management import call_command, CommandError
 from _pytest.monkeypatch import MonkeyPatch
 import pytest
 from qwant.management.commands.feed_sample import DbSampler
-from qwant.music.models import Artist
+from qwant.music.models import Artist, ArtistTrigram, Landmark, RefreshJob
+from qwant.tests import data
+from qwant.tests.server import FakeAPI
 
 
 class TestAddArtistCommand:
@@ -34,3 +41,201 @@ class TestDbSamplerCommand:
         nb_artist: int = Artist.objects.count()
         call_command('feed_sample', *[], **{})
         assert Artist.objects.count() > nb_artist
+
+    @pytest.mark.django_db
+    def test_feed_db(
+        self, api_server: FakeAPI, monkeypatch: MonkeyPatch
+    ) -> None:
+        for artist_data in data.API_DATA:
+            api_server.artists[str(artist_data['slug'])] = artist_data
+        monkeypatch.setattr(
+            DbSampler, 'ARTIST_NAMES', ('Artist-3', 'Unknown', 'Artist-1')
+        )
+        artists: List[Artist] = DbSampler.feed_db()
+        assert [artist.slug for artist in artists] == [
+            'artist-3',
+            'artist-1',
+        ]
+        assert sorted(api_server.hits) == ['artist-1', 'artist-3', 'unknown']
+        artist: Artist = Artist.objects.get(slug='artist-1')
+        assert artist.similar_artists.count() == 2
+
+
+class TestArtistPathsCommand:
+    @pytest.mark.django_db
+    def test_artist_paths(self, tmp_path: Path) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        pairs: Path = tmp_path / 'pairs.txt'
+        pairs.write_text(
+            '# source target\n'
+            'artist-6 artist-5\n'
+            '\n'
+            'artist-1,artist-5\n'
+            'artist-6\tartist-4\n'
+            'unknown artist-4\n'
+        )
+        out: StringIO = StringIO()
+        call_command('artist_paths', str(pairs), batch_size=2, stdout=out)
+        assert out.getvalue().splitlines() == [
+            'artist-6\tartist-5\t3\tartist-6 artist-4 artist-3 artist-5',
+            'artist-1\tartist-5\tnone\t',
+            'unknown\tartist-4\tunknown\t',
+            'artist-6\tartist-4\t1\tartist-6 artist-4',
+        ]
+
+    @pytest.mark.django_db
+    def test_artist_paths_timeout(self, tmp_path: Path) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        pairs: Path = tmp_path / 'pairs.txt'
+        pairs.write_text('artist-6 artist-5\n')
+        out: StringIO = StringIO()
+        call_command('artist_paths', str(pairs), timeout=0, stdout=out)
+        assert out.getvalue() == 'artist-6\tartist-5\ttimeout\t\n'
+
+    @pytest.mark.django_db
+    def test_artist_paths_bad_file(self, tmp_path: Path) -> None:
+        pairs: Path = tmp_path / 'pairs.txt'
+        pairs.write_text('artist-6 artist-5 artist-4\n')
+        with pytest.raises(CommandError):
+            call_command('artist_paths', str(pairs))
+        with pytest.raises(CommandError):
+            call_command('artist_paths', str(tmp_path / 'missing.txt'))
+
+
+class TestBuildComponentsCommand:
+    @pytest.mark.django_db
+    def test_build_components(self) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        Artist.objects.update(component=None)
+        out: StringIO = StringIO()
+        call_command('build_components', stdout=out)
+        lines: List[str] = out.getvalue().splitlines()
+        assert lines[0] == '2 components rebuilt'
+        assert lines[1] == (
+            '2 components, 7 artists in components, '
+            '1 artists without component'
+        )
+        assert [line.split('\t')[1] for line in lines[2:]] == ['4', '3']
+
+    @pytest.mark.django_db
+    def test_component_stats(self) -> None:
+        out: StringIO = StringIO()
+        call_command('build_components', stats=True, stdout=out)
+        assert out.getvalue() == (
+            '0 components, 0 artists in components, '
+            '0 artists without component\n'
+        )
+
+
+class TestBuildTrigramsCommand:
+    @pytest.mark.django_db
+    def test_build_trigrams(self) -> None:
+        Artist.bulk_create_from_api_data(data.API_DATA)
+        ArtistTrigram.objects.all().delete()
+        out: StringIO = StringIO()
+        call_command('build_trigrams', chunk_size=3, stdout=out)
+        assert out.getvalue().startswith(
+            f'Done: {ArtistTrigram.objects.count()} trigrams of 8 artists '
+        )
+        assert Artist.fuzzy_search('Similar 2', limit=1)[0].artist == (
+            Artist.objects.get(slug='similar-2')
+        )
+
+
+class TestBuildLandmarksCommand:
+    @pytest.mark.django_db
+    def test_build_landmarks(self) -> None:
+        for artist_data in data.API_DATA:
+            Artist.create_from_api_data(**artist_data)
+        out: StringIO = StringIO()
+        call_command('build_landmarks', count=2, stdout=out)
+        assert out.getvalue().startswith('2 landmarks built in')
+        assert Landmark.objects.count() == 2
+
+
+class TestCrawlArtistsCommand:
+    @pytest.mark.django_db
+    def test_crawl_artists(
+        self, api_server: FakeAPI, tmp_path: Path
+    ) -> None:
+        for artist_data in data.API_DATA:
+            api_server.artists[str(artist_data['slug'])] = artist_data
+        state: Path = tmp_path / 'crawl.json'
+        out: StringIO = StringIO()
+        call_command(
+            'crawl_artists',
+            seed=['Artist-6'],
+            depth=1,
+            state=state,
+            stdout=out,
+        )
+        lines: List[str] = out.getvalue().splitlines()
+        assert len(lines) == 3
+        assert lines[0].startswith('1 artists (')
+        assert lines[-1] == (
+            'Done: 2 artists fetched, 0 not found, 0 errors '
+            '(0 artists given up), 0 still queued'
+        )
+        out = StringIO()
+        with pytest.raises(CommandError):
+            call_command(
+                'crawl_artists', seed=['Artist-4'], state=state, stdout=out
+            )
+        assert out.getvalue() == 'Resuming: 2 artists fetched, 0 queued\n'
+
+
+class TestRunRefreshWorkerCommand:
+    @pytest.mark.django_db
+    def test_run_refresh_worker(self, api_server: FakeAPI) -> None:
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        RefreshJob.enqueue(['artist-1'])
+        out: StringIO = StringIO()
+        call_command('run_refresh_worker', once=True, stdout=out)
+        assert out.getvalue().splitlines() == [
+            '1 artists refreshed, 0 not found, 0 errors',
+            'Done: 1 artists refreshed',
+        ]
+        assert Artist.objects.get(slug='artist-1').fetched_at
+
+
+class TestImportArtistsCommand:
+    @pytest.mark.django_db
+    def test_import_artists(self, tmp_path: Path) -> None:
+        path: Path = tmp_path / 'dump.ndjson.gz'
+        with gzip.open(path, 'wb') as dump:
+            for artist_data in data.API_DATA:
+                dump.write(json.dumps(artist_data).encode() + b'\n')
+        out: StringIO = StringIO()
+        call_command('import_artists', path, batch_size=4, stdout=out)
+        assert out.getvalue().startswith(
+            'Done: 6 artists imported, 0 invalid lines in '
+        )
+        assert Artist.objects.count() == 8
+
+    def test_import_artists_no_dump(self, tmp_path: Path) -> None:
+        with pytest.raises(CommandError):
+            call_command('import_artists', tmp_path / 'missing.ndjson')
+
+
+class TestExportGraphCommand:
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        'name, format', (('graph.ndjson', 'ndjson'), ('graph.bin', 'binary'))
+    )
+    def test_export_graph(
+        self, tmp_path: Path, name: str, format: str
+    ) -> None:
+        Artist.bulk_create_from_api_data(data.API_DATA)
+        out: StringIO = StringIO()
+        call_command('export_graph', tmp_path / name, stdout=out)
+        assert out.getvalue().startswith(
+            f'Done: 8 artists, 10 relations exported to {tmp_path / name} ('
+        )
+        assert f', {format}) in ' in out.getvalue()
+
+    def test_export_graph_no_directory(self, tmp_path: Path) -> None:
+        with pytest.raises(CommandError):
+            call_command('export_graph', tmp_path / 'missing' / 'graph.bin')
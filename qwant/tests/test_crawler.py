@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+'''
+Test module for the breadth-first crawler of the similar artists.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import Any, List
+from _pytest.monkeypatch import MonkeyPatch
+import pytest
+from qwant.music.crawler import Crawler, CrawlState
+from qwant.music.models import Artist
+from qwant.tests import data
+from qwant.tests.server import FakeAPI
+
+
+@pytest.fixture
+def graph_api(api_server: FakeAPI) -> FakeAPI:
+    '''Serve artist-6 -> artist-4 -> artist-3 -> (artist-4, artist-5).'''
+    for artist_data in data.API_DATA:
+        api_server.artists[str(artist_data['slug'])] = artist_data
+    return api_server
+
+
+def crawl(state: CrawlState, **kwargs: Any) -> List[str]:
+    reports: List[str] = []
+    options = {'max_depth': 5, 'max_artists': 100, 'workers': 2}
+    options.update(kwargs)
+    Crawler(state, report=reports.append, **options).run()
+    return reports
+
+
+@pytest.mark.django_db
+class TestCrawler:
+    @pytest.mark.parametrize(
+        'depth,fetched',
+        (
+            (0, ['artist-6']),
+            (1, ['artist-6', 'artist-4']),
+            (2, ['artist-6', 'artist-4', 'artist-3']),
+            (3, ['artist-6', 'artist-4', 'artist-3', 'artist-5']),
+        ),
+    )
+    def test_depth(
+        self, graph_api: FakeAPI, depth: int, fetched: List[str]
+    ) -> None:
+        state: CrawlState = CrawlState()
+        state.push('artist-6', 0)
+        crawl(state, max_depth=depth, batch_size=1)
+        assert graph_api.hits == fetched
+        assert state.fetched == len(fetched)
+        assert Artist.objects.get(slug='artist-6').similar_artists.count()
+
+    def test_dedup(self, graph_api: FakeAPI) -> None:
+        state: CrawlState = CrawlState()
+        for slug in ('artist-3', 'artist-4', 'artist-5', 'artist-3'):
+            state.push(slug, 0)
+        graph_api.artists['artist-3-alias'] = data.API_DATA[2]
+        state.push('artist-3-alias', 0)
+        crawl(state)
+        assert sorted(graph_api.hits) == [
+            'artist-3',
+            'artist-3-alias',
+            'artist-4',
+            'artist-5',
+        ]
+        assert state.fetched == 3
+        assert not state.frontier
+
+    def test_max_artists_and_resume(
+        self, graph_api: FakeAPI, tmp_path: Path
+    ) -> None:
+        path: Path = tmp_path / 'crawl.json'
+        state: CrawlState = CrawlState()
+        state.push('artist-6', 0)
+        crawl(state, max_artists=2, batch_size=1, state_path=path)
+        assert graph_api.hits == ['artist-6', 'artist-4']
+        resumed: CrawlState = CrawlState.load(path)
+        assert list(resumed.frontier) == [('artist-3', 2)]
+        assert resumed.fetched == 2
+        crawl(resumed, state_path=path)
+        assert graph_api.hits == [
+            'artist-6',
+            'artist-4',
+            'artist-3',
+            'artist-5',
+        ]
+        assert CrawlState.load(path).fetched == 4
+
+    def test_errors(self, graph_api: FakeAPI, settings: Any) -> None:
+        settings.QWANT_API_RETRIES = 0
+        graph_api.failures['artist-4'] = [500] * 2
+        state: CrawlState = CrawlState()
+        for slug in ('artist-6', 'artist-4', 'unknown'):
+            state.push(slug, 0)
+        reports: List[str] = crawl(state, max_depth=0, max_attempts=2)
+        assert state.failed == {'artist-4': 0}
+        assert 'artist-4' not in state.seen
+        assert state.not_found == 1
+        assert state.fetched == 1
+        assert reports[-1].endswith('queued, 2 errors (50.0%)')
+
+    def test_failed_queued_again(
+        self, graph_api: FakeAPI, settings: Any, tmp_path: Path
+    ) -> None:
+        '''A failed fetch is retried by a later batch, and by a resumed
+        crawl once given up.'''
+        settings.QWANT_API_RETRIES = 0
+        settings.QWANT_API_BREAKER_THRESHOLD = 2  # Never open
+        graph_api.failures['artist-4'] = [503] * 3
+        path: Path = tmp_path / 'crawl.json'
+        state: CrawlState = CrawlState()
+        state.push('artist-6', 0)
+        crawl(state, max_depth=1, max_attempts=2, state_path=path)
+        assert graph_api.hits == ['artist-6', 'artist-4', 'artist-4']
+        assert state.failed == {'artist-4': 1}
+        resumed: CrawlState = CrawlState.load(path)
+        assert list(resumed.frontier) == [('artist-4', 1)]
+        crawl(resumed, max_depth=2, max_attempts=2, state_path=path)
+        assert graph_api.hits[3:] == ['artist-4', 'artist-4', 'artist-3']
+        assert not resumed.failed
+        assert not resumed.attempts
+        assert resumed.fetched == 3
+        assert resumed.errors == 3
+
+    def test_write_failure_keeps_the_batch(
+        self, graph_api: FakeAPI, monkeypatch: MonkeyPatch
+    ) -> None:
+        def fail(payloads: Any) -> None:
+            raise RuntimeError
+
+        monkeypatch.setattr(Artist, 'bulk_save_api_data', fail)
+        state: CrawlState = CrawlState()
+        state.push('artist-6', 0)
+        with pytest.raises(RuntimeError):
+            crawl(state)
+        assert list(state.frontier) == [('artist-6', 0)]
+        assert state.fetched == 0
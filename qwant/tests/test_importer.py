@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+'''
+Test module for the bulk import of JSON lines dumps.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import List
+import json
+import pytest
+from qwant.music.importer import Importer, ImportStats, InvalidRecord
+from qwant.music.importer import parse_record
+from qwant.music.models import Artist
+from qwant.music.ndjson import open_file
+from qwant.tests import data
+
+
+def dump(path: Path, lines: List[bytes]) -> Path:
+    with open_file(path, 'wb') as file:
+        file.writelines(line + b'\n' for line in lines)
+    return path
+
+
+class TestParseRecord:
+    @pytest.mark.django_db
+    def test_parse_record(self) -> None:
+        line: bytes = json.dumps(
+            {
+                'id': '42',
+                'name': 'Some Artist',
+                'picture': 'http://p',
+                'similar_artists': [{'id': 43, 'name': 'Other', 'x': 1}],
+                'unknown': True,
+            }
+        ).encode()
+        assert parse_record(line) == {
+            'id': 42,
+            'name': 'Some Artist',
+            'slug': 'some-artist',
+            'picture': 'http://p',
+            'similar_artists': [{'id': 43, 'name': 'Other', 'slug': 'other'}],
+        }
+        assert parse_record(json.dumps(data.API_DATA[0]).encode()) == (
+            data.API_DATA[0]
+        )
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        'line',
+        (
+            b'{"id": 1, "name": "Cut',
+            b'[1, 2]',
+            b'{"name": "No id"}',
+            b'{"id": "x", "name": "Bad id"}',
+            b'{"id": 1, "name": " "}',
+            b'{"id": 1, "name": "Bad slug", "slug": "bad slug"}',
+            b'{"id": 1, "name": "A", "similar_artists": {"id": 2}}',
+            b'{"id": 1, "name": "A", "similar_artists": [{"id": 2}]}',
+        ),
+    )
+    def test_parse_record_invalid(self, line: bytes) -> None:
+        with pytest.raises(InvalidRecord):
+            parse_record(line)
+
+
+class TestImporter:
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('name', ('dump.ndjson', 'dump.ndjson.gz'))
+    def test_run(self, tmp_path: Path, name: str) -> None:
+        path: Path = dump(
+            tmp_path / name,
+            [json.dumps(artist_data).encode() for artist_data in data.API_DATA]
+            + [b'', b'{"id": 1}'],
+        )
+        warnings: List[str] = []
+        importer: Importer = Importer(batch_size=2, warn=warnings.append)
+        with open_file(path, 'rb') as lines:
+            stats: ImportStats = importer.run(lines)
+        assert (stats.lines, stats.imported, stats.invalid) == (8, 6, 1)
+        assert warnings == ['Line 8: Missing name (id 1)']
+        assert Artist.objects.count() == 8
+        assert sorted(
+            Artist.objects.get(slug='artist-3').similar_artists.values_list(
+                'slug', flat=True
+            )
+        ) == ['artist-4', 'artist-5']
+
+    @pytest.mark.django_db
+    def test_run_slug_conflict(self) -> None:
+        Artist.objects.create(name='Taken', slug='artist-2', api_id=1)
+        warnings: List[str] = []
+        importer: Importer = Importer(warn=warnings.append)
+        stats: ImportStats = importer.run(
+            json.dumps(artist_data).encode() for artist_data in data.API_DATA
+        )
+        assert (stats.imported, stats.invalid) == (5, 1)
+        assert warnings[0].startswith('Artist artist-2: ')
+        assert Artist.objects.get(slug='artist-2').name == 'Taken'
+        assert Artist.objects.filter(slug='artist-3').exists()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+'''
+Test module for the per-key locks coalescing the concurrent requests.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import threading
+import time
+import pytest
+from qwant.music.locks import SingleFlight
+
+
+@pytest.fixture
+def single_flight() -> SingleFlight:
+    lock: SingleFlight = SingleFlight('default', timeout=1, poll=0.01)
+    lock.cache.clear()
+    return lock
+
+
+class TestSingleFlight:
+    def test_one_holder_per_key(self, single_flight: SingleFlight) -> None:
+        holders: List[str] = []
+        max_holders: List[int] = [0]
+        guard: threading.Lock = threading.Lock()
+
+        def hold(key: str) -> None:
+            with single_flight(key):
+                with guard:
+                    holders.append(key)
+                    max_holders[0] = max(max_holders[0], holders.count(key))
+                time.sleep(0.01)
+                with guard:
+                    holders.remove(key)
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(hold, ['a', 'b'] * 8))
+        assert max_holders == [1]
+        assert single_flight.waits
+        assert not single_flight._locks
+        assert single_flight.cache.get(single_flight.PREFIX + 'a') is None
+
+    def test_wait_for_other_process(self, single_flight: SingleFlight) -> None:
+        single_flight.cache.add(single_flight.PREFIX + 'a', 'other')
+        timer: threading.Timer = threading.Timer(
+            0.1, single_flight.cache.delete, (single_flight.PREFIX + 'a',)
+        )
+        timer.start()
+        start: float = time.monotonic()
+        with single_flight('a'):
+            assert time.monotonic() - start >= 0.1
+        timer.join()
+        assert single_flight.waits == 1
+
+    def test_give_up_stale_lock(self, single_flight: SingleFlight) -> None:
+        single_flight.timeout = 0.1
+        single_flight.cache.add(single_flight.PREFIX + 'a', 'other')
+        with single_flight('a'):
+            pass
+        # Not released: it belongs to the other process
+        assert single_flight.cache.get(single_flight.PREFIX + 'a') == 'other'
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+'''
+Test module for the refresh queue of the artists and its worker.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, List
+import json
+from django.utils import timezone
+import pytest
+from qwant.music.api import API
+from qwant.music.models import Artist, RefreshJob
+from qwant.music.refresh import RefreshWorker
+from qwant.tests import data
+from qwant.tests.server import FakeAPI
+
+
+@pytest.fixture
+def artists(api_server: FakeAPI) -> List[Artist]:
+    '''Store artist-3 and its similar artists, then serve them changed.'''
+    artists: List[Artist] = Artist.bulk_create_from_api_data(data.API_DATA)
+    for artist_data in data.API_DATA:
+        api_server.artists[str(artist_data['slug'])] = dict(
+            artist_data, name=f"{artist_data['name']} (new)"
+        )
+    return artists
+
+
+def refresh(**kwargs: Any) -> List[str]:
+    reports: List[str] = []
+    RefreshWorker(report=reports.append, **kwargs).run(once=True)
+    return reports
+
+
+@pytest.mark.django_db
+class TestRefreshJob:
+    def test_enqueue_once(self) -> None:
+        RefreshJob.enqueue(['artist-1', 'artist-2', 'artist-1'])
+        RefreshJob.enqueue(['artist-1'])
+        assert sorted(RefreshJob.objects.values_list('slug', flat=True)) == [
+            'artist-1',
+            'artist-2',
+        ]
+
+    def test_claim(self) -> None:
+        RefreshJob.enqueue(['artist-1', 'artist-2', 'artist-3'])
+        first: List[RefreshJob] = RefreshJob.claim(2, lease=60)
+        second: List[RefreshJob] = RefreshJob.claim(2, lease=60)
+        assert len(first) == 2
+        assert len(second) == 1
+        assert {job.slug for job in first + second} == {
+            'artist-1',
+            'artist-2',
+            'artist-3',
+        }
+        assert not RefreshJob.claim(2, lease=60)
+
+    def test_lease_expires(self) -> None:
+        RefreshJob.enqueue(['artist-1'])
+        assert RefreshJob.claim(1, lease=-1)[0].attempts == 1
+        assert RefreshJob.claim(1, lease=60)[0].attempts == 2
+
+
+@pytest.mark.django_db
+class TestRefreshWorker:
+    def test_refresh(
+        self, api_server: FakeAPI, artists: List[Artist]
+    ) -> None:
+        RefreshJob.enqueue(['artist-3', 'artist-4', 'unknown'])
+        reports: List[str] = refresh(batch_size=2)
+        assert reports == [
+            '2 artists refreshed, 0 not found, 0 errors',
+            '0 artists refreshed, 1 not found, 0 errors',
+        ]
+        assert sorted(api_server.hits) == ['artist-3', 'artist-4', 'unknown']
+        assert Artist.objects.get(slug='artist-3').name.endswith('(new)')
+        assert not Artist.objects.get(slug='artist-5').name.endswith('(new)')
+        assert not RefreshJob.objects.exists()
+
+    def test_refresh_cached(
+        self,
+        api_server: FakeAPI,
+        artists: List[Artist],
+        settings: Any,
+        tmp_path: Path,
+    ) -> None:
+        '''A refresh asks the API again, even if its cached response is
+        still fresh.'''
+        settings.QWANT_API_CACHE_PATH = str(tmp_path / 'cache.sqlite3')
+        API.close()
+        API.cache().put('artist-3', json.dumps(data.API_DATA[2]).encode())
+        RefreshJob.enqueue(['artist-3'])
+        assert refresh() == ['1 artists refreshed, 0 not found, 0 errors']
+        assert api_server.hits == ['artist-3']
+        assert Artist.objects.get(slug='artist-3').name.endswith('(new)')
+
+    def test_retry_later(
+        self, api_server: FakeAPI, artists: List[Artist], settings: Any
+    ) -> None:
+        settings.QWANT_API_RETRIES = 0
+        api_server.failures['artist-3'] = [500]
+        RefreshJob.enqueue(['artist-3'])
+        assert refresh(retry_delay=60) == [
+            '0 artists refreshed, 0 not found, 1 errors'
+        ]
+        job: RefreshJob = RefreshJob.objects.get()
+        assert job.available_at > timezone.now() + timedelta(seconds=50)
+        RefreshJob.objects.update(available_at=timezone.now())
+        refresh()
+        assert Artist.objects.get(slug='artist-3').name.endswith('(new)')
+        assert not RefreshJob.objects.exists()
+
+    def test_drop_after_max_attempts(
+        self, api_server: FakeAPI, artists: List[Artist], settings: Any
+    ) -> None:
+        settings.QWANT_API_RETRIES = 0
+        api_server.failures['artist-3'] = [500] * 2
+        RefreshJob.enqueue(['artist-3'])
+        refresh(max_attempts=2, retry_delay=0)
+        assert len(api_server.hits) == 2
+        assert not RefreshJob.objects.exists()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+'''
+Test module for the conversion of the artist names to slugs.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Dict, List
+from hypothesis import given, strategies
+import pytest
+from qwant.music.models import Artist, SpecialChar, slug_rules
+from qwant.music.slugs import Rule, SharedSlugRules, SlugRules
+from qwant.tests import data
+
+
+class TestSlugRules:
+    @pytest.mark.parametrize('name, slug', data.NAMES_AND_SLUGS)
+    def test_slugify(self, name: str, slug: str) -> None:
+        rules: SlugRules = SlugRules([('ø', 'o')], cache_size=10)
+        assert rules.slugify(name) == slug
+
+    def test_slugify_special_cases(self) -> None:
+        rules: SlugRules = SlugRules([], cache_size=10)
+        assert rules.slugify('Møme') == 'mme'
+        assert rules.slugify(' a\t\x1c-_b c ') == '-a-_b-c-'
+        assert rules.slugify('ﬁve İstanbul') == 'five-istanbul'
+        with pytest.raises(TypeError):
+            rules.slugify(None)  # type: ignore
+
+    def test_several_characters(self) -> None:
+        rules: SlugRules = SlugRules(
+            [('ø', 'o'), ('ss', 's'), ('sss', 'z'), ('o', 'ss')],
+            cache_size=10,
+        )
+        assert rules.translate('Møsssss') == 'Mozs'  # One pass, no chain
+        assert rules.slugify('Løss O') == 'los-o'
+
+    def test_cache(self) -> None:
+        rules: SlugRules = SlugRules([], cache_size=2)
+        for name in ('A', 'B', 'A', 'C', 'B'):
+            rules.slugify(name)
+        assert rules.slugify.cache_info().hits == 1  # type: ignore
+
+    @given(
+        strategies.lists(strategies.text()),
+        strategies.dictionaries(
+            strategies.text(min_size=1, max_size=3),
+            strategies.text(max_size=3),
+            max_size=5,
+        ),
+    )
+    def test_slugify_chunk(self, names: List[str], rules: Dict) -> None:
+        '''The slugs of a chunk are the ones of its names, whatever the
+        names (separators included) and the rules.'''
+        compiled: SlugRules = SlugRules(rules.items(), cache_size=0)
+        assert compiled.slugify_chunk(names) == [
+            compiled.slugify(name) for name in names
+        ]
+
+    def test_slugify_many(self) -> None:
+        rules: SlugRules = SlugRules([('ø', 'o')], cache_size=0)
+        names: List[str] = [name for name, _ in data.NAMES_AND_SLUGS] * 3
+        slugs: List[str] = [slug for _, slug in data.NAMES_AND_SLUGS] * 3
+        assert list(rules.slugify_many(iter(names), chunk_size=5)) == slugs
+        assert list(rules.slugify_many(names, workers=2, chunk_size=2)) == (
+            slugs
+        )
+        assert list(rules.slugify_many([])) == []
+
+
+class TestSharedSlugRules:
+    def test_get(self) -> None:
+        loaded: List[List[Rule]] = []
+
+        def loader() -> List[Rule]:
+            loaded.append([('ø', 'o')])
+            return loaded[-1]
+
+        shared: SharedSlugRules = SharedSlugRules(
+            loader, alias='default', check_every=60, cache_size=10
+        )
+        assert shared.get() is shared.get()
+        assert shared.get().slugify('Møme') == 'mome'
+        assert len(loaded) == 1
+        shared.clear()
+        shared.get()
+        assert len(loaded) == 2
+
+    def test_invalidate_other_process(self) -> None:
+        '''The processes only share the version token.'''
+        rules: List[Rule] = [('ø', 'o')]
+        first: SharedSlugRules = SharedSlugRules(
+            lambda: list(rules), alias='default', check_every=0, cache_size=10
+        )
+        second: SharedSlugRules = SharedSlugRules(
+            lambda: list(rules), alias='default', check_every=0, cache_size=10
+        )
+        assert second.get().slugify('Møme') == 'mome'
+        rules[0] = ('ø', 'oe')
+        assert second.get().slugify('Møme') == 'mome'
+        first.invalidate()
+        assert second.get().slugify('Møme') == 'moeme'
+        compiled: SlugRules = second.get()
+        assert second.get() is compiled
+
+
+class TestSpecialCharSignals:
+    @pytest.mark.django_db
+    def test_special_char_changed(self) -> None:
+        assert Artist.name_to_slug('Møme') == 'mme'
+        special_char: SpecialChar = SpecialChar.objects.create(
+            orig='ø', dest='o'
+        )
+        assert Artist.name_to_slug('Møme') == 'mome'
+        special_char.dest = 'oe'
+        special_char.save()
+        assert Artist.name_to_slug('Møme') == 'moeme'
+        special_char.delete()
+        assert Artist.name_to_slug('Møme') == 'mme'
+        assert slug_rules.get().rules == {}
+
+
+class TestNameToSlugs:
+    @pytest.mark.django_db
+    def test_name_to_slugs(self) -> None:
+        SpecialChar.objects.create(orig='ø', dest='o')
+        names: List[str] = [name for name, _ in data.NAMES_AND_SLUGS]
+        assert list(Artist.name_to_slugs(names)) == [
+            Artist.name_to_slug(name) for name in names
+        ]
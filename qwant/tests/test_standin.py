@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+'''
+Test module for the local stand-in of the unofficial Qwant Music API.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterator, List
+from django.core.management import CommandError, call_command
+import pytest
+import requests
+from qwant.music.api import API
+from qwant.music.crawler import Crawler, CrawlState
+from qwant.music.models import Artist
+from qwant.music.ndjson import read_lines
+from qwant.music.standin import Recorder, Recording, StandIn, SyntheticGraph
+from qwant.tests import data
+from qwant.tests.server import FakeAPI
+
+
+@pytest.fixture
+def standin(settings: Any) -> Iterator[StandIn]:
+    '''Serve a synthetic graph of 300 artists to the API client.'''
+    server: StandIn = StandIn(SyntheticGraph(300, mean_degree=4))
+    server.start()
+    settings.QWANT_API_BASE_URL = server.url
+    settings.QWANT_API_BACKOFF = 0
+    settings.QWANT_API_CACHE_PATH = ''
+    settings.QWANT_API_THROTTLE_PATH = ''
+    API.close()
+    yield server
+    API.close()
+    server.stop()
+
+
+class TestSyntheticGraph:
+    def test_artist(self) -> None:
+        graph: SyntheticGraph = SyntheticGraph(100)
+        artist = graph.get('synthetic-artist-42')
+        assert artist['id'] == 43
+        assert artist['slug'] == 'synthetic-artist-42'
+        assert artist == SyntheticGraph(100).get('synthetic-artist-42')
+        other: SyntheticGraph = SyntheticGraph(100, seed=1)
+        assert artist != other.get('synthetic-artist-42')
+        assert graph.get('synthetic-artist-100') is None
+        assert graph.get('artist-1') is None
+
+    def test_power_law(self) -> None:
+        graph: SyntheticGraph = SyntheticGraph(2000, mean_degree=10)
+        degrees: List[int] = []
+        listed: Counter = Counter()
+        for number in range(graph.size):
+            degrees.append(len(similar := graph.similar(number)))
+            listed.update(similar)
+            assert number not in similar
+        assert 8 <= sum(degrees) / len(degrees) <= 10
+        hubs: List[int] = sorted(listed.values(), reverse=True)
+        assert hubs[0] > 50 * hubs[len(hubs) // 2]
+
+
+class TestRecording:
+    @pytest.mark.parametrize('name', ('artists.ndjson', 'artists.ndjson.gz'))
+    def test_record_then_replay(
+        self, api_server: FakeAPI, tmp_path: Path, name: str
+    ) -> None:
+        api_server.artists['artist-1'] = data.API_DATA[0]
+        recording: Recording = Recording(tmp_path / name)
+        recorder: Recorder = Recorder(recording, api_server.url)
+        assert recorder.get('artist-1') == data.API_DATA[0]
+        assert recorder.get('artist-1') == data.API_DATA[0]
+        assert recorder.get('unknown') is None
+        assert api_server.hits == ['artist-1', 'unknown']
+        assert list(read_lines(tmp_path / name)) == [data.API_DATA[0]]
+        assert Recording(tmp_path / name).get('artist-1') == data.API_DATA[0]
+
+
+class TestStandIn:
+    def test_serve_to_client(self, standin: StandIn) -> None:
+        assert API.get('synthetic-artist-1')['id'] == 2
+        assert API.get('unknown') is None
+
+    def test_error_injection(self, standin: StandIn, settings: Any) -> None:
+        settings.QWANT_API_RETRIES = 0
+        standin.error_rate = 1.0
+        with pytest.raises(requests.HTTPError):
+            API.get('synthetic-artist-1')
+        standin.error_rate = 0.5
+        statuses: Counter = Counter(
+            standin.respond('synthetic-artist-1')[0] for _ in range(1000)
+        )
+        assert 400 < statuses[200] < 600
+
+    def test_latency(self, standin: StandIn) -> None:
+        standin.latency, standin.jitter = 0.1, 0.05
+        delays: List[float] = [standin.delay() for _ in range(1000)]
+        assert min(delays) >= 0.1
+        assert 0.14 < sum(delays) / len(delays) < 0.16
+
+    @pytest.mark.django_db
+    def test_offline_crawl(self, standin: StandIn) -> None:
+        state: CrawlState = CrawlState()
+        state.push(SyntheticGraph.slug(0), 0)
+        reports: List[str] = []
+        crawler: Crawler = Crawler(
+            state,
+            max_depth=6,
+            max_artists=1000,
+            workers=4,
+            report=reports.append,
+        )
+        crawler.run()
+        assert state.fetched > 50
+        assert Artist.objects.count() > state.fetched
+        assert not state.failed
+
+
+class TestRunStandInCommand:
+    def test_missing_recording(self, tmp_path: Path) -> None:
+        with pytest.raises(CommandError):
+            call_command('run_standin', replay=tmp_path / 'missing.ndjson')
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+'''
+Test module for the rate limiter and the circuit breaker of the API.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from pathlib import Path
+from typing import Dict, List, Optional
+import time
+from _pytest.monkeypatch import MonkeyPatch
+import pytest
+from qwant.music.throttle import Budget, CircuitBreaker, RateLimiter
+
+BUDGETS: Dict[str, Budget] = {
+    'interactive': Budget(rate=10, burst=2, wait=0.05),
+    'background': Budget(rate=100, burst=1),
+}
+
+
+@pytest.fixture
+def limiter(tmp_path: Path) -> RateLimiter:
+    return RateLimiter(tmp_path / 'throttle.sqlite3', BUDGETS)
+
+
+@pytest.fixture
+def breaker() -> CircuitBreaker:
+    return CircuitBreaker(window=4, threshold=0.5, cooldown=0.05, min_calls=4)
+
+
+class TestRateLimiter:
+    def test_burst_then_reject(self, limiter: RateLimiter) -> None:
+        assert limiter.acquire('interactive')
+        assert limiter.acquire('interactive')
+        assert not limiter.acquire('interactive')  # Would wait 0.1s
+        assert limiter.rejected == {'interactive': 1}
+
+    def test_wait_for_token(self, limiter: RateLimiter) -> None:
+        started: float = time.perf_counter()
+        for _ in range(5):
+            assert limiter.acquire('background')
+        assert time.perf_counter() - started >= 0.04
+
+    def test_separate_budgets(self, limiter: RateLimiter) -> None:
+        for _ in range(5):
+            limiter.acquire('background')
+        assert limiter.acquire('interactive')
+
+    def test_shared_by_processes(
+        self, limiter: RateLimiter, tmp_path: Path
+    ) -> None:
+        path: Path = tmp_path / 'throttle.sqlite3'
+        other: RateLimiter = RateLimiter(path, BUDGETS)
+        assert limiter.acquire('interactive')
+        assert other.acquire('interactive')
+        assert not limiter.acquire('interactive')
+        assert not other.acquire('interactive')
+
+
+class TestCircuitBreaker:
+    def test_open_on_failures(self, breaker: CircuitBreaker) -> None:
+        for failed in (True, False, True):
+            assert (ticket := breaker.allow()) is not None
+            breaker.record(ticket, failed=failed)
+        assert breaker.state == 'closed'
+        breaker.record(ticket, failed=False)
+        assert breaker.state == 'open'
+        assert breaker.allow() is None
+        assert breaker.opened == 1
+
+    @pytest.mark.parametrize(
+        'failed,state', ((False, 'closed'), (True, 'open'))
+    )
+    def test_trial_call(
+        self,
+        breaker: CircuitBreaker,
+        monkeypatch: MonkeyPatch,
+        failed: bool,
+        state: str,
+    ) -> None:
+        for _ in range(4):
+            breaker.record(breaker.allow(), failed=True)  # type: ignore
+        now: float = time.monotonic()
+        monkeypatch.setattr(time, 'monotonic', lambda: now + 0.1)
+        assert breaker.state == 'half-open'
+        trial: Optional[int] = breaker.allow()
+        assert trial is not None
+        assert breaker.allow() is None  # One trial at a time
+        breaker.record(trial, failed=failed)
+        assert breaker.state == state
+
+    def test_late_calls(
+        self, breaker: CircuitBreaker, monkeypatch: MonkeyPatch
+    ) -> None:
+        '''The calls allowed before the opening do not move the breaker.'''
+        late: List[Optional[int]] = [breaker.allow() for _ in range(2)]
+        for _ in range(4):
+            breaker.record(breaker.allow(), failed=True)  # type: ignore
+        now: float = time.monotonic()
+        monkeypatch.setattr(time, 'monotonic', lambda: now + 0.1)
+        trial: Optional[int] = breaker.allow()
+        breaker.record(late[0], failed=False)  # type: ignore
+        assert breaker.state == 'half-open'
+        assert breaker.allow() is None  # The trial is still running
+        breaker.record(trial, failed=True)  # type: ignore
+        breaker.record(late[1], failed=False)  # type: ignore
+        assert breaker.state == 'open'
+        assert breaker.opened == 1
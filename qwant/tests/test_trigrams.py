@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+'''
+Test module for the trigrams of the fuzzy artist search.
+Author: SebDeclercq (https://www.github.com/SebDeclercq)
+'''
+from typing import Any, List
+import pytest
+from qwant.music.models import Artist, ArtistTrigram, FuzzyMatch, SpecialChar
+from qwant.music.trigrams import min_shared, similarity, trigrams
+
+
+def test_trigrams() -> None:
+    assert trigrams('daft-punk') == {
+        '  d', ' da', 'daf', 'aft', 'ft ',
+        '  p', ' pu', 'pun', 'unk', 'nk ',
+    }
+    assert trigrams('-a--a-') == {'  a', ' a '}
+    assert trigrams('') == trigrams('-') == set()
+
+
+def test_similarity() -> None:
+    assert similarity(trigrams('moby'), trigrams('moby')) == 1.0
+    assert similarity(trigrams('moby'), trigrams('mobi')) == 3 / 7
+    assert similarity(set(), set()) == 0.0
+
+
+@pytest.mark.parametrize(
+    'nb_trigrams, min_similarity, shared',
+    ((10, 0.0, 1), (10, 0.5, 5), (10, 0.55, 6), (3, 1.0, 3), (7, 0.3, 3)),
+)
+def test_min_shared(
+    nb_trigrams: int, min_similarity: float, shared: int
+) -> None:
+    assert min_shared(nb_trigrams, min_similarity) == shared
+
+
+@pytest.fixture
+def artists() -> List[Artist]:
+    return [
+        Artist.objects.create(name=name, slug=slug, api_id=api_id)
+        for api_id, (name, slug) in enumerate(
+            (
+                ('Daft Punk', 'daft-punk'),
+                ('Daft Punk Tribute', 'daft-punk-tribute'),
+                ('Punk Daft', 'punk-daft'),
+                ('Møme', 'mome'),
+                ('Moby', 'moby'),
+            )
+        )
+    ]
+
+
+@pytest.mark.django_db
+class TestFuzzySearch:
+    def test_fuzzy_search(self, artists: List[Artist]) -> None:
+        matches: List[FuzzyMatch] = Artist.fuzzy_search('Daft Pnuk')
+        assert [match.artist for match in matches] == [
+            artists[0],
+            artists[2],
+            artists[1],
+        ]
+        assert matches[0].similarity == matches[1].similarity == 6 / 14
+        assert matches[2].similarity == 6 / 22
+        assert Artist.fuzzy_search('daft punk', limit=1) == [
+            FuzzyMatch(artists[0], 1.0)
+        ]
+
+    def test_fuzzy_search_min_similarity(self, artists: List[Artist]) -> None:
+        assert [
+            match.artist
+            for match in Artist.fuzzy_search('Daft Punk', min_similarity=0.5)
+        ] == [artists[0], artists[2], artists[1]]
+        assert Artist.fuzzy_search('Daft Pnuk', min_similarity=0.5) == []
+        assert Artist.fuzzy_search('Zzz', min_similarity=0.1) == []
+        assert Artist.fuzzy_search('!!!') == []
+
+    def test_fuzzy_search_queries(
+        self,
+        artists: List[Artist],
+        django_assert_num_queries: Any,
+    ) -> None:
+        Artist.name_to_slug('Moby')  # Loads the slug rules
+        with django_assert_num_queries(2):  # The ranking, the Artists
+            Artist.fuzzy_search('Moby')
+        with django_assert_num_queries(3):  # Plus the trigram frequencies
+            Artist.fuzzy_search('Moby', min_similarity=0.5)
+
+    def test_index_saved(self, artists: List[Artist]) -> None:
+        artists[4].name = 'Mobi'
+        artists[4].save(update_fields=['slug'])
+        assert Artist.fuzzy_search('Moby', min_similarity=1.0)
+        artists[4].save()
+        assert not Artist.fuzzy_search('Moby', min_similarity=1.0)
+        assert Artist.fuzzy_search('Mobi', limit=1)[0].artist == artists[4]
+        assert ArtistTrigram.objects.filter(artist=artists[4]).count() == 5
+        artists[4].delete()
+        assert ArtistTrigram.objects.count() == sum(
+            len(trigrams(Artist.name_to_slug(artist.name)))
+            for artist in artists[:4]
+        )
+
+    def test_rebuild(self, artists: List[Artist]) -> None:
+        assert Artist.fuzzy_search('Mome', min_similarity=1.0) == []
+        SpecialChar.objects.create(orig='ø', dest='o')
+        assert ArtistTrigram.rebuild(chunk_size=2) == (
+            5,
+            ArtistTrigram.objects.count(),
+        )
+        assert Artist.fuzzy_search('Mome', min_similarity=1.0) == [
+            FuzzyMatch(artists[3], 1.0)
+        ]
@@ -3,11 +3,16 @@
 Test module for the views of the Qwant Django App.
 Author: SebDeclercq (https://www.github.com/SebDeclercq)
 '''
+from typing import Any, Dict
+from _pytest.monkeypatch import MonkeyPatch
 from django.http import HttpResponse
 from django.test import Client
 from django.urls import reverse
+from django.utils import timezone
 import pytest
-from qwant.music.models import Artist
+import requests
+from qwant.music.api import API, APIUnavailable
+from qwant.music.models import Artist, RefreshJob
 
 
 @pytest.fixture
@@ -28,6 +33,19 @@ class TestArtistDetailView:
         assert 'qwant/artist_detail.html' in resp.template_name
         assert artist.name in resp.content.decode('utf-8')
 
+    @pytest.mark.django_db
+    def test_stale_artist_refreshed(self, artist: Artist) -> None:
+        client: Client = Client()
+        url: str = reverse('qwant:artist_detail', args=[artist.pk])
+        resp: HttpResponse = client.get(url)
+        assert 'Refresh in progress' in resp.content.decode('utf-8')
+        assert RefreshJob.objects.get().slug == 'my-artist'
+        RefreshJob.objects.all().delete()
+        Artist.objects.update(fetched_at=timezone.now())
+        resp = client.get(url)
+        assert 'Refresh in progress' not in resp.content.decode('utf-8')
+        assert not RefreshJob.objects.exists()
+
 
 class TestArtistsList:
     @pytest.mark.django_db
@@ -63,8 +81,73 @@ class TestArtistSearch:
         )
         assert resp.status_code == 404
 
+    @pytest.mark.django_db
+    def test_get_artist_fuzzy(
+        self, artist: Artist, monkeypatch: MonkeyPatch, settings: Any
+    ) -> None:
+        '''The closest name is returned without calling the API.'''
+
+        def unavailable(slug: str, **kwargs: Any) -> None:
+            raise APIUnavailable
+
+        monkeypatch.setattr(API, 'get', unavailable)
+        settings.QWANT_FUZZY_MIN_SIMILARITY = 0.5
+        client: Client = Client()
+        resp: HttpResponse = client.post(
+            reverse('qwant:artist_search'), {'artist_name': 'My Artists'}
+        )
+        assert resp.status_code == 302
+        assert resp.url == artist.get_absolute_url()
+        resp = client.post(
+            reverse('qwant:artist_search'), {'artist_name': 'Moby'}
+        )
+        assert 'Qwant Music is unavailable' in resp.content.decode()
+
+    @pytest.mark.django_db
+    def test_api_unavailable(self, monkeypatch: MonkeyPatch) -> None:
+        def unavailable(slug: str, **kwargs: Any) -> None:
+            raise APIUnavailable
+
+        monkeypatch.setattr(API, 'get', unavailable)
+        client: Client = Client()
+        resp: HttpResponse = client.post(
+            reverse('qwant:artist_search'), {'artist_name': 'Moby'}
+        )
+        assert resp.status_code == 200
+        assert 'Qwant Music is unavailable' in resp.content.decode()
+
+    @pytest.mark.django_db
+    def test_api_error(self, monkeypatch: MonkeyPatch) -> None:
+        '''The API failures are reported like an open circuit breaker.'''
+
+        def timeout(slug: str, **kwargs: Any) -> None:
+            raise requests.Timeout
+
+        monkeypatch.setattr(API, 'get', timeout)
+        resp: HttpResponse = Client().post(
+            reverse('qwant:artist_search'), {'artist_name': 'Moby'}
+        )
+        assert resp.status_code == 200
+        assert 'Qwant Music is unavailable' in resp.content.decode()
+
 
 class TestArtistReload:
+    @pytest.mark.django_db
+    def test_reload_queued(
+        self, artist: Artist, monkeypatch: MonkeyPatch
+    ) -> None:
+        def unexpected(slug: str, **kwargs: Any) -> None:
+            raise AssertionError('No API call in the request')
+
+        monkeypatch.setattr(API, 'get', unexpected)
+        client: Client = Client()
+        resp: HttpResponse = client.post(
+            reverse('qwant:artist_reload'), {'artist_name': artist.slug}
+        )
+        assert resp.status_code == 302
+        assert resp.url == reverse('qwant:artist_detail', args=[artist.pk])
+        assert RefreshJob.objects.get().slug == 'my-artist'
+
     @pytest.mark.real_api_call
     @pytest.mark.django_db
     def test_reload_artist(self) -> None:
@@ -76,3 +159,32 @@ class TestArtistReload:
         )
         assert resp.status_code == 200
         assert 'qwant/artist_detail.html' in resp.template_name
+
+
+class TestArtistAutocomplete:
+    @pytest.mark.django_db
+    def test_autocomplete(self, artist: Artist) -> None:
+        client: Client = Client()
+        resp: HttpResponse = client.get(
+            reverse('qwant:artist_autocomplete'), {'q': 'My a', 'limit': 5}
+        )
+        assert resp.status_code == 200
+        assert resp.json() == {
+            'artists': [
+                {
+                    'id': artist.pk,
+                    'name': 'my artist',
+                    'url': artist.get_absolute_url(),
+                }
+            ]
+        }
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('params', ({}, {'q': 'My', 'limit': 0}))
+    def test_autocomplete_invalid(self, params: Dict[str, Any]) -> None:
+        client: Client = Client()
+        resp: HttpResponse = client.get(
+            reverse('qwant:artist_autocomplete'), params
+        )
+        assert resp.status_code == 400
+        assert 'errors' in resp.json()
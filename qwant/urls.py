@@ -24,6 +24,11 @@ urlpatterns: List[URLPattern] = [
         views.ArtistSearchView.as_view(),
         name=_('artist_search'),
     ),
+    path(
+        _('music/artist/autocomplete'),
+        views.ArtistAutocompleteView.as_view(),
+        name=_('artist_autocomplete'),
+    ),
     path(
         _('music/artist/reload'),
         views.ArtistReloadView.as_view(),
@@ -1,19 +1,33 @@
 from __future__ import annotations
-from typing import Any, Type
+from typing import Any, Dict, Optional, Type
 from django.db.models import Manager
-from django.http import Http404, HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.urls import reverse
 from django.utils.translation import gettext as _
 from django.views import generic
 from django.views.generic.edit import FormView
-from qwant.forms import SearchForm
-from qwant.music.models import Artist
+import requests
+from qwant.forms import AutocompleteForm, SearchForm
+from qwant.music.models import Artist, RefreshJob
 
 
 class ArtistDetailView(generic.DetailView):
     model: Type[Artist] = Artist
     template_name: str = 'qwant/artist_detail.html'
 
+    def get_object(self, queryset: Optional[Manager[Artist]] = None) -> Artist:
+        artist: Artist = super().get_object(queryset)
+        if artist.is_stale:
+            RefreshJob.enqueue([artist.slug])
+        return artist
+
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        context: Dict[str, Any] = super().get_context_data(**kwargs)
+        context['refresh_queued'] = RefreshJob.objects.filter(
+            slug=self.object.slug
+        ).exists()
+        return context
+
 
 class ArtistsListView(generic.ListView):
     template_name: str = 'qwant/artists_list.html'
@@ -29,7 +43,11 @@ class ArtistSearchView(FormView):
     form_class: Type[SearchForm] = SearchForm
 
     def form_valid(self, form: SearchForm) -> HttpResponse:
-        self.artist: Artist = form.search()
+        try:
+            self.artist: Optional[Artist] = form.search()
+        except requests.RequestException:  # APIUnavailable included
+            form.add_error(None, _('Qwant Music is unavailable, retry later'))
+            return self.form_invalid(form)
         return super().form_valid(form)
 
     def get_success_url(self) -> HttpResponse:
@@ -46,8 +64,38 @@ class ArtistReloadView(FormView):
     form_class: Type[SearchForm] = SearchForm
 
     def form_valid(self, form: SearchForm) -> HttpResponse:
-        self.artist: Artist = form.reload()
+        try:
+            self.artist: Optional[Artist] = form.reload()
+        except requests.RequestException:  # APIUnavailable included
+            form.add_error(None, _('Qwant Music is unavailable, retry later'))
+            return self.form_invalid(form)
         return super().form_valid(form)
 
     def get_success_url(self) -> HttpResponse:
-        return reverse('qwant:artist_detail', kwargs={'pk': self.artist.pk})
+        try:
+            return reverse(
+                'qwant:artist_detail', kwargs={'pk': self.artist.pk}
+            )
+        except AttributeError:
+            raise Http404('No artist found')
+
+
+class ArtistAutocompleteView(generic.View):
+    def get(self, request: HttpRequest) -> JsonResponse:
+        form: AutocompleteForm = AutocompleteForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        return JsonResponse(
+            {
+                'artists': [
+                    {
+                        'id': suggestion.pk,
+                        'name': suggestion.name,
+                        'url': reverse(
+                            'qwant:artist_detail', kwargs={'pk': suggestion.pk}
+                        ),
+                    }
+                    for suggestion in form.complete()
+                ]
+            }
+        )
@@ -9,7 +9,7 @@ https://docs.djangoproject.com/en/3.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.0/ref/settings/
 """
-from typing import Dict
+from typing import Any, Dict
 import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -122,11 +122,190 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# 'qwant' is shared by the workers (python manage.py createcachetable)
+
+CACHES: Dict[str, Dict[str, Any]] = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'qwant': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'qwant_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
+}
+
+
 GRAPHENE: Dict[str, str] = {
     'SCHEMA': 'seb_music.graphql.schema',
 }
 
 
+# Qwant Music
+
+# Where the artists are read from (/music/artist/<slug>): the unofficial API,
+# or a local stand-in for offline load tests (see run_standin)
+QWANT_API_BASE_URL: str = os.environ.get(
+    'QWANT_API_BASE_URL', 'https://api.qwant.com/music/artist/'
+)
+
+# Where the artists are displayed on Qwant Music
+QWANT_WEB_URL: str = 'https://www.qwant.com/music/artist/'
+
+# HTTP client of the API: one keep-alive session per process
+QWANT_API_POOL_SIZE: int = 10
+
+# Seconds to connect and to wait for the response, for each attempt
+QWANT_API_CONNECT_TIMEOUT: float = 3.05
+
+QWANT_API_READ_TIMEOUT: float = 10.0
+
+# Retries of the connection errors and of the 429/5xx responses, waiting
+# QWANT_API_BACKOFF * 2 ** (retry - 1) seconds (or the Retry-After header)
+QWANT_API_RETRIES: int = 3
+
+QWANT_API_BACKOFF: float = 0.5
+
+# On-disk cache of the API responses, shared by the processes (empty to
+# disable it), served without asking the API for QWANT_API_CACHE_TTL seconds
+QWANT_API_CACHE_PATH: str = os.environ.get(
+    'QWANT_API_CACHE_PATH', os.path.join(BASE_DIR, '.cache', 'qwant.sqlite3')
+)
+
+QWANT_API_CACHE_TTL: int = 24 * 60 * 60
+
+# Total size of the cached responses (least recently used ones evicted)
+QWANT_API_CACHE_MAX_BYTES: int = 256 * 2 ** 20
+
+# Client-side rate limits of the API calls, a token bucket per budget shared by
+# the processes through a SQLite file (empty to disable it): calls per second,
+# burst after an idle period and maximum seconds waited for a call (None: as
+# long as needed). The users' calls (views, GraphQL) fail fast rather than
+# waiting long, the bulk jobs' ones (crawl_artists, feed_sample) wait.
+QWANT_API_THROTTLE_PATH: str = os.environ.get(
+    'QWANT_API_THROTTLE_PATH',
+    os.path.join(BASE_DIR, '.cache', 'qwant-throttle.sqlite3'),
+)
+
+QWANT_API_BUDGETS: Dict[str, Dict[str, Any]] = {
+    'interactive': {'rate': 10.0, 'burst': 20, 'wait': 1.0},
+    'background': {'rate': 20.0, 'burst': 20, 'wait': None},
+}
+
+# Circuit breaker of each process: once QWANT_API_BREAKER_THRESHOLD of the
+# last QWANT_API_BREAKER_WINDOW calls failed, the calls fail fast (serving the
+# stale cached responses) for QWANT_API_BREAKER_COOLDOWN seconds, then a trial
+# call closes the breaker or opens it again
+QWANT_API_BREAKER_WINDOW: int = 20
+
+QWANT_API_BREAKER_THRESHOLD: float = 0.5
+
+QWANT_API_BREAKER_COOLDOWN: float = 30.0
+
+# Django cache (see CACHES) remembering the slugs unknown to the API,
+# for QWANT_NOT_FOUND_TTL seconds
+QWANT_NOT_FOUND_CACHE: str = 'qwant'
+
+QWANT_NOT_FOUND_TTL: int = 60 * 60
+
+# Seconds after which an artist is refreshed in the background (see
+# run_refresh_worker) when displayed
+QWANT_ARTIST_MAX_AGE: int = 7 * 24 * 60 * 60
+
+# Django cache holding the per-slug locks, so that the concurrent lookups of
+# an unknown artist make one API call; a lock is given up after
+# QWANT_LOCK_TIMEOUT seconds (above the worst API call with its retries)
+QWANT_LOCK_CACHE: str = 'qwant'
+
+QWANT_LOCK_TIMEOUT: float = 60.0
+
+# Django cache holding the version of the SpecialChar rules compiled by each
+# process (see name_to_slug), checked every QWANT_SLUG_RULES_CHECK seconds;
+# the slugs of the last QWANT_SLUG_CACHE_SIZE names are kept in memory
+QWANT_SLUG_RULES_CACHE: str = 'qwant'
+
+QWANT_SLUG_RULES_CHECK: float = 5.0
+
+QWANT_SLUG_CACHE_SIZE: int = 100_000
+
+# The search form returns the artist whose name is the closest to the searched
+# one (see Artist.fuzzy_search) before asking the API, if the similarity of
+# their trigrams reaches QWANT_FUZZY_MIN_SIMILARITY (above 1 to disable it)
+QWANT_FUZZY_MIN_SIMILARITY: float = 0.5
+
+# The artist names completing the searches are held in memory by each process
+# (see Artist.autocomplete), patched with the artists written meanwhile every
+# QWANT_AUTOCOMPLETE_CHECK seconds and rebuilt every QWANT_AUTOCOMPLETE_MAX_AGE
+# seconds (to drop the deleted artists); an answer holds
+# QWANT_AUTOCOMPLETE_MAX_LIMIT artists at most
+QWANT_AUTOCOMPLETE_CHECK: float = 5.0
+
+QWANT_AUTOCOMPLETE_MAX_AGE: int = 60 * 60
+
+QWANT_AUTOCOMPLETE_MAX_LIMIT: int = 20
+
+# The GraphQL queries are checked before their execution (see CostAnalyser):
+# a query nesting more than QWANT_GRAPHQL_MAX_DEPTH fields, or costing more
+# than QWANT_GRAPHQL_MAX_COST, is rejected. Each field returned costs 1, a list
+# holding its limit/first argument, or else QWANT_GRAPHQL_LIST_SIZES items (by
+# 'Type.field') or QWANT_GRAPHQL_LIST_SIZE; QWANT_GRAPHQL_FIELD_COSTS adds the
+# cost of the fields which may call the API, or search paths
+QWANT_GRAPHQL_MAX_DEPTH: int = 8
+
+QWANT_GRAPHQL_MAX_COST: int = 100_000
+
+QWANT_GRAPHQL_LIST_SIZE: int = 100
+
+QWANT_GRAPHQL_LIST_SIZES: Dict[str, int] = {
+    'ArtistType.similarArtists': 10,
+    'ArtistConnection.edges': 100,  # QWANT_GRAPHQL_MAX_PAGE_SIZE
+}
+
+QWANT_GRAPHQL_FIELD_COSTS: Dict[str, int] = {
+    'Query.qwantArtist': 100,
+    'Query.qwantPaths': 100,
+}
+
+# The qwantArtists pages hold QWANT_GRAPHQL_PAGE_SIZE artists unless asked
+# otherwise, QWANT_GRAPHQL_MAX_PAGE_SIZE at most
+QWANT_GRAPHQL_PAGE_SIZE: int = 20
+
+QWANT_GRAPHQL_MAX_PAGE_SIZE: int = 100
+
+# Each process keeps the last QWANT_GRAPHQL_PERSISTED_QUERIES queries parsed
+# and validated, known by their hash (Apollo's automatic persisted queries)
+QWANT_GRAPHQL_PERSISTED_QUERIES: int = 1000
+
+# Budget of the shortest path search between two artists
+QWANT_PATH_MAX_HOPS: int = 6
+
+QWANT_PATH_MAX_NODES: int = 100_000
+
+# Seconds given to a batch of path searches (qwantPaths, artist_paths), and
+# the most a qwantPaths query can ask for with its timeout argument
+QWANT_PATHS_BATCH_TIMEOUT: float = 10.0
+
+QWANT_PATHS_MAX_TIMEOUT: float = 30.0
+
+# Where the similar artists are read from by the graph algorithms:
+# - 'database': the similar_artists table, one query per search level
+# - 'snapshot': a compact in-memory copy of the graph, built per process
+# - 'cte': like 'database', but path searches run as one recursive SQL query
+QWANT_GRAPH_ENGINE: str = os.environ.get('QWANT_GRAPH_ENGINE', 'database')
+
+# Seconds before rebuilding the snapshot to catch other processes' changes
+QWANT_GRAPH_SNAPSHOT_MAX_AGE: int = 300
+
+# Use A* guided by the landmarks (see build_landmarks) for the path searches
+# of the 'snapshot' engine, instead of the bidirectional BFS
+QWANT_PATH_LANDMARKS: bool = False
+
+# Number of landmarks picked by the build_landmarks command
+QWANT_LANDMARKS_COUNT: int = 16
+
+
 if os.environ.get('HEROKU'):
     import django_heroku
 
@@ -20,7 +20,7 @@ from django.urls.resolvers import URLPattern
 from django.utils.translation import gettext as _
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import RedirectView
-from graphene_django.views import GraphQLView
+from qwant.music.graphql.views import QwantGraphQLView
 
 
 urlpatterns: List[URLPattern] = [
@@ -37,7 +37,7 @@ urlpatterns: List[URLPattern] = [
     ),
     path(
         _('graphql/'),
-        csrf_exempt(GraphQLView.as_view(graphiql=True)),
+        csrf_exempt(QwantGraphQLView.as_view(graphiql=True)),
         name=_('graphql'),
     ),
 ]